@@ -2,9 +2,12 @@ import oneflow as flow
 import argparse
 import numpy as np
 import time
+import sys
 from models.dla import DLA
 from utils.clsidx_to_labels import clsidx_2_labels
-from utils.numpy_data_utils import load_image
+
+sys.path.append("../")
+from image_data import load_image
 
 
 def _parse_args():
@@ -3,8 +3,11 @@ import argparse
 import numpy as np
 import os
 import time
+import sys
 from models.dla import DLA
-from utils.ofrecord_data_utils import OFRecordDataLoader
+
+sys.path.append("../")
+from image_data import OFRecordDataLoader
 
 
 def _parse_args():
@@ -43,15 +46,11 @@ def main(args):
     train_data_loader = OFRecordDataLoader(
         ofrecord_root=args.ofrecord_path,
         mode="train",
-        dataset_size=1400,  # NOTE(Liang Depeng): needs to explictly set the dataset size
         batch_size=args.train_batch_size,
     )
 
     val_data_loader = OFRecordDataLoader(
-        ofrecord_root=args.ofrecord_path,
-        mode="val",
-        dataset_size=200,
-        batch_size=args.val_batch_size,
+        ofrecord_root=args.ofrecord_path, mode="val", batch_size=args.val_batch_size,
     )
 
     # oneflow init
@@ -1,17 +0,0 @@
-from PIL import Image
-import numpy as np
-import os
-import random
-
-
-def load_image(image_path="data/jeep.jpg"):
-    rgb_mean = [123.68, 116.779, 103.939]
-    rgb_std = [58.393, 57.12, 57.375]
-    im = Image.open(image_path)
-    im = im.resize((224, 224))
-    im = im.convert("RGB")
-    im = np.array(im).astype("float32")
-    im = (im - rgb_mean) / rgb_std
-    im = np.transpose(im, (2, 0, 1))
-    im = np.expand_dims(im, axis=0)
-    return np.ascontiguousarray(im, "float32")
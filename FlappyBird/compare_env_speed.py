@@ -0,0 +1,81 @@
+"""
+Frames per second of the display game, the headless game and VectorGameState,
+preprocessing included. Run from the FlappyBird directory.
+"""
+import argparse
+import time
+from functools import partial
+
+import numpy as np
+
+from game.vector_flappy_bird import VectorGameState
+from game.wrapped_flappy_bird import GameState
+from model.utils import crop_pre_processing, pre_processing
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser("flags for FlappyBird environment speed")
+    parser.add_argument("--steps", type=int, default=2000, help="frames per game")
+    parser.add_argument("--image_size", type=int, default=84)
+    parser.add_argument(
+        "--num_envs", type=int, nargs="+", default=[1, 4, 8, 16], help="vector sizes"
+    )
+    parser.add_argument(
+        "--display", action="store_true", help="also run the displayed game"
+    )
+    return parser.parse_args()
+
+
+def _actions(steps, num_envs):
+    return np.random.rand(steps, num_envs) < 0.1
+
+
+def run_single(headless, args):
+    game_state = GameState(headless=headless)
+    actions = _actions(args.steps, 1)
+    start = time.time()
+    for action in actions:
+        image, _, _ = game_state.frame_step(int(action[0]))
+        pre_processing(
+            image[: game_state.SCREENWIDTH, : int(game_state.BASEY)],
+            args.image_size,
+            args.image_size,
+        )
+    return args.steps / (time.time() - start)
+
+
+def run_vector(num_envs, args):
+    preprocess = partial(
+        crop_pre_processing,
+        image_size=args.image_size,
+        crop_width=GameState.SCREENWIDTH,
+        crop_height=int(GameState.BASEY),
+    )
+    actions = _actions(args.steps, num_envs)
+    with VectorGameState(num_envs, preprocess=preprocess) as game_state:
+        game_state.frame_step(actions[0])  # wait for the workers to start
+        start = time.time()
+        for action in actions[1:]:
+            game_state.frame_step(action)
+        elapsed = time.time() - start
+    return (args.steps - 1) * num_envs / elapsed
+
+
+def main(args):
+    results = []
+    if args.display:
+        results.append(("GameState", run_single(False, args)))
+    results.append(("GameState(headless=True)", run_single(True, args)))
+    for num_envs in args.num_envs:
+        results.append(
+            ("VectorGameState({})".format(num_envs), run_vector(num_envs, args))
+        )
+
+    print("| environment | frames/s |")
+    print("|---|---|")
+    for name, fps in results:
+        print("| {} | {:.1f} |".format(name, fps))
+
+
+if __name__ == "__main__":
+    main(_parse_args())
@@ -2,7 +2,13 @@ import pygame
 import sys
 
 
-def load():
+def load(convert=True):
+    """Loads the sprites and their hitmasks.
+
+    Args:
+        convert (bool): convert the sprites to the display pixel format,
+            needs a display mode to be set. Headless games keep them as loaded.
+    """
     # path of player with different states
     PLAYER_PATH = (
         "assets/sprites/redbird-upflap.png",
@@ -18,37 +24,43 @@ def load():
 
     IMAGES, HITMASKS = {}, {}
 
+    def _load(path, alpha=True):
+        image = pygame.image.load(path)
+        if not convert:
+            return image
+        return image.convert_alpha() if alpha else image.convert()
+
     # numbers sprites for score display
     IMAGES["numbers"] = (
-        pygame.image.load("assets/sprites/0.png").convert_alpha(),
-        pygame.image.load("assets/sprites/1.png").convert_alpha(),
-        pygame.image.load("assets/sprites/2.png").convert_alpha(),
-        pygame.image.load("assets/sprites/3.png").convert_alpha(),
-        pygame.image.load("assets/sprites/4.png").convert_alpha(),
-        pygame.image.load("assets/sprites/5.png").convert_alpha(),
-        pygame.image.load("assets/sprites/6.png").convert_alpha(),
-        pygame.image.load("assets/sprites/7.png").convert_alpha(),
-        pygame.image.load("assets/sprites/8.png").convert_alpha(),
-        pygame.image.load("assets/sprites/9.png").convert_alpha(),
+        _load("assets/sprites/0.png"),
+        _load("assets/sprites/1.png"),
+        _load("assets/sprites/2.png"),
+        _load("assets/sprites/3.png"),
+        _load("assets/sprites/4.png"),
+        _load("assets/sprites/5.png"),
+        _load("assets/sprites/6.png"),
+        _load("assets/sprites/7.png"),
+        _load("assets/sprites/8.png"),
+        _load("assets/sprites/9.png"),
     )
 
     # base (ground) sprite
-    IMAGES["base"] = pygame.image.load("assets/sprites/base.png").convert_alpha()
+    IMAGES["base"] = _load("assets/sprites/base.png")
 
     # select random background sprites
-    IMAGES["background"] = pygame.image.load(BACKGROUND_PATH).convert()
+    IMAGES["background"] = _load(BACKGROUND_PATH, alpha=False)
 
     # select random player sprites
     IMAGES["player"] = (
-        pygame.image.load(PLAYER_PATH[0]).convert_alpha(),
-        pygame.image.load(PLAYER_PATH[1]).convert_alpha(),
-        pygame.image.load(PLAYER_PATH[2]).convert_alpha(),
+        _load(PLAYER_PATH[0]),
+        _load(PLAYER_PATH[1]),
+        _load(PLAYER_PATH[2]),
     )
 
     # select random pipe sprites
     IMAGES["pipe"] = (
-        pygame.transform.rotate(pygame.image.load(PIPE_PATH).convert_alpha(), 180),
-        pygame.image.load(PIPE_PATH).convert_alpha(),
+        pygame.transform.rotate(_load(PIPE_PATH), 180),
+        _load(PIPE_PATH),
     )
 
     # hismask for pipes
@@ -75,3 +87,28 @@ def getHitmask(image):
         for y in range(image.get_height()):
             mask[x].append(bool(image.get_at((x, y))[3]))
     return mask
+
+
+def toArrays(images):
+    """Sprites as (rgb, mask) uint8 / bool arrays indexed [x, y] like
+    surfarray, for rendering without a display. The mask keeps the pixels
+    with an alpha of at least 128 and is None for opaque sprites, the bundled
+    sprites only use an alpha of 0 or 255."""
+
+    def _arrays(image):
+        rgb = pygame.surfarray.array3d(image)
+        mask = None
+        if image.get_flags() & pygame.SRCALPHA:
+            mask = pygame.surfarray.array_alpha(image)[:, :, None] >= 128
+            if mask.all():
+                mask = None
+        return rgb, mask
+
+    return {
+        name: (
+            tuple(_arrays(image) for image in value)
+            if isinstance(value, tuple)
+            else _arrays(value)
+        )
+        for name, value in images.items()
+    }
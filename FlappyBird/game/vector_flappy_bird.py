@@ -0,0 +1,86 @@
+import multiprocessing as mp
+import random
+
+import numpy as np
+
+from game.wrapped_flappy_bird import GameState
+
+
+def _worker(conn, seed, preprocess):
+    random.seed(seed)
+    game_state = GameState(headless=True)
+    while True:
+        cmd, data = conn.recv()
+        if cmd == "step":
+            image, reward, terminal = game_state.frame_step(data)
+            if preprocess is not None:
+                image = preprocess(image)
+            conn.send((image, reward, terminal))
+        elif cmd == "close":
+            conn.close()
+            break
+
+
+class VectorGameState:
+    """Steps ``num_envs`` headless games, each in its own worker process.
+
+    Args:
+        num_envs (int): number of games
+        preprocess (callable, optional): applied to every (SCREENWIDTH,
+            SCREENHEIGHT, 3) frame inside the workers, so only the processed
+            frames are sent back. Default is None.
+        seed (int, optional): the game of worker i is seeded with seed + i,
+            random by default.
+    """
+
+    def __init__(self, num_envs, preprocess=None, seed=None):
+        if seed is None:
+            seed = random.randrange(2 ** 31)
+        self.num_envs = num_envs
+        self.conns = []
+        self.processes = []
+        for i in range(num_envs):
+            parent_conn, child_conn = mp.Pipe()
+            process = mp.Process(
+                target=_worker, args=(child_conn, seed + i, preprocess), daemon=True
+            )
+            process.start()
+            child_conn.close()
+            self.conns.append(parent_conn)
+            self.processes.append(process)
+
+    def frame_step(self, input_actions):
+        """Advances every game by one frame.
+
+        Args:
+            input_actions (sequence): one action per game, 0 or 1
+
+        Returns:
+            (np.array, np.array, np.array): stacked frames, rewards float32 and
+                terminals bool of shape (num_envs,). Games reset themselves on
+                a crash, like GameState.
+        """
+        assert len(input_actions) == self.num_envs
+        # send every action first so the games step in parallel
+        for conn, action in zip(self.conns, input_actions):
+            conn.send(("step", int(action)))
+        images, rewards, terminals = zip(*[conn.recv() for conn in self.conns])
+        return (
+            np.stack(images),
+            np.array(rewards, dtype=np.float32),
+            np.array(terminals, dtype=bool),
+        )
+
+    def close(self):
+        for conn in self.conns:
+            conn.send(("close", None))
+        for process in self.processes:
+            process.join()
+        self.conns = []
+        self.processes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
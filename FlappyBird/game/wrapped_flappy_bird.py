@@ -9,29 +9,53 @@ from itertools import cycle
 
 
 class GameState:
+    """Flappy Bird environment.
+
+    Args:
+        headless (bool): render into a numpy array without opening a display
+            nor waiting for the frame rate, for training on servers. Frames
+            are the same as the displayed ones.
+    """
 
     FPS = 60
     SCREENWIDTH = 288
     SCREENHEIGHT = 512
 
-    pygame.init()
-    FPSCLOCK = pygame.time.Clock()
-    SCREEN = pygame.display.set_mode((SCREENWIDTH, SCREENHEIGHT))
-    pygame.display.set_caption("Flappy Bird")
+    # the display and sprites are set up by the first game created
+    FPSCLOCK = None
+    SCREEN = None
+    IMAGES = HITMASKS = SPRITES = None
 
-    IMAGES, HITMASKS = flappy_bird_utils.load()
     PIPEGAPSIZE = 100  # gap between upper and lower part of pipe
     BASEY = SCREENHEIGHT * 0.79
 
-    PLAYER_WIDTH = IMAGES["player"][0].get_width()
-    PLAYER_HEIGHT = IMAGES["player"][0].get_height()
-    PIPE_WIDTH = IMAGES["pipe"][0].get_width()
-    PIPE_HEIGHT = IMAGES["pipe"][0].get_height()
-    BACKGROUND_WIDTH = IMAGES["background"].get_width()
-
     PLAYER_INDEX_GEN = cycle([0, 1, 2, 1])
 
-    def __init__(self):
+    def __init__(self, headless=False):
+        self.headless = headless
+        self._setup(headless)
+        self.reset()
+
+    @classmethod
+    def _setup(cls, headless):
+        if not headless and cls.SCREEN is None:
+            pygame.init()
+            cls.FPSCLOCK = pygame.time.Clock()
+            cls.SCREEN = pygame.display.set_mode((cls.SCREENWIDTH, cls.SCREENHEIGHT))
+            pygame.display.set_caption("Flappy Bird")
+
+        if cls.IMAGES is None:
+            cls.IMAGES, cls.HITMASKS = flappy_bird_utils.load(convert=not headless)
+            cls.PLAYER_WIDTH = cls.IMAGES["player"][0].get_width()
+            cls.PLAYER_HEIGHT = cls.IMAGES["player"][0].get_height()
+            cls.PIPE_WIDTH = cls.IMAGES["pipe"][0].get_width()
+            cls.PIPE_HEIGHT = cls.IMAGES["pipe"][0].get_height()
+            cls.BACKGROUND_WIDTH = cls.IMAGES["background"].get_width()
+
+        if headless and cls.SPRITES is None:
+            cls.SPRITES = flappy_bird_utils.toArrays(cls.IMAGES)
+
+    def reset(self):
         self.score = self.playerIndex = self.loopIter = 0
         self.playerx = int(self.SCREENWIDTH * 0.2)
         self.playery = int((self.SCREENHEIGHT - self.PLAYER_HEIGHT) / 2)
@@ -61,7 +85,8 @@ class GameState:
         self.idx = 0
 
     def frame_step(self, input_action):
-        pygame.event.pump()
+        if not self.headless:
+            pygame.event.pump()
 
         reward = 0.1
         terminal = False
@@ -122,9 +147,12 @@ class GameState:
         )
         if isCrash:
             terminal = True
-            self.__init__()
+            self.reset()
             reward = -1
 
+        if self.headless:
+            return self.render_array(), reward, terminal
+
         # draw sprites
         self.SCREEN.blit(self.IMAGES["background"], (0, 0))
 
@@ -148,6 +176,29 @@ class GameState:
 
         return image_data, reward, terminal
 
+    def render_array(self):
+        """Draws the current frame into a (SCREENWIDTH, SCREENHEIGHT, 3) uint8
+        array, indexed [x, y] like ``pygame.surfarray.array3d``."""
+        canvas = self.SPRITES["background"][0].copy()
+
+        for uPipe, lPipe in zip(self.upperPipes, self.lowerPipes):
+            blitArray(canvas, self.SPRITES["pipe"][0], uPipe["x"], uPipe["y"])
+            blitArray(canvas, self.SPRITES["pipe"][1], lPipe["x"], lPipe["y"])
+
+        blitArray(canvas, self.SPRITES["base"], self.basex, self.BASEY)
+        # print score so player overlaps the score
+        scoreDigits = [int(x) for x in list(str(self.score))]
+        totalWidth = sum(self.IMAGES["numbers"][d].get_width() for d in scoreDigits)
+        Xoffset = (self.SCREENWIDTH - totalWidth) / 2
+        for digit in scoreDigits:
+            sprite = self.SPRITES["numbers"][digit]
+            blitArray(canvas, sprite, Xoffset, self.SCREENHEIGHT * 0.1)
+            Xoffset += self.IMAGES["numbers"][digit].get_width()
+        blitArray(
+            canvas, self.SPRITES["player"][self.playerIndex], self.playerx, self.playery
+        )
+        return canvas
+
     def getRandomPipe(self):
         """returns a randomly generated pipe"""
         # y of gap between upper and lower pipe
@@ -231,3 +282,22 @@ def pixelCollision(rect1, rect2, hitmask1, hitmask2):
             if hitmask1[x1 + x][y1 + y] and hitmask2[x2 + x][y2 + y]:
                 return True
     return False
+
+
+def blitArray(canvas, sprite, x, y):
+    """Draws an (rgb, mask) sprite from ``flappy_bird_utils.toArrays`` onto
+    ``canvas`` at (x, y), clipped to the canvas like ``Surface.blit``."""
+    rgb, mask = sprite
+    x, y = int(x), int(y)
+    x0, y0 = max(x, 0), max(y, 0)
+    x1 = min(x + rgb.shape[0], canvas.shape[0])
+    y1 = min(y + rgb.shape[1], canvas.shape[1])
+    if x0 >= x1 or y0 >= y1:
+        return
+    src = rgb[x0 - x : x1 - x, y0 - y : y1 - y]
+    if mask is None:
+        canvas[x0:x1, y0:y1] = src
+    else:
+        np.copyto(
+            canvas[x0:x1, y0:y1], src, where=mask[x0 - x : x1 - x, y0 - y : y1 - y]
+        )
@@ -0,0 +1,101 @@
+"""
+@author: Chenhao Lu <luchenhao@zhejianglab.com>
+@author: Yizhang Wang <1739601638@qq.com>
+"""
+import numpy as np
+
+
+class ReplayMemory(object):
+    """Circular replay memory storing every frame once.
+
+    Frames are kept as uint8 in a preallocated (capacity, height, width)
+    array, slot ``p`` holds the frame observed after the transition stored
+    at ``p``. A state is the ``history`` frames before it, the next state
+    the ``history`` frames ending with it, both rebuilt by indexing when
+    sampling. Frames older than the start of the stream (``reset``) repeat
+    its first frame, like the initial state of the game.
+
+    Args:
+        capacity (int): transitions kept, older ones are overwritten
+        frame_shape (tuple): (height, width) of a preprocessed frame
+        history (int): frames stacked per state
+    """
+
+    def __init__(self, capacity, frame_shape, history=4):
+        self.capacity = capacity
+        self.history = history
+        self.frames = np.zeros((capacity,) + tuple(frame_shape), dtype=np.uint8)
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.terminals = np.zeros(capacity, dtype=np.float32)
+        # whether the slot ends a transition, False for the first frame of a stream
+        self.is_transition = np.zeros(capacity, dtype=bool)
+        # absolute index of the first frame of the stream of every slot
+        self.stream_start = np.zeros(capacity, dtype=np.int64)
+        # frames written so far, the next one goes to slot total % capacity
+        self.total = 0
+        self._start = 0
+        # stored transitions, number of True of is_transition
+        self._num_transitions = 0
+
+    def __len__(self):
+        return self._num_transitions
+
+    def _write(self, frame, is_transition):
+        slot = self.total % self.capacity
+        self.frames[slot] = np.asarray(frame).reshape(self.frames.shape[1:])
+        # the slot may hold an overwritten transition
+        self._num_transitions += int(is_transition) - int(self.is_transition[slot])
+        self.is_transition[slot] = is_transition
+        self.stream_start[slot] = self._start
+        self.total += 1
+        return slot
+
+    def reset(self, frame):
+        """Starts a new stream of frames, ``frame`` fills the first state."""
+        self._start = self.total
+        self._write(frame, False)
+
+    def push(self, action, reward, next_frame, terminal):
+        """Stores a transition from the current state."""
+        slot = self._write(next_frame, True)
+        self.actions[slot] = action
+        self.rewards[slot] = reward
+        self.terminals[slot] = float(terminal)
+
+    def _stacks(self, ends, length):
+        """Frames ``ends - length + 1 .. ends`` (absolute indices) of every
+        end, clamped to the start of their stream, shape (n, length, h, w)."""
+        ids = ends[:, None] - np.arange(length - 1, -1, -1)[None, :]
+        starts = self.stream_start[ends % self.capacity]
+        ids = np.maximum(ids, starts[:, None])
+        return self.frames[ids % self.capacity]
+
+    def current_state(self):
+        """The state of the latest frame, shape (1, history, h, w)."""
+        return self._stacks(np.array([self.total - 1]), self.history)
+
+    def sample(self, batch_size):
+        """Uniformly samples stored transitions.
+
+        Returns:
+            (np.array, np.array, np.array, np.array, np.array): states and next
+                states uint8 (batch, history, h, w), actions int64, rewards and
+                terminals float32 (batch,)
+        """
+        # the oldest frames of the window of a transition must not be overwritten
+        low = max(self.total - self.capacity + self.history, 0)
+        ends = np.random.randint(low, self.total, size=batch_size)
+        invalid = ~self.is_transition[ends % self.capacity]
+        while invalid.any():
+            ends[invalid] = np.random.randint(low, self.total, size=invalid.sum())
+            invalid = ~self.is_transition[ends % self.capacity]
+        window = self._stacks(ends, self.history + 1)
+        slots = ends % self.capacity
+        return (
+            window[:, :-1],
+            self.actions[slots],
+            self.rewards[slots],
+            window[:, 1:],
+            self.terminals[slots],
+        )
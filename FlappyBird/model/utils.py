@@ -10,3 +10,9 @@ def pre_processing(image, width, height):
     image = cv2.cvtColor(cv2.resize(image, (width, height)), cv2.COLOR_BGR2GRAY)
     _, image = cv2.threshold(image, 1, 255, cv2.THRESH_BINARY)
     return image[None, :, :].astype(np.float32)
+
+
+def crop_pre_processing(image, image_size, crop_width, crop_height):
+    """Crops a game frame to the playing area above the base and preprocesses it,
+    use with functools.partial as the ``preprocess`` of VectorGameState."""
+    return pre_processing(image[:crop_width, :crop_height], image_size, image_size)
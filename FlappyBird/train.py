@@ -4,13 +4,15 @@
 """
 import argparse
 import os
-from random import random, randint, sample
+import time
+from random import random, randint
 
 import numpy as np
 import oneflow as flow
 
 from model.deep_q_network import DeepQNetwork
 from game.wrapped_flappy_bird import GameState
+from model.replay_memory import ReplayMemory
 from model.utils import pre_processing
 
 
@@ -39,7 +41,19 @@ def get_args():
         "--replay_memory_size",
         type=int,
         default=50000,
-        help="Number of epoches between testing phases",
+        help="Number of transitions kept in the replay memory",
+    )
+    parser.add_argument(
+        "--target_update_interval",
+        type=int,
+        default=0,
+        help="Iterations between target network syncs, 0 uses the online network",
+    )
+    parser.add_argument(
+        "--print_interval", type=int, default=1, help="Iterations between logs"
+    )
+    parser.add_argument(
+        "--headless", action="store_true", help="Run the game without a display"
     )
     parser.add_argument("--save_checkpoint_path", type=str, default="checkpoints")
 
@@ -47,6 +61,11 @@ def get_args():
     return args
 
 
+def to_cuda_float(frames):
+    # copy uint8 to the device and convert there, 4x less host to device traffic
+    return flow.cast(flow.tensor(frames, device="cuda"), flow.float32)
+
+
 def train(opt):
 
     # Step 1: init BrainDQN
@@ -56,8 +75,15 @@ def train(opt):
     criterion = flow.nn.MSELoss()
     criterion.to("cuda")
 
+    target_model = None
+    if opt.target_update_interval > 0:
+        target_model = DeepQNetwork()
+        target_model.to("cuda")
+        target_model.load_state_dict(model.state_dict())
+        target_model.eval()
+
     # Step 2: init Flappy Bird Game
-    game_state = GameState()
+    game_state = GameState(headless=opt.headless)
     # Step 3: play game
     # image.shape = (288,512,3), reward: float, terminal: boolean
     image, reward, terminal = game_state.frame_step(0)
@@ -67,12 +93,15 @@ def train(opt):
         opt.image_size,
         opt.image_size,
     )
-    image = flow.Tensor(image, dtype=flow.float32)
-    image = image.to("cuda")
-    state = flow.cat(tuple(image for _ in range(4))).unsqueeze(0)
+    # frames are stored once as uint8, states are rebuilt from the last 4
+    replay_memory = ReplayMemory(
+        opt.replay_memory_size, (opt.image_size, opt.image_size), history=4
+    )
+    replay_memory.reset(image)
+    state = to_cuda_float(replay_memory.current_state())
 
-    replay_memory = []
     iter = 0
+    start_t = time.time()
     # Step 4: run the game
     while iter < opt.num_iters:
         model.train()
@@ -98,43 +127,30 @@ def train(opt):
             opt.image_size,
             opt.image_size,
         )
-        next_image = flow.Tensor(next_image)
-        next_image = next_image.to("cuda")
-        next_state = flow.cat((state[0, 1:, :, :], next_image)).unsqueeze(0)
-
-        replay_memory.append([state, action, reward, next_state, terminal])
-        if len(replay_memory) > opt.replay_memory_size:
-            del replay_memory[0]
-        batch = sample(replay_memory, min(len(replay_memory), opt.batch_size))
-        state_batch, action_batch, reward_batch, next_state_batch, terminal_batch = zip(
-            *batch
-        )
-
-        state_batch = flow.cat(tuple(state for state in state_batch))
-        action_batch = flow.Tensor(
-            np.array(
-                [[1, 0] if action == 0 else [0, 1] for action in action_batch],
-                dtype=np.float32,
-            )
-        )
-        reward_batch = flow.Tensor(np.array(reward_batch, dtype=np.float32)[:, None])
-        next_state_batch = flow.cat(tuple(state for state in next_state_batch))
+        replay_memory.push(action, reward, next_image, terminal)
+
+        (
+            state_batch,
+            action_batch,
+            reward_batch,
+            next_state_batch,
+            terminal_batch,
+        ) = replay_memory.sample(min(len(replay_memory), opt.batch_size))
+
+        state_batch = to_cuda_float(state_batch)
+        next_state_batch = to_cuda_float(next_state_batch)
+        action_batch = flow.Tensor(np.eye(2, dtype=np.float32)[action_batch]).to("cuda")
+        reward_batch = flow.Tensor(reward_batch).to("cuda")
+        terminal_batch = flow.Tensor(terminal_batch).to("cuda")
 
-        state_batch = state_batch.to("cuda")
-        action_batch = action_batch.to("cuda")
-        reward_batch = reward_batch.to("cuda")
-        next_state_batch = next_state_batch.to("cuda")
         current_prediction_batch = model(state_batch)
-        next_prediction_batch = model(next_state_batch)
-
-        y_batch = flow.cat(
-            tuple(
-                reward_batch[i]
-                if terminal_batch[i]
-                else reward_batch[i] + opt.gamma * flow.max(next_prediction_batch[i])
-                for i in range(reward_batch.shape[0])
+        with flow.no_grad():
+            next_model = model if target_model is None else target_model
+            next_prediction_batch = next_model(next_state_batch)
+            # r for terminal transitions, r + gamma * max_a Q(s', a) otherwise
+            y_batch = reward_batch + opt.gamma * (1.0 - terminal_batch) * flow.max(
+                next_prediction_batch, dim=1
             )
-        )
 
         q_value = flow.sum(current_prediction_batch * action_batch, dim=1)
 
@@ -143,20 +159,27 @@ def train(opt):
         optimizer.step()
         optimizer.zero_grad()
 
-        state = next_state
+        state = to_cuda_float(replay_memory.current_state())
         iter += 1
 
-        print(
-            "Iteration: {}/{}, Action: {}, Loss: {}, Epsilon {}, Reward: {}, Q-value: {}".format(
-                iter + 1,
-                opt.num_iters,
-                action,
-                loss.numpy(),
-                epsilon,
-                reward,
-                flow.max(prediction).numpy()[0],
+        if target_model is not None and iter % opt.target_update_interval == 0:
+            target_model.load_state_dict(model.state_dict())
+
+        if iter % opt.print_interval == 0:
+            end_t = time.time()
+            print(
+                "Iteration: {}/{}, Action: {}, Loss: {}, Epsilon {}, Reward: {}, Q-value: {}, Steps/s: {:.1f}".format(
+                    iter + 1,
+                    opt.num_iters,
+                    action,
+                    loss.numpy(),
+                    epsilon,
+                    reward,
+                    flow.max(prediction).numpy()[0],
+                    opt.print_interval / (end_t - start_t),
+                )
             )
-        )
+            start_t = end_t
 
         if (iter + 1) % 100000 == 0:
             flow.save(
@@ -0,0 +1,155 @@
+import argparse
+import time
+
+import numpy as np
+import oneflow as flow
+
+from model import LSTMText
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser("flags for compare LSTMText throughput")
+    parser.add_argument("--emb_dim", type=int, default=100)
+    parser.add_argument("--hidden_size", type=int, default=256)
+    parser.add_argument("--sequence_length", type=int, default=128)
+    parser.add_argument("--train_batch_size", type=int, default=32)
+    parser.add_argument("--infer_batch_size", type=int, default=1)
+    parser.add_argument("--iters", type=int, default=20, help="timed iterations")
+    return parser.parse_args()
+
+
+def reverse(inputs, dim=0):
+    # previous implementation, host round trip kept as reference
+    temp = inputs.numpy()
+    if dim == 0:
+        temp = temp[::-1, :, :]
+    elif dim == 1:
+        temp = temp[:, ::-1, :]
+    reserve_inputs = flow.Tensor(temp.copy()).to("cuda")
+    return reserve_inputs
+
+
+def _legacy_lstm(x, W, U, bias, init_states):
+    h_t, c_t = init_states
+    HS = U.shape[0]
+    hidden_seq = []
+    for t in range(x.shape[1]):
+        x_t = x[:, t, :].reshape(x.shape[0], x.shape[2])
+        gates = flow.matmul(x_t, W) + flow.matmul(h_t, U) + bias
+        i_t, f_t, g_t, o_t = (
+            flow.sigmoid(gates[:, :HS]),
+            flow.sigmoid(gates[:, HS : HS * 2]),
+            flow.tanh(gates[:, HS * 2 : HS * 3]),
+            flow.sigmoid(gates[:, HS * 3 :]),
+        )
+        c_t = f_t * c_t + i_t * g_t
+        h_t = o_t * flow.tanh(c_t)
+        hidden_seq.append(h_t.unsqueeze(0))
+    return flow.cat(hidden_seq, dim=0)
+
+
+def legacy_forward(model, inputs):
+    """Previous LSTMText forward: per-step cells, host reversal and per-text
+    classifier input, run on the weights of the fused layer."""
+    data = model.embedding(inputs)
+    lstm = model.bilstm.lstm
+    batch_size = data.shape[0]
+    gate_size = 4 * lstm.hidden_size
+    out = [data, reverse(data, dim=1)]
+    for l, suffix in enumerate(["", "_reverse"]):
+        init_states = (
+            flow.zeros((batch_size, lstm.hidden_size)).to(data.device),
+            flow.zeros((batch_size, lstm.hidden_size)).to(data.device),
+        )
+        out[l] = _legacy_lstm(
+            out[l],
+            lstm.W_l0[:, l * gate_size : (l + 1) * gate_size],
+            getattr(lstm, "U_l0" + suffix),
+            lstm.bias_ih_l0[l * gate_size : (l + 1) * gate_size],
+            init_states,
+        )
+        if l == 1:
+            out[l] = reverse(out[l], dim=0)
+    data = flow.cat(out, 2)
+    datalist = []
+    for t in range(batch_size):
+        data_t = data[:, t, :].reshape(1, -1)
+        datalist.append(data_t.unsqueeze(0))
+    data = flow.cat(datalist, dim=0)
+    logits = model.linear(data).squeeze(1)
+    return model.softmax(logits)
+
+
+def _fake_texts(batch_size, sequence_length):
+    # post padded texts of random lengths, like pad_sequences builds them
+    lengths = np.random.randint(sequence_length // 4, sequence_length + 1, batch_size)
+    texts = np.random.randint(2, 50000, (batch_size, sequence_length))
+    texts[np.arange(sequence_length)[None, :] >= lengths[:, None]] = 0
+    return flow.Tensor(texts.astype(np.int32), dtype=flow.int32).to("cuda")
+
+
+def _throughput(step, batch_size, iters):
+    for _ in range(3):
+        step()
+    start_t = time.time()
+    for _ in range(iters):
+        step()
+    return batch_size * iters / (time.time() - start_t)
+
+
+def main(args):
+    model = LSTMText(
+        50000,
+        args.emb_dim,
+        hidden_size=args.hidden_size,
+        nfc=args.sequence_length,
+        n_classes=2,
+        batch_size=args.train_batch_size,
+    )
+    model.to("cuda")
+    criterion = flow.nn.CrossEntropyLoss().to("cuda")
+    of_adam = flow.optim.Adam(model.parameters(), 3e-4)
+
+    train_texts = _fake_texts(args.train_batch_size, args.sequence_length)
+    train_labels = flow.Tensor(
+        np.random.randint(0, 2, args.train_batch_size).astype(np.int32),
+        dtype=flow.int32,
+    ).to("cuda")
+    infer_texts = _fake_texts(args.infer_batch_size, args.sequence_length)
+
+    def train_step(forward):
+        def step():
+            loss = criterion(forward(train_texts), train_labels)
+            loss.backward()
+            of_adam.step()
+            of_adam.zero_grad()
+            loss.numpy()
+
+        return step
+
+    def infer_step(forward):
+        def step():
+            with flow.no_grad():
+                forward(infer_texts).numpy()
+
+        return step
+
+    implementations = [
+        ("per-step, host reverse", lambda texts: legacy_forward(model, texts)),
+        ("fused_rnn.LSTM", model),
+    ]
+    for name, forward in implementations:
+        model.train()
+        train = _throughput(train_step(forward), args.train_batch_size, args.iters)
+        model.eval()
+        infer = _throughput(infer_step(forward), args.infer_batch_size, args.iters)
+        print(
+            "{:<24} train {:.1f} texts/s (batch {}), infer {:.1f} texts/s (batch {})".format(
+                name, train, args.train_batch_size, infer, args.infer_batch_size
+            )
+        )
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    main(args)
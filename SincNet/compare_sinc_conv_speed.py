@@ -0,0 +1,82 @@
+"""
+Eval mode forward latency of SincConv_fast on short windows, building the
+filter bank on every call against the cached one. Run from the SincNet
+directory.
+"""
+import argparse
+import time
+
+import numpy as np
+import oneflow as flow
+import oneflow.nn.functional as F
+
+from model.dnn_models import SincConv_fast
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser("flags for SincConv eval speed")
+    parser.add_argument("--n_filt", type=int, default=80)
+    parser.add_argument("--len_filt", type=int, default=251)
+    parser.add_argument("--fs", type=int, default=16000)
+    parser.add_argument(
+        "--wlen", type=int, nargs="+", default=[400, 1600, 3200], help="samples"
+    )
+    parser.add_argument("--batch_size", type=int, nargs="+", default=[1, 16])
+    parser.add_argument("--iters", type=int, default=200)
+    parser.add_argument("--device", type=str, default="cuda")
+    return parser.parse_args()
+
+
+def rebuild_forward(conv, x):
+    # the forward before the cache, filters computed on every call
+    filters = conv.compute_filters()
+    return F.conv1d(
+        x,
+        filters,
+        stride=[conv.stride],
+        padding=[conv.padding],
+        dilation=[conv.dilation],
+        bias=None,
+        groups=1,
+    )
+
+
+def _latency_ms(forward, x, iters):
+    for _ in range(5):
+        forward(x).numpy()
+    start = time.time()
+    for _ in range(iters):
+        # numpy() waits for the device
+        forward(x).numpy()
+    return (time.time() - start) / iters * 1000
+
+
+def main(args):
+    conv = SincConv_fast(args.n_filt, args.len_filt, args.fs)
+    conv.to(args.device)
+    conv.eval()
+
+    print("| batch | wlen | rebuilt filters (ms) | cached filters (ms) | speedup |")
+    print("|---|---|---|---|---|")
+    with flow.no_grad():
+        for batch_size in args.batch_size:
+            for wlen in args.wlen:
+                x = flow.tensor(
+                    np.random.randn(batch_size, 1, wlen).astype(np.float32),
+                    device=args.device,
+                )
+                # same filters both ways
+                assert np.allclose(
+                    conv(x).numpy(), rebuild_forward(conv, x).numpy(), atol=1e-5
+                )
+                rebuilt = _latency_ms(lambda x: rebuild_forward(conv, x), x, args.iters)
+                cached = _latency_ms(conv, x, args.iters)
+                print(
+                    "| {} | {} | {:.3f} | {:.3f} | {:.2f}x |".format(
+                        batch_size, wlen, rebuilt, cached, rebuilt / cached
+                    )
+                )
+
+
+if __name__ == "__main__":
+    main(_parse_args())
@@ -102,33 +102,40 @@ class SincConv_fast(nn.Module):
         n_lin = flow.Tensor(
             np.linspace(0, (self.kernel_size / 2) - 1, int((self.kernel_size / 2)))
         )
-        self.window_ = 0.54 - 0.46 * flow.cos(2 * math.pi * n_lin / self.kernel_size)
+        # buffers follow the module to its device, not saved in the state dict
+        self.register_buffer(
+            "window_",
+            0.54 - 0.46 * flow.cos(2 * math.pi * n_lin / self.kernel_size),
+            persistent=False,
+        )
 
         # (1, kernel_size/2)
         n = (self.kernel_size - 1) / 2.0
-        self.n_ = (
+        self.register_buffer(
+            "n_",
             2
             * math.pi
             * flow.Tensor(
                 np.arange(-n, 0).reshape(1, -1) / self.sample_rate, dtype=flow.float32
-            )
+            ),
+            persistent=False,
         )
 
-    def forward(self, waveforms):
-        """
-        Parameters
-        ----------
-        waveforms : `torch.Tensor` (batch_size, 1, n_samples)
-            Batch of waveforms.
-        Returns
-        -------
-        features : `torch.Tensor` (batch_size, out_channels, n_samples_out)
-            Batch of sinc filters activations.
-        """
-        self.n_ = self.n_.to(waveforms.device)
+        # filters of the last eval mode forward, constant until the
+        # parameters are loaded or the training mode changes
+        self._filters = None
 
-        self.window_ = self.window_.to(waveforms.device)
+    def train(self, mode=True):
+        self._filters = None
+        return super(SincConv_fast, self).train(mode)
 
+    def _load_from_state_dict(self, *args, **kwargs):
+        self._filters = None
+        return super(SincConv_fast, self)._load_from_state_dict(*args, **kwargs)
+
+    def compute_filters(self):
+        """Band-pass filters (out_channels, 1, kernel_size) of the current
+        cutoff frequencies."""
         low = self.min_low_hz + flow.abs(self.low_hz_)
 
         high = flow.clamp(
@@ -151,7 +158,27 @@ class SincConv_fast(nn.Module):
 
         band_pass = band_pass / (2 * band[:, None])
 
-        self.filters = (band_pass).reshape(self.out_channels, 1, self.kernel_size)
+        return (band_pass).reshape(self.out_channels, 1, self.kernel_size)
+
+    def forward(self, waveforms):
+        """
+        Parameters
+        ----------
+        waveforms : `torch.Tensor` (batch_size, 1, n_samples)
+            Batch of waveforms.
+        Returns
+        -------
+        features : `torch.Tensor` (batch_size, out_channels, n_samples_out)
+            Batch of sinc filters activations.
+        """
+        if self.training:
+            self.filters = self.compute_filters()
+        else:
+            # the filter bank only depends on the parameters, build it once
+            if self._filters is None or self._filters.device != waveforms.device:
+                with flow.no_grad():
+                    self._filters = self.compute_filters()
+            self.filters = self._filters
 
         output = F.conv1d(
             waveforms,
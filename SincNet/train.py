@@ -5,14 +5,20 @@ import os
 import sys
 
 import numpy as np
-import soundfile as sf
 import oneflow as flow
 import oneflow.nn as nn
 import oneflow.optim as optim
 
 from model.dnn_models import MLP
 from model.SincNet import SincNet as CNN
-from utils.data_utils import ReadList, read_conf, str_to_bool, create_batches_rnd
+from utils.data_utils import (
+    ReadList,
+    read_conf,
+    str_to_bool,
+    create_batches_store,
+    evaluate_sentences,
+    open_waveform_store,
+)
 
 
 # Reading cfg file
@@ -92,8 +98,8 @@ cost.to("cuda")
 wlen = int(fs * cw_len / 1000.00)  # 3200
 wshift = int(fs * cw_shift / 1000.00)
 
-# Batch_dev
-Batch_dev = 128
+# windows per forward pass during evaluation
+Batch_dev = options.batch_dev
 
 # Feature extractor CNN
 CNN_arch = {
@@ -116,6 +122,17 @@ CNN_net.to("cuda")
 # Loading label dictionary
 lab_dict = np.load(class_dict_file, allow_pickle=True).item()
 
+# utterances packed once into memory mapped arrays
+store_tr = open_waveform_store(
+    os.path.join(data_folder, "waveform_store_tr"), data_folder, wav_lst_tr, lab_dict
+)
+store_te = open_waveform_store(
+    os.path.join(data_folder, "waveform_store_te"), data_folder, wav_lst_te, lab_dict
+)
+batches_tr = create_batches_store(
+    store_tr, batch_size, wlen, 0.2, prefetch_batches=options.prefetch_batches
+)
+
 DNN1_arch = {
     "input_dim": CNN_net.out_dim,
     "fc_lay": fc_lay,
@@ -157,9 +174,7 @@ for epoch in range(N_epochs):
     err_sum = 0
 
     for i in range(N_batches):
-        [inp, lab] = create_batches_rnd(
-            batch_size, data_folder, wav_lst_tr, snt_tr, wlen, lab_dict, 0.2
-        )
+        [inp, lab] = next(batches_tr)
 
         pout = DNN2_net(DNN1_net(CNN_net(inp)))
         pred = flow.argmax(pout, dim=1)
@@ -196,66 +211,15 @@ for epoch in range(N_epochs):
         CNN_net.eval()
         DNN1_net.eval()
         DNN2_net.eval()
-        loss_sum = 0
-        err_sum = 0
-        err_sum_snt = 0
 
         with flow.no_grad():
-            for i in range(snt_te):
-                [signal, fs] = sf.read(data_folder + wav_lst_te[i])
-
-                signal = flow.Tensor(signal, dtype=flow.float32).to("cuda")
-                lab_batch = lab_dict[wav_lst_te[i].lower()]
-
-                # split signals into chunks
-                beg_samp = 0
-                end_samp = wlen
-
-                N_fr = int((signal.shape[0] - wlen) / (wshift))
-
-                sig_arr = flow.zeros((Batch_dev, wlen), dtype=flow.float32).to("cuda")
-                lab = (flow.zeros(N_fr + 1) + lab_batch).to("cuda").long()
-                pout = flow.zeros((N_fr + 1, class_lay[-1]), dtype=flow.float32).to(
-                    "cuda"
-                )
-                count_fr = 0
-                count_fr_tot = 0
-                while end_samp < signal.shape[0]:
-                    sig_arr[count_fr, :] = signal[beg_samp:end_samp]
-                    beg_samp = beg_samp + wshift
-                    end_samp = beg_samp + wlen
-                    count_fr = count_fr + 1
-                    count_fr_tot = count_fr_tot + 1
-                    if count_fr == Batch_dev:
-                        inp = flow.Tensor(sig_arr).to(sig_arr.device)
-                        pout[count_fr_tot - Batch_dev : count_fr_tot, :] = DNN2_net(
-                            DNN1_net(CNN_net(inp))
-                        )
-                        count_fr = 0
-                        sig_arr = flow.zeros((Batch_dev, wlen), dtype=flow.float32).to(
-                            "cuda"
-                        )
-
-                if count_fr > 0:
-                    inp = flow.Tensor(sig_arr[0:count_fr]).to(sig_arr.device)
-                    pout[count_fr_tot - count_fr : count_fr_tot, :] = DNN2_net(
-                        DNN1_net(CNN_net(inp))
-                    )
-
-                pred = flow.argmax(pout, dim=1)
-                loss = cost(pout, lab.long())
-
-                err = np.mean(pred.numpy() != lab.long().numpy())
-
-                best_class = flow.argmax(flow.sum(pout, dim=0), dim=0)
-                err_sum_snt = err_sum_snt + (best_class.numpy() != lab[0].numpy())
-
-                loss_sum = loss_sum + loss.detach()
-                err_sum = err_sum + err
-
-            err_tot_dev_snt = err_sum_snt / snt_te
-            loss_tot_dev = loss_sum / snt_te
-            err_tot_dev = err_sum / snt_te
+            loss_tot_dev, err_tot_dev, err_tot_dev_snt = evaluate_sentences(
+                lambda x: DNN2_net(DNN1_net(CNN_net(x))),
+                store_te,
+                wlen,
+                wshift,
+                Batch_dev,
+            )
 
         print(
             "epoch %i, loss_tr=%f err_tr=%f loss_te=%f err_te=%f err_te_snt=%f"
@@ -263,7 +227,7 @@ for epoch in range(N_epochs):
                 epoch,
                 loss_tot.numpy(),
                 err_tot,
-                loss_tot_dev.numpy(),
+                loss_tot_dev,
                 err_tot_dev,
                 err_tot_dev_snt,
             )
@@ -276,7 +240,7 @@ for epoch in range(N_epochs):
                     epoch,
                     loss_tot.numpy(),
                     err_tot,
-                    loss_tot_dev.numpy(),
+                    loss_tot_dev,
                     err_tot_dev,
                     err_tot_dev_snt,
                 )
@@ -1,4 +1,5 @@
 import configparser as ConfigParser
+import sys
 from optparse import OptionParser
 
 import numpy as np
@@ -6,6 +7,9 @@ import oneflow as flow
 import oneflow.nn as nn
 import soundfile as sf
 
+sys.path.append("../")
+from waveform_store import WaveformStore
+
 
 def ReadList(list_file):
     f = open(list_file, "r")
@@ -21,6 +25,18 @@ def read_conf():
 
     parser = OptionParser()
     parser.add_option("--cfg")
+    parser.add_option(
+        "--prefetch_batches",
+        type="int",
+        default=4,
+        help="training batches prepared ahead in a background thread, 0 disables",
+    )
+    parser.add_option(
+        "--batch_dev",
+        type="int",
+        default=512,
+        help="frames per forward pass during evaluation",
+    )
     (options, args) = parser.parse_args()
     cfg_file = options.cfg
     Config = ConfigParser.ConfigParser()
@@ -185,6 +201,118 @@ def create_batches_rnd(
     return inp, lab
 
 
+def open_waveform_store(store_dir, data_folder, wav_lst, lab_dict):
+    """Packs the utterances of ``wav_lst`` with their labels into a memory
+    mapped store on first use, see ``waveform_store.pack_waveforms``."""
+    return WaveformStore.open_or_pack(
+        store_dir,
+        [data_folder + wav for wav in wav_lst],
+        [lab_dict[wav.lower()] for wav in wav_lst],
+    )
+
+
+def create_batches_store(store, batch_size, wlen, fact_amp, prefetch_batches=0):
+    """Yields (inp, lab) batches like create_batches_rnd, gathered from a
+    WaveformStore, ``prefetch_batches`` ahead in a background thread if not 0."""
+    for sig_batch, lab_batch in store.iter_batches(
+        batch_size, wlen, fact_amp, prefetch_batches
+    ):
+        inp = flow.Tensor(sig_batch, dtype=flow.float32).to("cuda")
+        lab = flow.Tensor(lab_batch, dtype=flow.float32).to("cuda")
+        yield inp, lab
+
+
+def frame_signal(signal, wlen, wshift):
+    """All ``wlen`` windows of ``signal`` with a ``wshift`` hop ending before
+    its last sample, as a read-only (N_fr, wlen) strided view."""
+    N_fr = (signal.shape[0] - wlen - 1) // wshift + 1
+    if N_fr <= 0:
+        raise ValueError(
+            "signal of %d samples is shorter than a window" % signal.shape[0]
+        )
+    step = signal.strides[0]
+    return np.lib.stride_tricks.as_strided(
+        signal, shape=(N_fr, wlen), strides=(step * wshift, step), writeable=False
+    )
+
+
+def iter_eval_batches(store, wlen, wshift, batch_frames):
+    """Groups the windows of consecutive utterances of a WaveformStore until
+    at least ``batch_frames`` windows are collected.
+
+    Yields:
+        (np.array, np.array, np.array): windows (N, wlen) float32, window
+            count (U,) and label (U,) of the utterances of the group
+    """
+    frames, N_fr, snt_ids = [], [], []
+    for i in range(len(store)):
+        frames.append(frame_signal(store.get(i), wlen, wshift))
+        N_fr.append(frames[-1].shape[0])
+        snt_ids.append(i)
+        if sum(N_fr) >= batch_frames or i == len(store) - 1:
+            yield np.concatenate(frames), np.array(N_fr), store.labels[snt_ids]
+            frames, N_fr, snt_ids = [], [], []
+
+
+def evaluate_sentences(forward, store, wlen, wshift, batch_frames):
+    """Sliding window evaluation of every utterance of a WaveformStore.
+
+    Windows of several utterances are classified together, ``batch_frames``
+    per forward pass, the per-utterance reductions and the sentence vote
+    (sum of the window log probabilities) run on the device as products with
+    a (utterances, windows) segment matrix.
+
+    Args:
+        forward (callable): windows (N, wlen) -> log probabilities (N, classes)
+        store (WaveformStore): utterances with their labels
+        wlen, wshift (int): window length and hop in samples
+        batch_frames (int): windows per forward pass
+
+    Returns:
+        (float, float, float): window NLL, window error rate and sentence
+            error rate, each averaged over the utterances
+    """
+    loss_sum = err_sum = err_sum_snt = 0
+    for frames, N_fr, labels in iter_eval_batches(store, wlen, wshift, batch_frames):
+        inp = flow.Tensor(frames, dtype=flow.float32).to("cuda")
+        pout = flow.cat(
+            [
+                forward(inp[beg : beg + batch_frames])
+                for beg in range(0, frames.shape[0], batch_frames)
+            ],
+            dim=0,
+        )
+
+        seg = flow.Tensor(
+            np.repeat(np.eye(len(N_fr), dtype=np.float32), N_fr, axis=1)
+        ).to("cuda")
+        lab_onehot = flow.Tensor(np.eye(pout.shape[1], dtype=np.float32)[labels]).to(
+            "cuda"
+        )
+        lab = flow.Tensor(np.repeat(labels, N_fr)).to("cuda").long()
+        lab_snt = flow.Tensor(labels).to("cuda").long()
+        N_fr = flow.Tensor(N_fr.astype(np.float32)).to("cuda")
+
+        # summed log probabilities of every utterance, (utterances, classes)
+        pout_snt = flow.matmul(seg, pout)
+        loss_sum = loss_sum + flow.sum(-flow.sum(pout_snt * lab_onehot, dim=1) / N_fr)
+        err = flow.cast(flow.argmax(pout, dim=1) != lab, flow.float32)
+        err_sum = err_sum + flow.sum(
+            flow.matmul(seg, err.unsqueeze(1)).squeeze(1) / N_fr
+        )
+        best_class = flow.argmax(pout_snt, dim=1)
+        err_sum_snt = err_sum_snt + flow.sum(
+            flow.cast(best_class != lab_snt, flow.float32)
+        )
+
+    N_snt = len(store)
+    return (
+        loss_sum.numpy().item() / N_snt,
+        err_sum.numpy().item() / N_snt,
+        err_sum_snt.numpy().item() / N_snt,
+    )
+
+
 def flip(x, dim):
     xsize = x.size()
     dim = x.dim() + dim if dim < 0 else dim
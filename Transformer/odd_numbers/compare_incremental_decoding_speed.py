@@ -0,0 +1,106 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+import oneflow as flow
+
+sys.path.append("../")
+from model import TransformerModel
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        "flags for compare full re-run and kv-cached decoding speed"
+    )
+    parser.add_argument("--vocab_sz", type=int, default=10000)
+    parser.add_argument("--d_model", type=int, default=512)
+    parser.add_argument("--n_head", type=int, default=2)
+    parser.add_argument("--n_encoder_layers", type=int, default=1)
+    parser.add_argument("--n_decoder_layers", type=int, default=1)
+    parser.add_argument("--dim_feedforward", type=int, default=128)
+    parser.add_argument("--load_dir", type=str, default=".")
+    parser.add_argument("--batch_size", type=int, default=128)
+    parser.add_argument("--max_len", type=int, default=32, help="decoded tokens")
+    parser.add_argument("--beam_size", type=int, default=4)
+    parser.add_argument("--iters", type=int, default=5, help="timed iterations")
+    return parser.parse_args()
+
+
+def full_rerun_decode(model, src, max_len):
+    """Previous decoding loop, batched: encoder and decoder re-run on the
+    whole prefix for every new token."""
+    pred = flow.tensor(np.zeros((1, src.shape[1]), dtype=np.int64)).to(src.device)
+    for _ in range(max_len):
+        output = model(src, pred)
+        pred = flow.cat([pred, output.argmax(2)[pred.shape[0] - 1].unsqueeze(0)], 0)
+    return pred.numpy()
+
+
+def _timed(decode, iters):
+    result = decode()
+    start_t = time.time()
+    for _ in range(iters):
+        decode()
+    return result, (time.time() - start_t) / iters
+
+
+def main(args):
+    model = TransformerModel(
+        input_sz=args.vocab_sz,
+        output_sz=args.vocab_sz,
+        d_model=args.d_model,
+        nhead=args.n_head,
+        num_encoder_layers=args.n_encoder_layers,
+        num_decoder_layers=args.n_decoder_layers,
+        dim_feedforward=args.dim_feedforward,
+        dropout=0.0,
+    )
+    if args.load_dir != ".":
+        model.load_state_dict(flow.load(args.load_dir))
+    model.to("cuda")
+    model.eval()
+
+    s = np.random.randint(1, args.vocab_sz // 2 - 3, args.batch_size)
+    src = flow.tensor((s[None, :] + np.arange(3)[:, None]) * 2, dtype=flow.int64).to(
+        "cuda"
+    )
+    tokens = args.batch_size * args.max_len
+    with flow.no_grad():
+        reference, full_time = _timed(
+            lambda: full_rerun_decode(model, src, args.max_len), args.iters
+        )
+        greedy, greedy_time = _timed(
+            lambda: model.greedy_decode(src, args.max_len), args.iters
+        )
+        _, beam_time = _timed(
+            lambda: model.beam_search(src, args.max_len, args.beam_size), args.iters
+        )
+
+    print("same tokens as the full re-run: {}".format((reference == greedy).all()))
+    # every other source ends with padding
+    padded = src.numpy()
+    padded[-1, ::2] = 0
+    padded = flow.tensor(padded, dtype=flow.int64).to("cuda")
+    with flow.no_grad():
+        same = (
+            full_rerun_decode(model, padded, args.max_len)
+            == model.greedy_decode(padded, args.max_len)
+        ).all()
+    print("same tokens as the full re-run on padded sources: {}".format(same))
+    print("full re-run greedy: {:.1f} tokens/s".format(tokens / full_time))
+    print(
+        "kv-cached greedy: {:.1f} tokens/s, {:.2f}x".format(
+            tokens / greedy_time, full_time / greedy_time
+        )
+    )
+    print(
+        "kv-cached beam search (beam {}): {:.1f} tokens/s".format(
+            args.beam_size, tokens / beam_time
+        )
+    )
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    main(args)
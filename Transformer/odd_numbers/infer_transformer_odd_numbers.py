@@ -64,12 +64,9 @@ def main():
 
     input_nums = [num + i * 2 for i in range(MAX_LEN)]
     src = to_cuda(flow.tensor(input_nums)).unsqueeze(1)
-    pred = [0]
-    for i in range(MAX_LEN):
-        inp = to_cuda(flow.tensor(pred)).unsqueeze(1)
-        output = model(src, inp)
-        out_num = output.argmax(2)[-1].numpy()[0]
-        pred.append(out_num)
+    model.eval()
+    with flow.no_grad():
+        pred = model.greedy_decode(src, MAX_LEN)[:, 0].tolist()
     print("input:", input_nums)
     print("pred:", pred)
 
@@ -43,8 +43,9 @@ class PositionalEncoding(nn.Module):
         pe = pe.unsqueeze(0).transpose(0, 1)
         self.pe = flow.nn.Parameter(pe, requires_grad=False)
 
-    def forward(self, x):
-        x = x + self.pe[: x.size(0), :]
+    def forward(self, x, offset=0):
+        # offset: position of the first step of x, for incremental decoding
+        x = x + self.pe[offset : offset + x.size(0), :]
         return self.dropout(x)
 
 
@@ -71,6 +72,7 @@ class TransformerModel(nn.Module):
             batch_first=False,
         )
         self.softmax = nn.Softmax(dim=2)
+        self.log_softmax = nn.LogSoftmax(dim=1)
         self.linear = nn.Linear(d_model, output_sz)
         self.pos_encoder = PositionalEncoding(d_model, dropout)
         self.pos_decoder = PositionalEncoding(d_model, dropout)
@@ -127,3 +129,79 @@ class TransformerModel(nn.Module):
         )
         out = self.linear(out)
         return out
+
+    def encode(self, src):
+        """Encoder memory of src (src_len, bsz), computed once for the whole
+        decoding.
+
+        Like ``forward``, the padding of src is masked in the encoder only:
+        ``forward`` leaves ``memory_key_padding_mask`` None, so the cached
+        decoder attends to the whole memory as well.
+        """
+        src_key_padding_mask = self.make_len_mask(src)
+        src_key_padding_mask = to_cuda(src_key_padding_mask, where=src.device)
+        src = self.pos_encoder(self.src_embedding(src))
+        return self.transformer.encoder(src, None, src_key_padding_mask)
+
+    def decode_step(self, tokens, step, state):
+        """Logits (bsz, output_sz) following ``tokens`` (bsz,), the tokens at
+        position ``step``, extending the cached decoder ``state``."""
+        tgt = self.tgt_embedding(tokens.unsqueeze(0))
+        tgt = self.pos_decoder(tgt, offset=step)
+        out = self.transformer.decoder.forward_step(tgt, state)
+        return self.linear(out[0])
+
+    def greedy_decode(self, src, max_len, sos=0):
+        """Greedy decoding of a batch src (src_len, bsz) with cached keys and
+        values, returns the (max_len + 1, bsz) tokens starting with sos."""
+        memory = self.encode(src)
+        state = self.transformer.decoder.init_state(memory)
+        tokens = to_cuda(
+            flow.tensor([sos] * src.shape[1], dtype=flow.int64), where=src.device
+        )
+        outputs = [tokens.unsqueeze(0)]
+        for step in range(max_len):
+            tokens = self.decode_step(tokens, step, state).argmax(1)
+            outputs.append(tokens.unsqueeze(0))
+        # a single copy to the host
+        return flow.cat(outputs, dim=0).numpy()
+
+    def beam_search(self, src, max_len, beam_size=4, sos=0):
+        """Beam search over a batch src (src_len, bsz), returns the
+        (max_len + 1, bsz) tokens of the best beam of every sentence.
+
+        The beam_size beams of all the sentences are decoded together as
+        contiguous rows sharing the memory of their sentence, only the
+        (bsz, beam_size) best candidates of a step are copied to the host.
+        """
+        bsz = src.shape[1]
+        memory = self.encode(src)
+        src_len = memory.shape[0]
+        memory = flow.cat([memory.unsqueeze(2)] * beam_size, dim=2).reshape(
+            src_len, bsz * beam_size, -1
+        )
+        state = self.transformer.decoder.init_state(memory)
+
+        # the beams of a sentence start identical, keep only the first one live
+        scores = np.tile([0.0] + [-1e9] * (beam_size - 1), bsz)
+        history = np.full((bsz * beam_size, 1), sos, dtype=np.int64)
+        first_rows = np.repeat(np.arange(bsz) * beam_size, beam_size)
+        tokens = to_cuda(flow.tensor(history[:, 0]), where=src.device)
+        for step in range(max_len):
+            log_probs = self.log_softmax(self.decode_step(tokens, step, state))
+            candidates = log_probs + to_cuda(
+                flow.tensor(scores[:, None].astype(np.float32)), where=src.device
+            )
+            n_words = log_probs.shape[1]
+            top_scores, top_index = candidates.reshape(bsz, -1).topk(beam_size)
+            scores = top_scores.numpy().reshape(-1)
+            top_index = top_index.numpy().reshape(-1)
+            beams = first_rows + top_index // n_words
+            words = top_index % n_words
+            history = np.concatenate((history[beams], words[:, None]), axis=1)
+            if step < max_len - 1:
+                self.transformer.decoder.reorder_state(state, beams)
+                tokens = to_cuda(flow.tensor(words), where=src.device)
+
+        best = scores.reshape(bsz, beam_size).argmax(1) + np.arange(bsz) * beam_size
+        return history[best].T
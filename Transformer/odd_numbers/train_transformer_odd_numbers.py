@@ -114,28 +114,22 @@ def validation(model, criterion, val_x, val_y):
 
 def test(model, max_len=3, test_times=1, display=False):
     model.eval()
-    res = []
     with flow.no_grad():
+        s = np.random.randint(1, 4998, test_times)
+        cpu_src = (s[None, :] + np.arange(max_len)[:, None]) * 2
+        src = to_cuda(flow.tensor(cpu_src, dtype=flow.int64))
+        tgt = np.concatenate(
+            (np.zeros((1, test_times), dtype=np.int64), cpu_src + 1), axis=0
+        )
+        # every test sequence decoded at once, the encoder runs a single time
+        pred = model.greedy_decode(src, max_len)
+    res = (pred == tgt).all(axis=0)
+    if display:
         for i in range(test_times):
-            s = np.random.randint(1, 4998)
-            cpu_src = [(s + j) * 2 for j in range(max_len)]
-            src = to_cuda(flow.Tensor(cpu_src, dtype=flow.int64).unsqueeze(1))
-            tgt = [0] + [(s + j) * 2 + 1 for j in range(max_len)]
-            pred = [0]
-            flag = 1
-            for j in range(max_len):
-                inp = to_cuda(flow.Tensor(pred, dtype=flow.int64).unsqueeze(1))
-                output = model(src, inp)
-                out_num = output.argmax(2)[-1].numpy()[0]
-                pred.append(out_num)
-                if pred[j + 1] != tgt[j + 1]:
-                    flag = 0
-            res.append(flag)
-            if display:
-                print("input: ", cpu_src)
-                print("target: ", tgt)
-                print("predict: ", pred)
-    return sum(res) / test_times
+            print("input: ", cpu_src[:, i].tolist())
+            print("target: ", tgt[:, i].tolist())
+            print("predict: ", pred[:, i].tolist())
+    return res.mean()
 
 
 def main():
@@ -161,6 +161,99 @@ class MultiheadAttention(Module):
         else:
             return attn_output, attn_output_weights
 
+    def _split_heads(self, x: Tensor) -> Tensor:
+        # (len, bsz, embed_dim) -> (bsz * num_heads, len, head_dim)
+        return x.reshape(
+            x.shape[0], x.shape[1] * self.num_heads, self.head_dim
+        ).transpose(0, 1)
+
+    def _check_incremental(self):
+        assert (
+            self._qkv_same_embed_dim and self.bias_k is None and not self.add_zero_attn
+        ), "incremental decoding only supports packed projections without bias_kv / zero_attn"
+
+    def static_kv_cache(
+        self, key: Tensor, key_padding_mask: Optional[Tensor] = None
+    ) -> dict:
+        r"""Projects a fixed source (e.g. the encoder memory) once, the returned
+        cache is then used by :meth:`forward_step` with ``static_kv=True`` for
+        every decoding step.
+
+        Args:
+            key: (src_len, bsz, embed_dim), (bsz, src_len, embed_dim) if batch_first
+            key_padding_mask: (bsz, src_len), nonzero at the padded positions
+        """
+        self._check_incremental()
+        if self.batch_first:
+            key = key.transpose(1, 0)
+        bsz, src_len = key.shape[1], key.shape[0]
+        _, w_k, w_v = self.in_proj_weight.chunk(3, dim=0)
+        if self.in_proj_bias is None:
+            b_k = b_v = None
+        else:
+            _, b_k, b_v = self.in_proj_bias.chunk(3, dim=0)
+        cache = {
+            "k": self._split_heads(linear(key, w_k, b_k)),
+            "v": self._split_heads(linear(key, w_v, b_v)),
+        }
+        if key_padding_mask is not None:
+            # float mask (bsz * num_heads, 1, src_len), built once
+            mask = (
+                key_padding_mask.reshape(bsz, 1, 1, src_len)
+                .expand(-1, self.num_heads, 1, -1)
+                .reshape(bsz * self.num_heads, 1, src_len)
+            )
+            cache["mask"] = (
+                flow.zeros_like(mask).to(flow.float).masked_fill(mask, float("-inf"))
+            )
+        return cache
+
+    def forward_step(
+        self, query: Tensor, cache: dict, static_kv: bool = False
+    ) -> Tensor:
+        r"""Attention output of the newest decoding position only.
+
+        Args:
+            query: (1, bsz, embed_dim), (bsz, 1, embed_dim) if batch_first
+            cache: with ``static_kv`` the dict from :meth:`static_kv_cache`,
+                otherwise the self-attention cache of this layer, extended in
+                place with the key and value of ``query`` (start with ``{}``)
+
+        Same result as the last position of :meth:`forward` over the whole
+        prefix with a causal mask, in eval mode.
+        """
+        self._check_incremental()
+        if self.batch_first:
+            query = query.transpose(1, 0)
+        tgt_len, bsz, embed_dim = query.shape
+        if static_kv:
+            w_q, _, _ = self.in_proj_weight.chunk(3, dim=0)
+            b_q = (
+                None
+                if self.in_proj_bias is None
+                else self.in_proj_bias.chunk(3, dim=0)[0]
+            )
+            q = linear(query, w_q, b_q)
+            k, v = cache["k"], cache["v"]
+        else:
+            q, k, v = linear(query, self.in_proj_weight, self.in_proj_bias).chunk(
+                3, dim=2
+            )
+            k, v = self._split_heads(k), self._split_heads(v)
+            if "k" in cache:
+                k = flow.cat([cache["k"], k], dim=1)
+                v = flow.cat([cache["v"], v], dim=1)
+            cache["k"], cache["v"] = k, v
+
+        attn_output, _ = _scaled_dot_product_attention(
+            self._split_heads(q), k, v, cache.get("mask"), 0.0
+        )
+        attn_output = attn_output.transpose(0, 1).reshape(tgt_len, bsz, embed_dim)
+        attn_output = linear(attn_output, self.out_proj.weight, self.out_proj.bias)
+        if self.batch_first:
+            return attn_output.transpose(1, 0)
+        return attn_output
+
 
 def multi_head_attention_forward(
     query: Tensor,
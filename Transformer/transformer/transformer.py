@@ -10,6 +10,7 @@ TransformerDecoderLayer     in torch.nn.modules.transformer
 import copy
 from typing import Optional, Any
 
+import numpy as np
 import oneflow as flow
 from oneflow import Tensor
 from oneflow.nn import Module, ModuleList, Dropout, Linear
@@ -261,6 +262,51 @@ class TransformerDecoder(Module):
 
         return output
 
+    def init_state(
+        self, memory: Tensor, memory_key_padding_mask: Optional[Tensor] = None
+    ) -> list:
+        r"""Incremental decoding state: the memory keys and values of every
+        layer, projected once, and empty self-attention caches.
+        ``memory_key_padding_mask`` must be the one :meth:`forward` would get
+        for :meth:`forward_step` to match it."""
+        return [
+            {
+                "memory": mod.multihead_attn.static_kv_cache(
+                    memory, memory_key_padding_mask
+                ),
+                "self": {},
+            }
+            for mod in self.layers
+        ]
+
+    def forward_step(self, tgt: Tensor, state: list) -> Tensor:
+        r"""Decodes the newest position only, ``tgt`` is (1, bsz, d_model)
+        ((bsz, 1, d_model) if batch_first). In eval mode the result equals the
+        last position of :meth:`forward` over the whole prefix with a causal
+        ``tgt_mask``, without recomputing the previous positions."""
+        output = tgt
+
+        for mod, layer_state in zip(self.layers, state):
+            output = mod.forward_step(output, layer_state)
+
+        if self.norm is not None:
+            output = self.norm(output)
+
+        return output
+
+    @staticmethod
+    def reorder_state(state: list, new_order) -> None:
+        r"""Keeps the self-attention caches of the batch rows ``new_order``
+        (host array of row indices), e.g. the surviving beams.
+
+        The memory caches are left as they are, so every row must come from a
+        row of the same source, as the beams of one sentence do.
+        """
+        for layer_state in state:
+            cache = layer_state["self"]
+            for name in ("k", "v"):
+                cache[name] = _select_rows(cache[name], new_order)
+
 
 class TransformerEncoderLayer(Module):
     __constants__ = ["batch_first", "norm_first"]
@@ -395,6 +441,44 @@ class TransformerDecoderLayer(Module):
         tgt = self.norm3(tgt)
         return tgt
 
+    def forward_step(self, tgt: Tensor, state: dict) -> Tensor:
+        r""":meth:`forward` for the newest position only, see
+        :meth:`TransformerDecoder.forward_step`."""
+        if self.norm_first:
+            tgt = self.norm1(tgt)
+            tgt2 = self.self_attn.forward_step(tgt, state["self"])
+            tgt = tgt + self.dropout1(tgt2)
+            tgt = self.norm2(tgt)
+            tgt2 = self.multihead_attn.forward_step(
+                tgt, state["memory"], static_kv=True
+            )
+            tgt = tgt + self.dropout2(tgt2)
+            tgt = self.norm3(tgt)
+            tgt2 = self.linear2(self.dropout(self.activation(self.linear1(tgt))))
+            tgt = tgt + self.dropout3(tgt2)
+            return tgt
+
+        # norm last
+        tgt2 = self.self_attn.forward_step(tgt, state["self"])
+        tgt = tgt + self.dropout1(tgt2)
+        tgt = self.norm1(tgt)
+        tgt2 = self.multihead_attn.forward_step(tgt, state["memory"], static_kv=True)
+        tgt = tgt + self.dropout2(tgt2)
+        tgt = self.norm2(tgt)
+        tgt2 = self.linear2(self.dropout(self.activation(self.linear1(tgt))))
+        tgt = tgt + self.dropout3(tgt2)
+        tgt = self.norm3(tgt)
+        return tgt
+
+
+def _select_rows(cache, new_order):
+    # (bsz * num_heads, len, head_dim) caches, rows gathered by index
+    bsz = len(new_order)
+    rows = cache.reshape(bsz, -1)
+    index = flow.tensor(np.asarray(new_order), dtype=flow.int64, device=cache.device)
+    rows = flow.gather(rows, index=index.unsqueeze(1).repeat(1, rows.shape[1]), dim=0)
+    return rows.reshape(cache.shape)
+
 
 # need deepcopy
 def _get_clones(module, N):
@@ -1,12 +1,16 @@
 import os
 import random
 import pickle
+import functools
+from concurrent.futures import ProcessPoolExecutor
 
 import numpy as np
 from sonopy import mfcc_spec
 from scipy.io.wavfile import read
 from tqdm import tqdm
 
+from Wav2Letter.feature_store import FeatureStore
+
 
 class IntegerEncode:
     """Encodes labels into integers
@@ -77,6 +81,26 @@ def normalize(values):
     return (values - np.mean(values)) / np.std(values)
 
 
+def extract_mfcc(audio_path, sr=16000, max_frame_len=225):
+    """Reads a wav file and computes its normalized, zero padded mfccs
+
+    Args:
+        audio_path (str): wav file path
+        sr (int): sample rate
+        max_frame_len (int): frames after padding
+
+    Returns:
+        np.array: shape (max_frame_len, 13)
+    """
+    _, audio = read(audio_path)
+    mfccs = mfcc_spec(
+        audio, sr, window_stride=(160, 80), fft_size=512, num_filt=20, num_coeffs=13
+    )
+    mfccs = normalize(mfccs)[:max_frame_len]
+    diff = max_frame_len - mfccs.shape[0]
+    return np.pad(mfccs, ((0, diff), (0, 0)), "constant").astype(np.float32)
+
+
 class GoogleSpeechCommand:
     """Data set can be found here 
         https://www.kaggle.com/c/tensorflow-speech-recognition-challenge/data
@@ -131,36 +155,76 @@ class GoogleSpeechCommand:
         pg = tqdm if progress_bar else lambda x: x
 
         inputs, targets = [], []
-        meta_data = []
-        for labels in self.labels:
-            path = os.listdir(os.path.join(self.data_path, labels))
-            for audio in path:
-                audio_path = os.path.join(self.data_path, labels, audio)
-                meta_data.append((audio_path, labels))
+        meta_data = self.get_meta_data()
 
         random.shuffle(meta_data)
 
         for md in pg(meta_data):
             audio_path = md[0]
             labels = md[1]
-            _, audio = read(audio_path)
-            mfccs = mfcc_spec(
-                audio,
-                self.sr,
-                window_stride=(160, 80),
-                fft_size=512,
-                num_filt=20,
-                num_coeffs=13,
-            )
-            mfccs = normalize(mfccs)
-            diff = self.max_frame_len - mfccs.shape[0]
-            mfccs = np.pad(mfccs, ((0, diff), (0, 0)), "constant")
-            inputs.append(mfccs)
+            inputs.append(extract_mfcc(audio_path, self.sr, self.max_frame_len))
 
             target = self.intencode.convert_to_ints(labels)
             targets.append(target)
         return inputs, targets
 
+    def get_meta_data(self):
+        """Lists (audio_path, label) of every utterance in the dataset"""
+        meta_data = []
+        for labels in self.labels:
+            path = sorted(os.listdir(os.path.join(self.data_path, labels)))
+            for audio in path:
+                audio_path = os.path.join(self.data_path, labels, audio)
+                meta_data.append((audio_path, labels))
+        return meta_data
+
+    def build_feature_store(
+        self, store_path, num_workers=None, shard_size=8192, progress_bar=True
+    ):
+        """Extracts mfccs of the files not yet in the store with a process pool
+
+        Files are identified by the hash of their content, so re-runs only
+        process new or changed files. Every ``shard_size`` files are written
+        as one memory-mapped shard.
+
+        Args:
+            store_path (str): feature store directory
+            num_workers (int): worker processes, all cpus if None
+            shard_size (int): utterances per shard
+
+        Returns:
+            FeatureStore: the updated store
+        """
+        pg = tqdm if progress_bar else lambda x, **kwargs: x
+        store = FeatureStore(store_path)
+        meta_data = self.get_meta_data()
+        extract = functools.partial(
+            extract_mfcc, sr=self.sr, max_frame_len=self.max_frame_len
+        )
+        with ProcessPoolExecutor(num_workers) as pool:
+            hashes = list(
+                pool.map(
+                    FeatureStore.content_hash,
+                    [md[0] for md in meta_data],
+                    chunksize=256,
+                )
+            )
+            new_data, seen = [], set()
+            for content_hash, md in zip(hashes, meta_data):
+                if content_hash not in store and content_hash not in seen:
+                    seen.add(content_hash)
+                    new_data.append((content_hash, md[0], md[1]))
+            print("%d files in store, %d new" % (len(store), len(new_data)))
+
+            for start in pg(range(0, len(new_data), shard_size)):
+                chunk = new_data[start : start + shard_size]
+                features = list(pool.map(extract, [c[1] for c in chunk], chunksize=64))
+                targets = [self.intencode.convert_to_ints(c[2]) for c in chunk]
+                store.add_shard(
+                    [c[0] for c in chunk], [c[1] for c in chunk], features, targets
+                )
+        return store
+
     @staticmethod
     def save_vectors(file_path, x, y):
         """saves input and targets vectors as x.npy and y.npy
@@ -195,7 +259,6 @@ class GoogleSpeechCommand:
 
 if __name__ == "__main__":
     gs = GoogleSpeechCommand()
-    inputs, targets = gs.get_data()
-    gs.save_vectors("./speech_data", inputs, targets)
+    gs.build_feature_store("./speech_data/features")
     gs.intencode.save("./speech_data")
     print("preprocessed and saved")
@@ -1,23 +1,41 @@
-import pickle
+import collections
+import math
 
+import numpy as np
 import oneflow as flow
 import Levenshtein as Lev
 
 
+def _to_numpy(tensor):
+    return tensor.numpy() if isinstance(tensor, flow.Tensor) else np.asarray(tensor)
+
+
 class Decoder(object):
     """
     Basic decoder class from which all other decoders inherit. Implements several
-    helper functions. Subclasses should implement the decode() method.
+    helper functions. Subclasses should implement the decode_strings() method.
 
     Arguments:
-        labels (string): mapping from integers to characters.
-        blank_index (int, optional): index for the blank '_' character. Defaults to 0.
-        space_index (int, optional): index for the space ' ' character. Defaults to 28.
+        int_to_char (dict): mapping from integers to characters.
+        blank_index (int, optional): index for the blank '-' character. Defaults to 0.
+        pad_index (int, optional): index for the target padding. Defaults to 1.
+        max_label_seq (int, optional): longest label sequence kept per utterance,
+            padding included, like the targets built by IntegerEncode. Defaults to 6.
     """
 
-    def __init__(self, int_to_char, blank_index=0):
+    def __init__(self, int_to_char, blank_index=0, pad_index=1, max_label_seq=6):
         self.int_to_char = int_to_char
         self.blank_index = blank_index
+        self.pad_index = pad_index
+        self.max_label_seq = max_label_seq
+        # index -> char lookup table, padding maps to the empty string
+        self.chars = np.array(
+            [
+                "" if i == pad_index else int_to_char.get(i, "")
+                for i in range(max(int_to_char) + 1)
+            ],
+            dtype=object,
+        )
 
     def wer(self, real_strings, pred_strings):
         """
@@ -35,62 +53,147 @@ class Decoder(object):
 
         return wer / len(real_strings)
 
+    def labels_to_string(self, labels):
+        return "".join(self.chars[labels])
+
+    def targets_to_strings(self, targets):
+        """Integer encoded targets of shape (batch, seq_len) to strings"""
+        targets = _to_numpy(targets).astype(np.int64)
+        return [self.labels_to_string(target) for target in targets]
+
+    def decode_strings(self, log_probs):
+        """Returns the decoded strings and, per string, the timestep of every
+        emitted label, from log probabilities of shape (batch, classes, time)."""
+        raise NotImplementedError
+
+    def decode_batch(self, log_probs, targets=None):
+        """Decodes a batch of model outputs.
+
+        Returns:
+            strings (list of str), offsets (list of np.array) and the wer against
+            ``targets`` (None if no targets are given)
+        """
+        strings, offsets = self.decode_strings(log_probs)
+        wer = None
+        if targets is not None:
+            wer = self.wer(self.targets_to_strings(targets), strings)
+        return strings, offsets, wer
+
 
 class GreedyDecoder(Decoder):
-    def __init__(self, blank_index=0):
-        super(GreedyDecoder, self).__init__(blank_index)
+    def decode(self, ctc_matrix):
+        """Best class per timestep, (batch, classes, time) -> (batch, time),
+        copied to the host once."""
+        if isinstance(ctc_matrix, flow.Tensor):
+            return flow.argmax(ctc_matrix, dim=1).numpy().astype(np.int64)
+        return np.argmax(ctc_matrix, axis=1)
+
+    def collapse(self, sequences, remove_repetitions=True):
+        """Drops blanks and repeated labels from every row at once.
+
+        Returns the kept labels and their timesteps per row.
+        """
+        sequences = _to_numpy(sequences).astype(np.int64)
+        keep = sequences != self.blank_index
+        if remove_repetitions:
+            keep[:, 1:] &= sequences[:, 1:] != sequences[:, :-1]
+        rows, steps = np.nonzero(keep)
+        # rows come out sorted, split them into per-utterance chunks
+        bounds = np.cumsum(np.bincount(rows, minlength=sequences.shape[0]))[:-1]
+        labels = np.split(sequences[rows, steps], bounds)
+        offsets = np.split(steps, bounds)
+        if self.max_label_seq is not None:
+            labels = [l[: self.max_label_seq] for l in labels]
+            offsets = [o[: self.max_label_seq] for o in offsets]
+        return labels, offsets
 
     def convert_to_strings(
-        self, sequences, sizes=6, remove_repetitions=True, return_offsets=True
+        self, sequences, sizes=None, remove_repetitions=True, return_offsets=True
     ):
-        """Given a list of numeric sequences, returns the corresponding strings"""
-        strings = []
-
-        for i in range(sequences.size(0)):
-            string, string_offsets = self.process_string(
-                sequences[i], remove_repetitions
-            )
-            strings.append(string)  # We only return one path
-            if return_offsets:
-                if i == 0:
-                    offsets = string_offsets.unsqueeze(0)
-                else:
-                    offsets = flow.cat((offsets, string_offsets.unsqueeze(0)), 0)
+        """Given a batch of numeric sequences, returns the corresponding strings"""
+        labels, offsets = self.collapse(sequences, remove_repetitions)
+        strings = [self.labels_to_string(l) for l in labels]
         if return_offsets:
-            return strings, offsets.to("cuda")
+            return strings, offsets
         else:
             return strings
 
-    def process_string(self, sequence, remove_repetitions=True):
-        string = ""
-        offsets = []
-
-        for i in range(sequence.size(0)):
-
-            char = self.int_to_char[sequence[i].numpy().item()]
-            if char != self.int_to_char[self.blank_index]:
-                if (
-                    remove_repetitions
-                    and i != 0
-                    and char == self.int_to_char[sequence[i - 1].numpy().item()]
-                ):
-                    pass
-                elif sequence[i].numpy().item() != 1 and len(offsets) < 6:
-                    string = string + char
-                    offsets.append(sequence[i].numpy().item())
-                elif len(offsets) < 6:
-                    offsets.append(sequence[i].numpy().item())
-        if len(offsets) < 6:
-            offsets += [1] * (6 - len(offsets))
-
-        return string, flow.tensor(offsets, dtype=flow.int)
+    def decode_strings(self, log_probs):
+        return self.convert_to_strings(self.decode(log_probs))
 
-    def decode(self, ctc_matrix):
-        top = flow.topk(ctc_matrix, k=1, dim=1)
 
-        new_top = top[1][0].detach()
-        for i in range(1, top[1].size(0)):
-            cur = top[1][i].detach()
-            new_top = flow.cat((new_top, cur), 0)
+class BeamSearchDecoder(Decoder):
+    """CTC prefix beam search.
 
-        return new_top
+    Arguments:
+        beam_width (int, optional): prefixes kept after every timestep. Defaults to 10.
+        cutoff_top_n (int, optional): only the cutoff_top_n most likely classes of
+            a timestep extend the prefixes. Defaults to 10.
+    """
+
+    def __init__(
+        self,
+        int_to_char,
+        blank_index=0,
+        pad_index=1,
+        max_label_seq=6,
+        beam_width=10,
+        cutoff_top_n=10,
+    ):
+        super(BeamSearchDecoder, self).__init__(
+            int_to_char, blank_index, pad_index, max_label_seq
+        )
+        self.beam_width = beam_width
+        self.cutoff_top_n = cutoff_top_n
+
+    def _search(self, log_probs):
+        """log_probs of one utterance, shape (time, classes)"""
+        neg_inf = -math.inf
+        # prefix -> [log prob ending in blank, log prob ending in a label]
+        beams = {(): [0.0, neg_inf]}
+        offsets = {(): ()}
+        num_classes = log_probs.shape[1]
+        top_n = min(self.cutoff_top_n or num_classes, num_classes)
+        candidates = np.argpartition(-log_probs, top_n - 1, axis=1)[:, :top_n]
+        for t in range(log_probs.shape[0]):
+            next_beams = collections.defaultdict(lambda: [neg_inf, neg_inf])
+            for prefix, (p_b, p_nb) in beams.items():
+                p_total = np.logaddexp(p_b, p_nb)
+                for c in candidates[t]:
+                    p = log_probs[t, c]
+                    if c == self.blank_index:
+                        next_beams[prefix][0] = np.logaddexp(
+                            next_beams[prefix][0], p_total + p
+                        )
+                        continue
+                    new_prefix = prefix + (c,)
+                    if prefix and c == prefix[-1]:
+                        # a repeat only starts a new label after a blank
+                        next_beams[new_prefix][1] = np.logaddexp(
+                            next_beams[new_prefix][1], p_b + p
+                        )
+                        next_beams[prefix][1] = np.logaddexp(
+                            next_beams[prefix][1], p_nb + p
+                        )
+                    else:
+                        next_beams[new_prefix][1] = np.logaddexp(
+                            next_beams[new_prefix][1], p_total + p
+                        )
+                    if new_prefix not in offsets:
+                        offsets[new_prefix] = offsets[prefix] + (t,)
+            ranked = sorted(next_beams.items(), key=lambda kv: -np.logaddexp(*kv[1]))
+            beams = dict(ranked[: self.beam_width])
+        best = max(beams, key=lambda prefix: np.logaddexp(*beams[prefix]))
+        return np.array(best, dtype=np.int64), np.array(offsets[best], dtype=np.int64)
+
+    def decode_strings(self, log_probs):
+        log_probs = _to_numpy(log_probs).transpose(0, 2, 1)
+        strings, offsets = [], []
+        for utterance in log_probs:
+            labels, steps = self._search(utterance)
+            if self.max_label_seq is not None:
+                labels = labels[: self.max_label_seq]
+                steps = steps[: self.max_label_seq]
+            strings.append(self.labels_to_string(labels))
+            offsets.append(steps)
+        return strings, offsets
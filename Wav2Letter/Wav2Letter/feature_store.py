@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+
+class FeatureStore:
+    """Sharded, memory-mapped store of fixed size features and targets
+
+    Every shard is a pair of ``.npy`` files holding the features
+    (n, frame_len, features) and the integer targets (n, seq_len) of the
+    utterances added together. ``index.json`` lists the shards and, per
+    utterance, the sha1 of its audio file content, so files already in the
+    store are never processed again.
+
+    Args:
+        store_path (str): directory of the store, created if missing
+    """
+
+    INDEX_FILE = "index.json"
+
+    def __init__(self, store_path):
+        self.store_path = store_path
+        os.makedirs(store_path, exist_ok=True)
+        index_file = os.path.join(store_path, self.INDEX_FILE)
+        if os.path.exists(index_file):
+            with open(index_file) as f:
+                index = json.load(f)
+        else:
+            index = {"shards": [], "entries": []}
+        self.shards = index["shards"]
+        # entries: [content hash, audio path, shard id, row in shard]
+        self.entries = index["entries"]
+        self.hashes = {entry[0] for entry in self.entries}
+        self._refresh()
+
+    def _refresh(self):
+        self.shard_ids = np.array([e[2] for e in self.entries], dtype=np.int64)
+        self.rows = np.array([e[3] for e in self.entries], dtype=np.int64)
+        self._features = []
+        self._targets = []
+        for shard in self.shards:
+            self._features.append(
+                np.load(os.path.join(self.store_path, shard + ".x.npy"), mmap_mode="r")
+            )
+            self._targets.append(
+                np.load(os.path.join(self.store_path, shard + ".y.npy"), mmap_mode="r")
+            )
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, content_hash):
+        return content_hash in self.hashes
+
+    @staticmethod
+    def content_hash(file_path):
+        """sha1 of the file content
+
+        Args:
+            file_path (str): path of the file to hash
+
+        Returns:
+            str: hex digest
+        """
+        sha1 = hashlib.sha1()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                sha1.update(chunk)
+        return sha1.hexdigest()
+
+    def add_shard(self, hashes, paths, features, targets):
+        """Writes one new shard and records its utterances in the index
+
+        Args:
+            hashes (list): content hash per utterance
+            paths (list): audio path per utterance
+            features (np.array): shape (n, frame_len, features)
+            targets (np.array): shape (n, seq_len)
+        """
+        if len(hashes) == 0:
+            return
+        shard_id = len(self.shards)
+        shard = "shard_%05d" % shard_id
+        np.save(
+            os.path.join(self.store_path, shard + ".x.npy"),
+            np.asarray(features, dtype=np.float32),
+        )
+        np.save(
+            os.path.join(self.store_path, shard + ".y.npy"),
+            np.asarray(targets, dtype=np.int32),
+        )
+        self.shards.append(shard)
+        for row, (content_hash, path) in enumerate(zip(hashes, paths)):
+            self.entries.append([content_hash, path, shard_id, row])
+            self.hashes.add(content_hash)
+        # write the index last so an interrupted run never references a
+        # partially written shard
+        index_file = os.path.join(self.store_path, self.INDEX_FILE)
+        with open(index_file + ".tmp", "w") as f:
+            json.dump({"shards": self.shards, "entries": self.entries}, f)
+        os.replace(index_file + ".tmp", index_file)
+        self._refresh()
+
+    def get_batch(self, indices):
+        """Gathers the features and targets of the given utterances
+
+        Args:
+            indices (np.array): utterance indices
+
+        Returns:
+            (np.array, np.array): features (n, frame_len, features) float32,
+                targets (n, seq_len) int32
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        shard_ids = self.shard_ids[indices]
+        rows = self.rows[indices]
+        features = np.empty(
+            (len(indices),) + self._features[0].shape[1:], dtype=np.float32
+        )
+        targets = np.empty((len(indices),) + self._targets[0].shape[1:], dtype=np.int32)
+        for shard_id in np.unique(shard_ids):
+            mask = shard_ids == shard_id
+            # memmap fancy indexing wants sorted rows to read sequentially
+            order = np.argsort(rows[mask])
+            positions = np.flatnonzero(mask)[order]
+            features[positions] = self._features[shard_id][rows[mask][order]]
+            targets[positions] = self._targets[shard_id][rows[mask][order]]
+        return features, targets
+
+    def iterate_batches(self, indices, batch_size, shuffle=False, drop_last=True):
+        """Yields (features, targets) batches read lazily from the shards
+
+        Args:
+            indices (np.array): utterances to iterate over
+            batch_size (int): utterances per batch
+            shuffle (bool): shuffle the utterances first
+            drop_last (bool): drop the last incomplete batch
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        if shuffle:
+            indices = np.random.permutation(indices)
+        stop = len(indices) - batch_size + 1 if drop_last else len(indices)
+        for start in range(0, max(stop, 0), batch_size):
+            yield self.get_batch(indices[start : start + batch_size])
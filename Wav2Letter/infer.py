@@ -4,22 +4,33 @@
 import os
 import argparse
 import pickle
+import time
+
+import numpy as np
 
 import oneflow as flow
 
 from Wav2Letter.model import Wav2Letter
 from Wav2Letter.data import GoogleSpeechCommand
-from Wav2Letter.decoder import GreedyDecoder
+from Wav2Letter.feature_store import FeatureStore
+from Wav2Letter.decoder import GreedyDecoder, BeamSearchDecoder
 
 
 def get_args():
     parser = argparse.ArgumentParser("""Wav2Letter train""")
     parser.add_argument("--mfcc_features", type=int, default=13)
     parser.add_argument("--datasets_path", type=str, default="speech_data")
+    parser.add_argument("--split_seed", type=int, default=0)
     parser.add_argument("--output_path", type=str, default="save_models")
     parser.add_argument(
         "--int_encoder", type=str, default="./speech_data/int_encoder.pkl"
     )
+    parser.add_argument(
+        "--beam_width",
+        type=int,
+        default=0,
+        help="use ctc prefix beam search with this beam width, greedy if 0",
+    )
 
     args = parser.parse_args()
     return args
@@ -30,13 +41,13 @@ def infer(opt):
     datasets_path = opt.datasets_path
     models_path = opt.output_path
 
-    # load saved numpy arrays for google speech command
     gs = GoogleSpeechCommand()
-    _inputs, _targets = gs.load_vectors(datasets_path)
+    store = FeatureStore(os.path.join(datasets_path, "features"))
     grapheme_count = gs.intencode.grapheme_count
 
-    inputs = flow.Tensor(_inputs).to("cuda")
-    targets = flow.Tensor(_targets, dtype=flow.int).to("cuda")
+    # the test set is the last 1000 utterances of the split used by train.py
+    order = np.random.RandomState(opt.split_seed).permutation(len(store))
+    _inputs, _targets = store.get_batch(order[-1000:])
 
     model = Wav2Letter(mfcc_features, grapheme_count)
     model.to("cuda")
@@ -46,23 +57,21 @@ def infer(opt):
     with open(int_encoder, "rb") as f:
         int_to_char = pickle.load(f)["index2char"]
 
-    decoder = GreedyDecoder(int_to_char)
+    if opt.beam_width > 0:
+        decoder = BeamSearchDecoder(int_to_char, beam_width=opt.beam_width)
+    else:
+        decoder = GreedyDecoder(int_to_char)
 
-    inputs = inputs.transpose(1, 2)
-
-    sample = inputs[-1000:]
-    sample_target = targets[-1000:]
+    sample = flow.Tensor(_inputs).to("cuda").transpose(1, 2)
+    sample_target = _targets
 
     log_probs = model(sample)
-    output = decoder.decode(log_probs)
-
-    pred_strings, output = decoder.convert_to_strings(output)
-    sample_target_strings = decoder.convert_to_strings(
-        sample_target, remove_repetitions=False, return_offsets=False
-    )
-    wer = decoder.wer(sample_target_strings, pred_strings)
+    start_t = time.time()
+    pred_strings, offsets, wer = decoder.decode_batch(log_probs, sample_target)
+    end_t = time.time()
 
     print("wer", wer)
+    print("decode time : {}".format(end_t - start_t))
 
 
 if __name__ == "__main__":
@@ -12,6 +12,7 @@ import oneflow.optim as optim
 
 from Wav2Letter.model import Wav2Letter
 from Wav2Letter.data import GoogleSpeechCommand
+from Wav2Letter.feature_store import FeatureStore
 from Wav2Letter.decoder import GreedyDecoder
 
 
@@ -26,6 +27,12 @@ def get_args():
     parser.add_argument("--lr", type=float, default=1e-4)
     parser.add_argument("--pretrained_model", type=None, default=None)
     parser.add_argument("--datasets_path", type=str, default="speech_data")
+    parser.add_argument(
+        "--split_seed",
+        type=int,
+        default=0,
+        help="seed of the train/eval/test split, infer.py must use the same",
+    )
     parser.add_argument("--output_path", type=str, default="save_models")
     parser.add_argument(
         "--int_encoder", type=str, default="./speech_data/int_encoder.pkl"
@@ -42,27 +49,23 @@ def train(opt):
     rate = opt.rate
     datasets_path = opt.datasets_path
 
-    # load saved numpy arrays for google speech command
+    # features are read lazily from the memory-mapped store built by data.py
     gs = GoogleSpeechCommand()
-    _inputs, _targets = gs.load_vectors(datasets_path)
+    store = FeatureStore(os.path.join(datasets_path, "features"))
     grapheme_count = gs.intencode.grapheme_count
 
     print("training google speech dataset")
-    print("data size", len(_inputs))
+    print("data size", len(store))
     print("batch_size", batch_size)
     print("epochs", epochs)
     print("num_mfcc_features", mfcc_features)
     print("grapheme_count", grapheme_count)
 
-    inputs = flow.Tensor(_inputs).to("cuda")
-    targets = flow.Tensor(_targets, dtype=flow.int).to("cuda")
-
     # split train, eval, test
-    data_size = len(_inputs)
-    train_inputs = inputs[0 : int(rate * data_size)]
-    train_targets = targets[0 : int(rate * data_size)]
-    eval_inputs = inputs[int(rate * data_size) : -1000]
-    eval_targets = targets[int(rate * data_size) : -1000]
+    data_size = len(store)
+    order = np.random.RandomState(opt.split_seed).permutation(data_size)
+    train_indices = order[0 : int(rate * data_size)]
+    eval_indices = order[int(rate * data_size) : -1000]
 
     # Initialize model, loss, optimizer
     model = Wav2Letter(mfcc_features, grapheme_count)
@@ -75,22 +78,21 @@ def train(opt):
     if opt.pretrained_model != None:
         model.load_state_dict(flow.load(opt.pretrained_model))
 
-    train_total_steps = int(train_inputs.size(0) // batch_size)
-    eval_total_steps = int(eval_inputs.size(0) // batch_size)
+    train_total_steps = int(len(train_indices) // batch_size)
+    eval_total_steps = int(len(eval_indices) // batch_size)
 
     for epoch in range(epochs):
-        samples_processed = 0
         avg_epoch_loss = 0
 
-        for step in range(train_total_steps):
-            train_data_batch = train_inputs[
-                samples_processed : batch_size + samples_processed
-            ].transpose(1, 2)
+        for train_inputs, train_targets in store.iterate_batches(
+            train_indices, batch_size
+        ):
+            train_data_batch = flow.Tensor(train_inputs).to("cuda").transpose(1, 2)
 
             log_probs = model(train_data_batch)
             log_probs = log_probs.transpose(1, 2).transpose(0, 1)
 
-            targets = train_targets[samples_processed : batch_size + samples_processed]
+            targets = flow.Tensor(train_targets, dtype=flow.int).to("cuda")
 
             input_lengths = flow.Tensor(
                 np.full((batch_size,), log_probs.shape[0]), dtype=flow.int
@@ -107,8 +109,6 @@ def train(opt):
             optimizer.step()
             optimizer.zero_grad()
 
-            samples_processed += batch_size
-
         # evaluate
         int_encoder = opt.int_encoder
         with open(int_encoder, "rb") as f:
@@ -117,21 +117,14 @@ def train(opt):
         decoder = GreedyDecoder(int_to_char)
 
         wer = 0
-        start_index = 0
-        for step in range(eval_total_steps):
-            eval_data_batch = eval_inputs[
-                start_index : batch_size + start_index
-            ].transpose(1, 2)
-            eval_targets_batch = eval_targets[start_index : batch_size + start_index]
+        for eval_inputs, eval_targets in store.iterate_batches(
+            eval_indices, batch_size
+        ):
+            eval_data_batch = flow.Tensor(eval_inputs).to("cuda").transpose(1, 2)
             eval_log_props = model(eval_data_batch)
 
-            output = decoder.decode(eval_log_props)
-            pred_strings, output = decoder.convert_to_strings(output)
-            eval_target_strings = decoder.convert_to_strings(
-                eval_targets_batch, remove_repetitions=False, return_offsets=False
-            )
-            wer += decoder.wer(eval_target_strings, pred_strings)
-            start_index += batch_size
+            _, _, batch_wer = decoder.decode_batch(eval_log_props, eval_targets)
+            wer += batch_wer
 
         print(
             "epoch",
@@ -10,7 +10,7 @@ if [ ! -d “$DATA_PATH” ]; then
 fi
 echo "Data download success!"
 
-python Wav2Letter/data.py
+python -m Wav2Letter.data
 echo "Data proprecessed!"
 
 python train.py
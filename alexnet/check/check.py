@@ -9,7 +9,9 @@ import sys
 
 sys.path.append(".")
 from model.alexnet import alexnet
-from utils.ofrecord_data_utils import OFRecordDataLoader
+
+sys.path.append("../")
+from image_data import OFRecordDataLoader
 
 
 def _parse_args():
@@ -50,15 +52,11 @@ def setup(args):
     train_data_loader = OFRecordDataLoader(
         ofrecord_root=args.ofrecord_path,
         mode="train",
-        dataset_size=9469,
         batch_size=args.train_batch_size,
     )
 
     val_data_loader = OFRecordDataLoader(
-        ofrecord_root=args.ofrecord_path,
-        mode="val",
-        dataset_size=3925,
-        batch_size=args.val_batch_size,
+        ofrecord_root=args.ofrecord_path, mode="val", batch_size=args.val_batch_size,
     )
 
     criterion = flow.nn.CrossEntropyLoss()
@@ -6,9 +6,12 @@ import datetime
 import shutil
 from tqdm import tqdm
 import oneflow as flow
+import sys
 
 from model.alexnet import alexnet
-from utils.ofrecord_data_utils import OFRecordDataLoader
+
+sys.path.append("../")
+from image_data import OFRecordDataLoader
 
 
 class AverageMeter:
@@ -176,15 +179,11 @@ def main(args):
     train_data_loader = OFRecordDataLoader(
         ofrecord_root=args.ofrecord_path,
         mode="train",
-        dataset_size=9469,
         batch_size=args.train_batch_size,
     )
 
     val_data_loader = OFRecordDataLoader(
-        ofrecord_root=args.ofrecord_path,
-        mode="val",
-        dataset_size=3925,
-        batch_size=args.val_batch_size,
+        ofrecord_root=args.ofrecord_path, mode="val", batch_size=args.val_batch_size,
     )
 
     # Model Setup
@@ -33,7 +33,8 @@ class BertEmbeddings(nn.Module):
         input_embeds = self.word_embeddings(input_ids)
 
         if position_ids is None:
-            position_ids = self.position_ids[:, : self.seq_length]
+            # batches may be trimmed to a shorter bucket than seq_length
+            position_ids = self.position_ids[:, : input_ids.shape[1]]
         position_embeds = self.position_embeddings(position_ids)
 
         token_type_embeds = self.token_type_embeddings(token_type_ids)
@@ -68,7 +69,13 @@ class BertSelfAttention(nn.Module):
 
     def transpose_for_scores(self, x):
         x = flow.reshape(
-            x, [-1, self.seq_len, self.num_attention_heads, self.attention_head_size]
+            x,
+            [
+                x.shape[0],
+                x.shape[1],
+                self.num_attention_heads,
+                self.attention_head_size,
+            ],
         )
         return x.permute(0, 2, 1, 3)
 
@@ -93,7 +100,8 @@ class BertSelfAttention(nn.Module):
 
         context_layer = context_layer.permute(0, 2, 1, 3)
         context_layer = flow.reshape(
-            context_layer, [-1, self.seq_len, self.all_head_size]
+            context_layer,
+            [context_layer.shape[0], context_layer.shape[1], self.all_head_size],
         )
         return context_layer
 
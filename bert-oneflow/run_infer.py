@@ -5,6 +5,7 @@ import numpy as np
 import oneflow.nn as nn
 import oneflow as flow
 from modeling import BertForPreTraining
+from utils.ofrecord_data_utils import bucket_boundaries, bucket_length
 
 
 def _parse_args():
@@ -43,6 +44,19 @@ def _parse_args():
     parser.add_argument("--hidden_size_per_head", type=int, default=64)
     parser.add_argument("--max_predictions_per_seq", type=int, default=20)
 
+    parser.add_argument(
+        "--bucket_size",
+        type=int,
+        default=32,
+        help="Pad batches to a multiple of bucket_size tokens, 0 to seq_length",
+    )
+    parser.add_argument(
+        "--batch_size", type=int, default=32, help="Inference batch size"
+    )
+    parser.add_argument(
+        "--num_samples", type=int, default=1024, help="Random sentences to predict"
+    )
+
     parser.add_argument(
         "--input_path", type=str, default="", help="input string for prediction"
     )
@@ -89,23 +103,60 @@ def inference(args):
             with flow.no_grad():
                 # 1. forward the next_sentence_prediction and masked_lm model
                 _, seq_relationship_scores = self.bert(
-                    input_ids, input_masks, segment_ids
+                    input_ids, segment_ids, input_masks
                 )
 
             return seq_relationship_scores
 
-    bert_eval_graph = BertEvalGraph()
+    # graphs are compiled for fixed shapes, one per batch size and bucket length
+    bert_eval_graphs = {}
+
+    def predict(input_ids):
+        if input_ids.shape not in bert_eval_graphs:
+            bert_eval_graphs[input_ids.shape] = BertEvalGraph()
+        inputs = flow.tensor(
+            input_ids, dtype=flow.int64, device=flow.device(args.device)
+        )
+        mask = flow.cast(inputs > 0, dtype=flow.int64)
+        segment_info = flow.zeros_like(inputs)
+        return bert_eval_graphs[input_ids.shape](inputs, mask, segment_info).numpy()
+
+    # random sentences of random length, sorted by length so every batch is
+    # padded to the bucket of its longest sentence only
+    boundaries = bucket_boundaries(args.seq_length, args.bucket_size)
+    lengths = np.sort(np.random.randint(8, args.seq_length + 1, size=args.num_samples))
+    batches = []
+    for start in range(0, args.num_samples, args.batch_size):
+        batch_lengths = lengths[start : start + args.batch_size]
+        input_ids = np.zeros(
+            (len(batch_lengths), bucket_length(batch_lengths[-1], boundaries)),
+            dtype=np.int64,
+        )
+        for row, length in enumerate(batch_lengths):
+            input_ids[row, :length] = np.random.randint(1, 20, size=length)
+        batches.append(input_ids)
 
     start_t = time.time()
-    inputs = [np.random.randint(0, 20, size=args.seq_length)]
-    inputs = flow.Tensor(inputs, dtype=flow.int64, device=flow.device(args.device))
-    mask = flow.cast(inputs > 0, dtype=flow.int64)
+    for input_ids in batches:
+        prediction = predict(input_ids)
+    end_t = time.time()
+    print(prediction)
+    print(
+        "Inference using time: {:.3f}s, graphs: {}, tokens/s: {:.1f}".format(
+            end_t - start_t, len(bert_eval_graphs), lengths.sum() / (end_t - start_t),
+        )
+    )
 
-    segment_info = flow.zeros_like(inputs)
-    prediction = bert_eval_graph(inputs, mask, segment_info)
-    print(prediction.numpy())
+    # second pass, all graphs compiled
+    start_t = time.time()
+    for input_ids in batches:
+        prediction = predict(input_ids)
     end_t = time.time()
-    print("Inference using time: {:.3f}".format(end_t - start_t))
+    print(
+        "Inference using time: {:.3f}s (cached graphs), tokens/s: {:.1f}".format(
+            end_t - start_t, lengths.sum() / (end_t - start_t)
+        )
+    )
 
 
 if __name__ == "__main__":
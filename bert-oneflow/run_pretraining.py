@@ -9,7 +9,12 @@ import oneflow as flow
 from oneflow import nn
 
 from modeling import BertForPreTraining
-from utils.ofrecord_data_utils import OfRecordDataLoader
+from utils.ofrecord_data_utils import (
+    INPUT_MASK,
+    BucketingSampler,
+    OfRecordDataLoader,
+    bucket_boundaries,
+)
 
 
 def save_model(module: nn.Module, checkpoint_path: str, epoch: int, acc: float):
@@ -19,15 +24,31 @@ def save_model(module: nn.Module, checkpoint_path: str, epoch: int, acc: float):
     )
 
 
+def to_tensors(batch, device):
+    return tuple(flow.tensor(field, device=device) for field in batch)
+
+
+def get_graph(graphs, graph_cls, batch):
+    """One compiled graph per bucket shape, built on first use."""
+    shape = tuple(batch[0].shape)
+    if shape not in graphs:
+        print("Building graph for input shape {}".format(shape))
+        graphs[shape] = graph_cls()
+    return graphs[shape]
+
+
 def train(epoch, iter_per_epoch, graph, print_interval):
     total_loss = 0
     total_correct = 0
     total_element = 0
+    interval_tokens = 0
+    interval_padded = 0
+    interval_start = time.time()
     for i in range(iter_per_epoch):
 
         start_t = time.time()
 
-        next_sent_output, next_sent_labels, loss = graph()
+        next_sent_output, next_sent_labels, loss, input_mask = graph()
 
         # Waiting for sync
         loss = loss.numpy().item()
@@ -44,13 +65,26 @@ def train(epoch, iter_per_epoch, graph, print_interval):
         total_loss += loss
         total_correct += correct
         total_element += next_sent_labels.nelement()
+        input_mask = input_mask.numpy()
+        interval_tokens += int(input_mask.sum())
+        interval_padded += input_mask.size
 
         if (i + 1) % print_interval == 0:
+            elapsed = time.time() - interval_start
             print(
-                "Epoch {}, train iter {}, loss {:.3f}, iter time: {:.3f}s".format(
-                    epoch, (i + 1), total_loss / (i + 1), end_t - start_t
+                "Epoch {}, train iter {}, loss {:.3f}, iter time: {:.3f}s, "
+                "tokens/s: {:.1f} (padded {:.1f})".format(
+                    epoch,
+                    (i + 1),
+                    total_loss / (i + 1),
+                    end_t - start_t,
+                    interval_tokens / elapsed,
+                    interval_padded / elapsed,
                 )
             )
+            interval_tokens = 0
+            interval_padded = 0
+            interval_start = time.time()
 
     print(
         "Epoch {}, train iter {}, loss {:.3f}, total accuracy {:.2f}".format(
@@ -60,15 +94,24 @@ def train(epoch, iter_per_epoch, graph, print_interval):
 
 
 def validation(
-    epoch: int, iter_per_epoch: int, graph: nn.Graph, print_interval: int
+    epoch: int,
+    sampler: BucketingSampler,
+    graphs: dict,
+    graph_cls,
+    device,
+    print_interval: int,
 ) -> float:
     total_correct = 0
     total_element = 0
-    for i in range(iter_per_epoch):
+    total_tokens = 0
+    total_start = time.time()
+    for i, batch in enumerate(sampler):
 
         start_t = time.time()
 
-        next_sent_output, next_sent_labels = graph()
+        inputs = to_tensors(batch, device)
+        graph = get_graph(graphs, graph_cls, batch)
+        next_sent_output, next_sent_labels = graph(*inputs)
 
         next_sent_output = next_sent_output.numpy()
         next_sent_labels = next_sent_labels.numpy()
@@ -80,6 +123,7 @@ def validation(
         ).sum()
         total_correct += correct
         total_element += next_sent_labels.size
+        total_tokens += int(batch[INPUT_MASK].sum())
 
         if (i + 1) % print_interval == 0:
             print(
@@ -89,8 +133,11 @@ def validation(
             )
 
     print(
-        "Epoch {}, val iter {}, total accuracy {:.2f}".format(
-            epoch, (i + 1), total_correct * 100.0 / total_element
+        "Epoch {}, val iter {}, total accuracy {:.2f}, tokens/s: {:.1f}".format(
+            epoch,
+            (i + 1),
+            total_correct * 100.0 / total_element,
+            total_tokens / (time.time() - total_start),
         )
     )
     return total_correct / total_element
@@ -144,6 +191,13 @@ def main():
     parser.add_argument("--hidden_dropout_prob", type=float, default=0.1)
     parser.add_argument("--hidden_size_per_head", type=int, default=64)
     parser.add_argument("--max_predictions_per_seq", type=int, default=20)
+    parser.add_argument(
+        "--bucket_size",
+        type=int,
+        default=32,
+        help="Pad validation batches to a multiple of bucket_size tokens, 0 to "
+        "seq_length. Training batches are always padded to seq_length",
+    )
     parser.add_argument("-e", "--epochs", type=int, default=10, help="Number of epochs")
 
     parser.add_argument(
@@ -189,9 +243,7 @@ def main():
     train_data_loader = OfRecordDataLoader(
         ofrecord_dir=args.ofrecord_path,
         mode="train",
-        dataset_size=1024,
         batch_size=args.train_batch_size,
-        data_part_num=1,
         seq_length=args.seq_length,
         max_predictions_per_seq=args.max_predictions_per_seq,
     )
@@ -199,13 +251,15 @@ def main():
     test_data_loader = OfRecordDataLoader(
         ofrecord_dir=args.ofrecord_path,
         mode="test",
-        dataset_size=1024,
         batch_size=args.val_batch_size,
-        data_part_num=1,
         seq_length=args.seq_length,
         max_predictions_per_seq=args.max_predictions_per_seq,
     )
 
+    boundaries = bucket_boundaries(args.seq_length, args.bucket_size)
+    print("Validation bucket lengths: ", boundaries)
+    test_sampler = BucketingSampler(test_data_loader, boundaries)
+
     print("Building BERT Model")
     bert_model = BertForPreTraining(
         args.vocab_size,
@@ -312,42 +366,37 @@ def main():
             total_loss = next_sentence_loss + masked_lm_loss
 
             total_loss.backward()
-            return seq_relationship_scores, next_sentence_labels, total_loss
+            return seq_relationship_scores, next_sentence_labels, total_loss, input_mask
 
+    # a single graph reading the OFRecords in the graph, so the optimizer and
+    # the cosine schedule step once per batch
     bert_graph = BertGraph()
 
     class BertEvalGraph(nn.Graph):
         def __init__(self):
             super().__init__()
             self.bert = bert_model
-            self._test_data_loader = test_data_loader
-
-        def build(self):
-            (
-                input_ids,
-                next_sent_labels,
-                input_masks,
-                segment_ids,
-                masked_lm_ids,
-                masked_lm_positions,
-                masked_lm_weights,
-            ) = self._test_data_loader()
-            input_ids = input_ids.to(device=device)
-            input_masks = input_masks.to(device=device)
-            segment_ids = segment_ids.to(device=device)
-            next_sent_labels = next_sent_labels.to(device=device)
-            masked_lm_ids = masked_lm_ids.to(device=device)
-            masked_lm_positions = masked_lm_positions.to(device)
 
+        def build(
+            self,
+            input_ids,
+            next_sent_labels,
+            input_masks,
+            segment_ids,
+            masked_lm_ids,
+            masked_lm_positions,
+            masked_lm_weights,
+        ):
             with flow.no_grad():
                 # 1. forward the next_sentence_prediction and masked_lm model
                 _, seq_relationship_scores = self.bert(
-                    input_ids, input_masks, segment_ids
+                    input_ids, segment_ids, input_masks
                 )
 
             return seq_relationship_scores, next_sent_labels
 
-    bert_eval_graph = BertEvalGraph()
+    # eval has no optimizer state, one graph per bucket length
+    bert_eval_graphs = {}
 
     for epoch in range(args.epochs):
         # Train
@@ -357,7 +406,12 @@ def main():
     # Eval
     bert_model.eval()
     val_acc = validation(
-        epoch, len(test_data_loader), bert_eval_graph, args.print_interval * 10
+        epoch,
+        test_sampler,
+        bert_eval_graphs,
+        BertEvalGraph,
+        device,
+        args.print_interval * 10,
     )
 
     print("Saveing model ...")
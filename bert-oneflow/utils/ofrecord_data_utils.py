@@ -1,20 +1,33 @@
+import sys
+
+import numpy as np
 import oneflow as flow
 from oneflow import nn
 
+sys.path.append("../")
+from ofrecord_index import OFRecordIndex
+
 
 class OfRecordDataLoader(nn.Module):
     def __init__(
         self,
         ofrecord_dir: str,
         mode: str,
-        dataset_size: int,
         batch_size: int,
-        data_part_num: int,
         seq_length: int,
         max_predictions_per_seq,
+        dataset_size: int = None,
+        data_part_num: int = None,
     ):
         super().__init__()
 
+        # counts the records and part files, indexed on first use
+        self.index = OFRecordIndex.open_or_build(ofrecord_dir)
+        if dataset_size is None:
+            dataset_size = self.index.num_records
+        if data_part_num is None:
+            data_part_num = self.index.num_parts
+
         self.ofrecord_reader = nn.OfrecordReader(
             ofrecord_dir,
             batch_size=batch_size,
@@ -62,3 +75,76 @@ class OfRecordDataLoader(nn.Module):
             masked_lm_positions,
             masked_lm_weights,
         )
+
+
+# positions of the per-token fields in the OfRecordDataLoader outputs
+SEQ_FIELDS = (0, 2, 3)
+INPUT_MASK = 2
+
+
+def bucket_boundaries(seq_length: int, bucket_size: int):
+    """Sequence lengths the batches are padded to, multiples of
+    ``bucket_size`` up to ``seq_length``. A single bucket when bucket_size
+    is 0 or not smaller than seq_length.
+    """
+    if bucket_size <= 0 or bucket_size >= seq_length:
+        return [seq_length]
+    return list(range(bucket_size, seq_length, bucket_size)) + [seq_length]
+
+
+def bucket_length(length: int, boundaries) -> int:
+    """The smallest boundary holding ``length`` tokens."""
+    return boundaries[min(np.searchsorted(boundaries, length), len(boundaries) - 1)]
+
+
+class BucketingSampler(object):
+    """Regroups the examples of an OfRecordDataLoader by ``input_mask``
+    length, so every batch is cut to the bucket of its longest sentence
+    instead of the full ``seq_length``.
+
+    Examples read from the loader wait in the buffer of their bucket until
+    ``batch_size`` of them are available, leftovers are kept for the next
+    epoch. Batches are numpy arrays in the order of the loader outputs.
+
+    Args:
+        data_loader (OfRecordDataLoader): fixed length source of examples
+        boundaries (list): increasing bucket lengths, the last one is seq_length
+    """
+
+    def __init__(self, data_loader: OfRecordDataLoader, boundaries):
+        self.data_loader = data_loader
+        self.boundaries = list(boundaries)
+        self.batch_size = data_loader.batch_size
+        self._pending = [[] for _ in self.boundaries]
+        self._counts = [0] * len(self.boundaries)
+
+    def __len__(self):
+        return len(self.data_loader)
+
+    def _fill(self):
+        fields = [blob.numpy() for blob in self.data_loader()]
+        lengths = fields[INPUT_MASK].sum(axis=1)
+        buckets = np.minimum(
+            np.searchsorted(self.boundaries, lengths), len(self.boundaries) - 1
+        )
+        for bucket in np.unique(buckets):
+            rows = buckets == bucket
+            self._pending[bucket].append([field[rows] for field in fields])
+            self._counts[bucket] += int(rows.sum())
+
+    def _pop(self, bucket):
+        fields = [np.concatenate(parts) for parts in zip(*self._pending[bucket])]
+        batch = [field[: self.batch_size] for field in fields]
+        rest = [field[self.batch_size :] for field in fields]
+        self._pending[bucket] = [rest] if len(rest[0]) > 0 else []
+        self._counts[bucket] -= self.batch_size
+        length = self.boundaries[bucket]
+        for i in SEQ_FIELDS:
+            batch[i] = np.ascontiguousarray(batch[i][:, :length])
+        return tuple(batch)
+
+    def __iter__(self):
+        for _ in range(len(self)):
+            while max(self._counts) < self.batch_size:
+                self._fill()
+            yield self._pop(int(np.argmax(self._counts)))
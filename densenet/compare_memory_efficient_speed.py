@@ -0,0 +1,150 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        "flags for compare densenet peak memory and step time with memory_efficient"
+    )
+    parser.add_argument(
+        "--models",
+        type=str,
+        default="densenet121,densenet169,densenet201",
+        help="comma separated models to compare",
+    )
+    parser.add_argument(
+        "--batch_sizes", type=str, default="32,64,128", help="comma separated"
+    )
+    parser.add_argument("--iters", type=int, default=10, help="timed train steps")
+    parser.add_argument("--image_size", type=int, default=224, help="image size")
+    # internal, runs a single configuration in a fresh process
+    parser.add_argument("--run", type=str, default="", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def _gpu_memory_mb(pid):
+    """Memory held by ``pid`` on the gpu, the oneflow allocator keeps the
+    peak allocation cached so this is the peak of the run."""
+    output = subprocess.check_output(
+        [
+            "nvidia-smi",
+            "--query-compute-apps=pid,used_memory",
+            "--format=csv,noheader,nounits",
+        ]
+    ).decode()
+    used = 0
+    for line in output.strip().splitlines():
+        app_pid, memory = [field.strip() for field in line.split(",")]
+        if int(app_pid) == pid:
+            used += int(memory)
+    return used
+
+
+def run_single(args):
+    # imported here so the parent process never holds gpu memory
+    import oneflow as flow
+    from models import densenet
+
+    arch, batch_size, memory_efficient = args.run.split(":")
+    batch_size = int(batch_size)
+    model = getattr(densenet, arch)(memory_efficient=memory_efficient == "1")
+    model.to("cuda")
+    model.train()
+    cross_entropy = flow.nn.CrossEntropyLoss().to("cuda")
+    sgd = flow.optim.SGD(model.parameters(), lr=0.001, momentum=0.9)
+
+    image = flow.tensor(
+        np.random.randn(batch_size, 3, args.image_size, args.image_size).astype(
+            np.float32
+        )
+    ).to("cuda")
+    label = flow.tensor(np.random.randint(0, 1000, batch_size).astype(np.int32)).to(
+        "cuda"
+    )
+
+    def step():
+        loss = cross_entropy(model(image), label)
+        loss.backward()
+        sgd.step()
+        sgd.zero_grad()
+        return loss.numpy()
+
+    for _ in range(3):
+        step()
+    start_t = time.time()
+    for _ in range(args.iters):
+        step()
+    step_time = (time.time() - start_t) / args.iters * 1000
+    print(json.dumps({"step_time": step_time, "memory": _gpu_memory_mb(os.getpid())}))
+
+
+def _is_out_of_memory(stderr):
+    return any(
+        pattern in stderr
+        for pattern in (
+            "out of memory",
+            "CUDA_ERROR_OUT_OF_MEMORY",
+            "cudaErrorMemoryAllocation",
+        )
+    )
+
+
+def _run_in_subprocess(args, arch, batch_size, memory_efficient):
+    """Results of one configuration, or "OOM" / "error" if the run failed.
+    One process per configuration, the cached allocator never shrinks."""
+    command = [
+        sys.executable,
+        os.path.abspath(__file__),
+        "--iters",
+        str(args.iters),
+        "--image_size",
+        str(args.image_size),
+        "--run",
+        "%s:%d:%d" % (arch, batch_size, memory_efficient),
+    ]
+    process = subprocess.run(
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    if process.returncode != 0:
+        stderr = process.stderr.decode(errors="replace")
+        sys.stderr.write(stderr)
+        return "OOM" if _is_out_of_memory(stderr) else "error"
+    return json.loads(process.stdout.decode().strip().splitlines()[-1])
+
+
+def main(args):
+    print(
+        "| model | batch size | memory (MB) | step (ms) | memory efficient memory (MB) | memory efficient step (ms) |"
+    )
+    print("|---|---|---|---|---|---|")
+    for arch in args.models.split(","):
+        for batch_size in [int(b) for b in args.batch_sizes.split(",")]:
+            cells = []
+            for memory_efficient in (0, 1):
+                result = _run_in_subprocess(args, arch, batch_size, memory_efficient)
+                if isinstance(result, str):
+                    # "OOM", or "error" with the stderr of the run printed above
+                    cells += [result, "-"]
+                else:
+                    cells += [
+                        "%d" % result["memory"],
+                        "%.1f" % result["step_time"],
+                    ]
+            print("| %s | %d | %s |" % (arch, batch_size, " | ".join(cells)))
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    if args.run:
+        run_single(args)
+    else:
+        main(args)
@@ -9,11 +9,56 @@ from typing import Any, List, Tuple
 __all__ = ["DenseNet", "densenet121", "densenet169", "densenet201", "densenet161"]
 
 
+if hasattr(flow.autograd, "Function"):
+
+    class _CheckpointedBottleneck(flow.autograd.Function):
+        """Runs ``layer.bn_function`` without keeping its intermediates: only
+        the input features are saved and the concat-BN-ReLU-conv1 bottleneck
+        is recomputed during backward."""
+
+        @staticmethod
+        def forward(ctx, layer, *inputs):
+            ctx.layer = layer
+            ctx.save_for_backward(*inputs)
+            with flow.no_grad():
+                return layer.bn_function(list(inputs))
+
+        @staticmethod
+        def backward(ctx, grad_output):
+            layer = ctx.layer
+            inputs = [x.detach().requires_grad_() for x in ctx.saved_tensors]
+            # the forward pass already updated the running statistics
+            momentum = layer.norm1.momentum
+            layer.norm1.momentum = 0.0
+            try:
+                with flow.enable_grad():
+                    bottleneck_output = layer.bn_function(inputs)
+            finally:
+                layer.norm1.momentum = momentum
+            bottleneck_output.backward(grad_output)
+            return (None,) + tuple(x.grad for x in inputs)
+
+
+else:
+    # flow.autograd.Function is available from oneflow 0.7.0
+    _CheckpointedBottleneck = None
+
+
 class _DenseLayer(nn.Module):
     def __init__(
-        self, num_input_features: int, growth_rate: int, bn_size: int, drop_rate: float,
+        self,
+        num_input_features: int,
+        growth_rate: int,
+        bn_size: int,
+        drop_rate: float,
+        memory_efficient: bool = False,
     ) -> None:
         super(_DenseLayer, self).__init__()
+        if memory_efficient and _CheckpointedBottleneck is None:
+            raise RuntimeError(
+                "memory_efficient DenseNet needs flow.autograd.Function, "
+                "available from oneflow 0.7.0"
+            )
         self.norm1: nn.BatchNorm2d
         self.add_module("norm1", nn.BatchNorm2d(num_input_features))
         self.relu1: nn.ReLU
@@ -46,6 +91,7 @@ class _DenseLayer(nn.Module):
             ),
         )
         self.drop_rate = float(drop_rate)
+        self.memory_efficient = memory_efficient
 
     def bn_function(self, inputs: List[flow.Tensor]) -> flow.Tensor:
         concated_features = flow.cat(inputs, 1)
@@ -61,6 +107,9 @@ class _DenseLayer(nn.Module):
                 return True
         return False
 
+    def call_checkpoint_bottleneck(self, input: List[flow.Tensor]) -> flow.Tensor:
+        return _CheckpointedBottleneck.apply(self, *input)
+
     def forward(self, input: List[flow.Tensor]) -> flow.Tensor:
         pass
 
@@ -73,7 +122,12 @@ class _DenseLayer(nn.Module):
         else:
             prev_features = input
 
-        bottleneck_output = self.bn_function(prev_features)
+        if self.memory_efficient and self.any_requires_grad(prev_features):
+            # the concat and bn outputs are freed right after conv1, so every
+            # layer of the block reuses the same concat buffer
+            bottleneck_output = self.call_checkpoint_bottleneck(prev_features)
+        else:
+            bottleneck_output = self.bn_function(prev_features)
 
         new_features = self.conv2(self.relu2(self.norm2(bottleneck_output)))
         if self.drop_rate > 0:
@@ -93,6 +147,7 @@ class _DenseBlock(nn.ModuleDict):
         bn_size: int,
         growth_rate: int,
         drop_rate: float,
+        memory_efficient: bool = False,
     ) -> None:
         super(_DenseBlock, self).__init__()
         for i in range(num_layers):
@@ -101,6 +156,7 @@ class _DenseBlock(nn.ModuleDict):
                 growth_rate=growth_rate,
                 bn_size=bn_size,
                 drop_rate=drop_rate,
+                memory_efficient=memory_efficient,
             )
             self.add_module("denselayer%d" % (i + 1), layer)
 
@@ -141,6 +197,8 @@ class DenseNet(nn.Module):
           (i.e. bn_size * k features in the bottleneck layer)
         drop_rate (float) - dropout rate after each dense layer
         num_classes (int) - number of classification classes
+        memory_efficient (bool) - If True, uses checkpointing. Much more memory efficient,
+          but slower. Default: *False*. See `"paper" <https://arxiv.org/pdf/1707.06990.pdf>`_
     """
 
     def __init__(
@@ -151,6 +209,7 @@ class DenseNet(nn.Module):
         bn_size: int = 4,
         drop_rate: float = 0,
         num_classes: int = 1000,
+        memory_efficient: bool = False,
     ) -> None:
 
         super(DenseNet, self).__init__()
@@ -186,6 +245,7 @@ class DenseNet(nn.Module):
                 bn_size=bn_size,
                 growth_rate=growth_rate,
                 drop_rate=drop_rate,
+                memory_efficient=memory_efficient,
             )
             self.features.add_module("denseblock%d" % (i + 1), block)
             num_features = num_features + num_layers * growth_rate
@@ -4,8 +4,11 @@ import os
 import time
 
 import oneflow as flow
+import sys
 from models.densenet import densenet121
-from utils.ofrecord_data_utils import OFRecordDataLoader
+
+sys.path.append("../")
+from image_data import OFRecordDataLoader
 
 
 def _parse_args():
@@ -32,6 +35,11 @@ def _parse_args():
         "--train_batch_size", type=int, default=32, help="train batch size"
     )
     parser.add_argument("--val_batch_size", type=int, default=32, help="val batch size")
+    parser.add_argument(
+        "--memory_efficient",
+        action="store_true",
+        help="recompute the dense layer bottlenecks in backward to save memory, oneflow >= 0.7.0",
+    )
 
     return parser.parse_args()
 
@@ -41,20 +49,16 @@ def main(args):
     train_data_loader = OFRecordDataLoader(
         ofrecord_root=args.ofrecord_path,
         mode="train",
-        dataset_size=9469,
         batch_size=args.train_batch_size,
     )
 
     val_data_loader = OFRecordDataLoader(
-        ofrecord_root=args.ofrecord_path,
-        mode="val",
-        dataset_size=3925,
-        batch_size=args.val_batch_size,
+        ofrecord_root=args.ofrecord_path, mode="val", batch_size=args.val_batch_size,
     )
 
     # oneflow init
     start_t = time.time()
-    densenet121_module = densenet121()
+    densenet121_module = densenet121(memory_efficient=args.memory_efficient)
     if args.load_checkpoint != "":
         print("load_checkpoint >>>>>>>>> ", args.load_checkpoint)
         checkpoint = flow.load(args.load_checkpoint)
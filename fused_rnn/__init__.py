@@ -0,0 +1 @@
+from .layers import LSTM, GRU, lengths_to_mask, upgrade_cell_state_dict
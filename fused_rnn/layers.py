@@ -0,0 +1,287 @@
+import math
+
+import numpy as np
+import oneflow as flow
+import oneflow.nn as nn
+import oneflow.nn.functional as F
+
+__all__ = ["LSTM", "GRU", "lengths_to_mask", "upgrade_cell_state_dict"]
+
+
+def lengths_to_mask(lengths, max_length, device):
+    """(max_length, batch, 1) float mask, 1 on the valid steps of every sequence.
+
+    Args:
+        lengths (list or np.array): valid length per sequence, on the host
+        max_length (int): padded length of the batch
+        device (flow.device or str): device of the mask
+    """
+    lengths = np.asarray(lengths, dtype=np.int64)
+    mask = np.arange(max_length)[:, None] < lengths[None, :]
+    return flow.Tensor(mask[:, :, None].astype(np.float32)).to(device)
+
+
+def upgrade_cell_state_dict(state_dict, prefix, cell_prefixes, cell_names):
+    """Converts, in place, the weights of a checkpoint of hand written per-step
+    cells, one per direction, to the parameters of a single layer fused
+    ``LSTM`` / ``GRU`` at ``prefix``. Does nothing if the cells are not found.
+
+    Args:
+        state_dict (dict): checkpoint being loaded
+        prefix (str): prefix of the fused layer, e.g. "bilstm.lstm."
+        cell_prefixes (list): prefix of the cell of every direction, forward
+            first, e.g. ["bilstm.layer1.0.", "bilstm.layer1.1."]
+        cell_names (tuple): names of the cell weights (input to gates, input
+            bias, hidden to gates, hidden bias), the last one None for cells
+            without hidden bias, e.g. ("W", "bias", "U", None)
+    """
+    W, bias_ih, U, bias_hh = cell_names
+    if cell_prefixes[0] + W not in state_dict:
+        return
+    # the input projection of both directions is a single matrix
+    state_dict[prefix + "W_l0"] = flow.cat(
+        [state_dict.pop(cell + W) for cell in cell_prefixes], dim=1
+    )
+    state_dict[prefix + "bias_ih_l0"] = flow.cat(
+        [state_dict.pop(cell + bias_ih) for cell in cell_prefixes], dim=0
+    )
+    for cell, suffix in zip(cell_prefixes, ["", "_reverse"]):
+        state_dict[prefix + "U_l0" + suffix] = state_dict.pop(cell + U)
+        if bias_hh is not None:
+            state_dict[prefix + "bias_hh_l0" + suffix] = state_dict.pop(cell + bias_hh)
+
+
+class _RNNBase(nn.Module):
+    """Multi-layer, optionally bidirectional recurrent layer.
+
+    The input projection of every step of every direction is a single GEMM per
+    layer, hoisted out of the time loop, which only keeps the recurrent
+    ``h_t @ U`` product and the fused gate math.
+
+    Parameters of layer ``k`` (suffix ``_reverse`` for the reverse direction),
+    input x gates like the hand written cells the examples used before, whose
+    checkpoints ``upgrade_cell_state_dict`` converts:
+
+    * ``W_l{k}``: (input, directions * gates * hidden), both directions side by side
+    * ``bias_ih_l{k}``: (directions * gates * hidden)
+    * ``U_l{k}``: (hidden, gates * hidden)
+    * ``bias_hh_l{k}``: (gates * hidden), GRU only
+    """
+
+    num_gates = None
+    hidden_bias = False
+
+    def __init__(
+        self,
+        input_size,
+        hidden_size,
+        num_layers=1,
+        batch_first=False,
+        dropout=0.0,
+        bidirectional=False,
+    ):
+        super(_RNNBase, self).__init__()
+        self.input_size = input_size
+        self.hidden_size = hidden_size
+        self.num_layers = num_layers
+        self.batch_first = batch_first
+        self.dropout = float(dropout)
+        self.bidirectional = bidirectional
+        self.num_directions = 2 if bidirectional else 1
+
+        gate_size = self.num_gates * hidden_size
+        for layer in range(num_layers):
+            layer_input_size = (
+                input_size if layer == 0 else hidden_size * self.num_directions
+            )
+            setattr(
+                self,
+                "W_l%d" % layer,
+                nn.Parameter(
+                    flow.Tensor(layer_input_size, gate_size * self.num_directions)
+                ),
+            )
+            setattr(
+                self,
+                "bias_ih_l%d" % layer,
+                nn.Parameter(flow.Tensor(gate_size * self.num_directions)),
+            )
+            for suffix in self._suffixes():
+                setattr(
+                    self,
+                    "U_l%d%s" % (layer, suffix),
+                    nn.Parameter(flow.Tensor(hidden_size, gate_size)),
+                )
+                if self.hidden_bias:
+                    setattr(
+                        self,
+                        "bias_hh_l%d%s" % (layer, suffix),
+                        nn.Parameter(flow.Tensor(gate_size)),
+                    )
+        self.init_weights()
+
+    def _suffixes(self):
+        return ["", "_reverse"][: self.num_directions]
+
+    def init_weights(self):
+        stdv = 1.0 / math.sqrt(self.hidden_size)
+        for weight in self.parameters():
+            weight.data.uniform_(-stdv, stdv)
+
+    def init_state(self, batch_size, device):
+        """Zero state of one direction of one layer."""
+        raise NotImplementedError
+
+    def cell(self, xw_t, state, U, bias_hh):
+        """One step from the precomputed input projection ``xw_t``."""
+        raise NotImplementedError
+
+    def _run_direction(self, xw, state, U, bias_hh, mask, reverse):
+        seq_len = xw.shape[0]
+        outputs = [None] * seq_len
+        steps = range(seq_len - 1, -1, -1) if reverse else range(seq_len)
+        for t in steps:
+            new_state = self.cell(xw[t], state, U, bias_hh)
+            if mask is None:
+                state = new_state
+                outputs[t] = state[0].unsqueeze(0)
+            else:
+                # padded steps keep the state, so the forward direction ends on
+                # the last valid step and the reverse one starts from it
+                m_t = mask[t]
+                state = tuple(
+                    old + m_t * (new - old) for old, new in zip(state, new_state)
+                )
+                outputs[t] = (m_t * state[0]).unsqueeze(0)
+        return flow.cat(outputs, dim=0), state
+
+    def forward(self, input, hx=None, lengths=None, mask=None):
+        """
+        Args:
+            input (flow.Tensor): (seq_len, batch, input_size), or
+                (batch, seq_len, input_size) if ``batch_first``
+            hx: initial states, each of shape
+                (num_layers * num_directions, batch, hidden_size), zeros if None
+            lengths (list or np.array, optional): valid length of every
+                sequence of a padded batch, outputs past it are zeros
+            mask (flow.Tensor, optional): float mask of the valid steps
+                already on the device, (seq_len, batch) or (batch, seq_len) if
+                ``batch_first``, instead of ``lengths``
+
+        Returns:
+            output (seq_len, batch, num_directions * hidden_size) (batch first
+            if ``batch_first``) and the final states of every layer and
+            direction, shaped like ``hx``
+        """
+        if self.batch_first:
+            input = input.transpose(0, 1)
+        seq_len, batch_size, _ = input.shape
+        if lengths is not None:
+            mask = lengths_to_mask(lengths, seq_len, input.device)
+        elif mask is not None:
+            if self.batch_first:
+                mask = mask.transpose(0, 1)
+            mask = mask.unsqueeze(2)
+        gate_size = self.num_gates * self.hidden_size
+
+        final_states = []
+        x = input
+        for layer in range(self.num_layers):
+            if layer > 0 and self.dropout > 0:
+                x = F.dropout(x, p=self.dropout, training=self.training)
+            # input projection of every step and direction in one GEMM
+            xw = flow.matmul(
+                x.reshape(seq_len * batch_size, x.shape[2]),
+                getattr(self, "W_l%d" % layer),
+            ) + getattr(self, "bias_ih_l%d" % layer)
+            xw = xw.reshape(seq_len, batch_size, -1)
+            outputs = []
+            for direction, suffix in enumerate(self._suffixes()):
+                index = layer * self.num_directions + direction
+                if hx is None:
+                    state = self.init_state(batch_size, input.device)
+                else:
+                    state = tuple(h[index] for h in self._states_tuple(hx))
+                output, state = self._run_direction(
+                    xw[:, :, direction * gate_size : (direction + 1) * gate_size],
+                    state,
+                    getattr(self, "U_l%d%s" % (layer, suffix)),
+                    getattr(self, "bias_hh_l%d%s" % (layer, suffix), None),
+                    mask,
+                    reverse=direction == 1,
+                )
+                outputs.append(output)
+                final_states.append(state)
+            x = outputs[0] if len(outputs) == 1 else flow.cat(outputs, dim=2)
+
+        if self.batch_first:
+            x = x.transpose(0, 1)
+        states = tuple(
+            flow.cat([state[i].unsqueeze(0) for state in final_states], dim=0)
+            for i in range(len(final_states[0]))
+        )
+        return x, self._states_result(states)
+
+    def _states_tuple(self, hx):
+        raise NotImplementedError
+
+    def _states_result(self, states):
+        raise NotImplementedError
+
+
+class LSTM(_RNNBase):
+    """Drop-in for ``flow.nn.LSTM(input_size, hidden_size, num_layers,
+    batch_first=..., dropout=..., bidirectional=...)``, gates ordered i, f, g, o
+    as in the former ``CustomLSTM``. ``forward`` returns ``output, (h_n, c_n)``."""
+
+    num_gates = 4
+
+    def init_state(self, batch_size, device):
+        return (
+            flow.zeros((batch_size, self.hidden_size)).to(device),
+            flow.zeros((batch_size, self.hidden_size)).to(device),
+        )
+
+    def cell(self, xw_t, state, U, bias_hh):
+        h_t, c_t = state
+        HS = self.hidden_size
+        gates = xw_t + flow.matmul(h_t, U)
+        # one sigmoid over all the gates, the g slice is recomputed with tanh
+        sig = flow.sigmoid(gates)
+        g_t = flow.tanh(gates[:, HS * 2 : HS * 3])
+        c_t = sig[:, HS : HS * 2] * c_t + sig[:, :HS] * g_t
+        h_t = sig[:, HS * 3 :] * flow.tanh(c_t)
+        return h_t, c_t
+
+    def _states_tuple(self, hx):
+        return hx
+
+    def _states_result(self, states):
+        return states
+
+
+class GRU(_RNNBase):
+    """GRU counterpart of :class:`LSTM`, gates ordered r, z, n as in the
+    former ``GRU_cell_oneflow``. ``forward`` returns ``output, h_n``."""
+
+    num_gates = 3
+    hidden_bias = True
+
+    def init_state(self, batch_size, device):
+        return (flow.zeros((batch_size, self.hidden_size)).to(device),)
+
+    def cell(self, xw_t, state, U, bias_hh):
+        (h_t,) = state
+        HS = self.hidden_size
+        hw = flow.matmul(h_t, U) + bias_hh
+        rz = flow.sigmoid(xw_t[:, : HS * 2] + hw[:, : HS * 2])
+        n_t = flow.tanh(xw_t[:, HS * 2 :] + rz[:, :HS] * hw[:, HS * 2 :])
+        # (1 - z) * n + z * h
+        h_t = n_t + rz[:, HS:] * (h_t - n_t)
+        return (h_t,)
+
+    def _states_tuple(self, hx):
+        return (hx,)
+
+    def _states_result(self, states):
+        return states[0]
@@ -3,10 +3,12 @@ import oneflow as flow
 import argparse
 import numpy as np
 import time
+import sys
 
 from models.ghostnet import ghostnet
-from utils.imagenet1000_clsidx_to_labels import clsidx_2_labels
-from utils.numpy_data_utils import load_image
+
+sys.path.append("../")
+from image_data import clsidx_2_labels, load_image
 
 model_dict = {"ghostnet": ghostnet}
 
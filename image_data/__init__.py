@@ -0,0 +1,4 @@
+from .presets import IMAGENET_MEAN, IMAGENET_STD, NORMALIZATIONS, AUGMENTATIONS
+from .ofrecord_data import OFRecordDataLoader
+from .numpy_data import load_image, NumpyDataLoader
+from .imagenet1000_clsidx_to_labels import clsidx_2_labels
@@ -0,0 +1,91 @@
+"""
+Images/s of every stage of the OFRecord image pipeline: read, decode,
+resize and crop-mirror-normalize, for a resolution, layout and
+augmentation preset.
+
+    python3 -m image_data.compare_pipeline_speed --ofrecord_path ofrecord --mode train
+    python3 -m image_data.compare_pipeline_speed --ofrecord_path ofrecord --image_size 299 --channel_last
+"""
+import argparse
+import time
+
+from image_data import AUGMENTATIONS, OFRecordDataLoader
+
+STAGES = ["read", "decode", "resize", "crop_mirror_normalize"]
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser("flags for image pipeline speed")
+    parser.add_argument("--ofrecord_path", type=str, default="./ofrecord")
+    parser.add_argument("--mode", type=str, default="train", help="train or val")
+    parser.add_argument("--batch_size", type=int, default=64)
+    parser.add_argument("--image_size", type=int, default=224)
+    parser.add_argument("--resize_size", type=int, default=None)
+    parser.add_argument("--channel_last", action="store_true", help="NHWC batches")
+    parser.add_argument("--normalization", type=str, default="imagenet")
+    parser.add_argument(
+        "--augmentation", type=str, default=None, choices=list(AUGMENTATIONS)
+    )
+    parser.add_argument("--iters", type=int, default=50)
+    return parser.parse_args()
+
+
+def run_stages(loader, num_stages):
+    """Runs the first ``num_stages`` stages on one batch and waits for them."""
+    record = loader.record_reader()
+    if num_stages > 1:
+        image = loader.record_image_decoder(record)
+    if num_stages > 2:
+        image = loader.resize(image)[0]
+    if num_stages > 3:
+        rng = loader.flip() if loader.flip is not None else None
+        image = loader.crop_mirror_norm(image, rng)
+    # decoded after the stages on the same CPU stream, reading it waits for them
+    label = loader.record_label_decoder(record)
+    label.numpy()
+
+
+def _seconds_per_batch(loader, num_stages, iters):
+    for _ in range(5):
+        run_stages(loader, num_stages)
+    start = time.time()
+    for _ in range(iters):
+        run_stages(loader, num_stages)
+    return (time.time() - start) / iters
+
+
+def main(args):
+    loader = OFRecordDataLoader(
+        ofrecord_root=args.ofrecord_path,
+        mode=args.mode,
+        batch_size=args.batch_size,
+        image_size=args.image_size,
+        resize_size=args.resize_size,
+        channel_last=args.channel_last,
+        normalization=args.normalization,
+        augmentation=args.augmentation,
+    )
+    print("{} records in {} parts".format(loader.dataset_size, loader.index.num_parts))
+
+    print("| stage | ms/batch | images/s |")
+    print("|---|---|---|")
+    previous = 0.0
+    for num_stages, stage in enumerate(STAGES, 1):
+        # each stage is timed as the difference with the pipeline before it
+        seconds = _seconds_per_batch(loader, num_stages, args.iters)
+        stage_seconds = max(seconds - previous, 1e-9)
+        previous = seconds
+        print(
+            "| {} | {:.2f} | {:.1f} |".format(
+                stage, stage_seconds * 1000, args.batch_size / stage_seconds
+            )
+        )
+    print(
+        "| pipeline | {:.2f} | {:.1f} |".format(
+            previous * 1000, args.batch_size / previous
+        )
+    )
+
+
+if __name__ == "__main__":
+    main(_parse_args())
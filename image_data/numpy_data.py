@@ -3,27 +3,51 @@ import numpy as np
 import os
 import random
 
+from .presets import NORMALIZATIONS
 
-def load_image(image_path="data/fish.jpg"):
-    rgb_mean = [123.68, 116.779, 103.939]
-    rgb_std = [58.393, 57.12, 57.375]
+__all__ = ["load_image", "NumpyDataLoader"]
+
+
+def load_image(
+    image_path="data/fish.jpg",
+    image_size=224,
+    channel_last=False,
+    normalization="imagenet",
+):
+    """Reads an image as a normalized float32 batch of one, (1, 3, image_size,
+    image_size) or (1, image_size, image_size, 3) if ``channel_last``."""
+    rgb_mean, rgb_std = NORMALIZATIONS[normalization]
     im = Image.open(image_path)
-    im = im.resize((224, 224))
+    im = im.resize((image_size, image_size))
     im = im.convert("RGB")
     im = np.array(im).astype("float32")
     im = (im - rgb_mean) / rgb_std
-    im = np.transpose(im, (2, 0, 1))
+    if not channel_last:
+        im = np.transpose(im, (2, 0, 1))
     im = np.expand_dims(im, axis=0)
     return np.ascontiguousarray(im, "float32")
 
 
 class NumpyDataLoader(object):
-    def __init__(self, dataset_root: str, batch_size: int = 1):
+    """Batches of an image folder with one subfolder per class, the other
+    arguments are those of ``load_image``."""
+
+    def __init__(
+        self,
+        dataset_root: str,
+        batch_size: int = 1,
+        image_size: int = 224,
+        channel_last: bool = False,
+        normalization: str = "imagenet",
+    ):
         self.dataset_root = dataset_root
         sub_folders = os.listdir(self.dataset_root)
         self.image_2_class_label_list = []
         self.label_2_class_name = {}
         self.batch_size = batch_size
+        self.image_size = image_size
+        self.channel_last = channel_last
+        self.normalization = normalization
 
         label = -1
         for sf in sub_folders:
@@ -48,7 +72,11 @@ class NumpyDataLoader(object):
         batch_labels = []
         for i in range(self.batch_size):
             image_path, label = self.image_2_class_label_list[self.curr_idx]
-            batch_datas.append(load_image(image_path))
+            batch_datas.append(
+                load_image(
+                    image_path, self.image_size, self.channel_last, self.normalization
+                )
+            )
             batch_labels.append(int(label))
             self.curr_idx += 1
 
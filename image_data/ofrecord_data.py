@@ -0,0 +1,133 @@
+import os
+
+import oneflow as flow
+import oneflow.nn as nn
+
+from ofrecord_index import OFRecordIndex
+
+from .presets import AUGMENTATIONS, NORMALIZATIONS
+
+__all__ = ["OFRecordDataLoader"]
+
+
+class OFRecordDataLoader(nn.Module):
+    """Image classification batches of OFRecord ``part-*`` files holding an
+    "encoded" image and an int32 "class/label" per record.
+
+    Args:
+        ofrecord_root (str): directory of the ``train`` and ``val`` records
+        mode (str): subdirectory read, "train" or "val"
+        dataset_size (int, optional): records per epoch, counted by the
+            OFRecord index by default.
+        batch_size (int): images per batch
+        image_size (int, optional): side of the square images. Default is 224.
+        resize_size (int, optional): shorter side before the center crop of
+            "center_crop", 8 / 7 of image_size (256 for 224) by default.
+        channel_last (bool, optional): NHWC batches instead of NCHW. Default
+            is False.
+        normalization (str, optional): key of ``NORMALIZATIONS``. Default is
+            "imagenet".
+        augmentation (str, optional): key of ``AUGMENTATIONS``, "random_crop"
+            in train mode and "center_crop" otherwise by default.
+        train_shuffle (bool, optional): shuffle the train records every epoch.
+            Default is True.
+    """
+
+    def __init__(
+        self,
+        ofrecord_root: str = "./ofrecord",
+        mode: str = "train",  # "val"
+        dataset_size: int = None,
+        batch_size: int = 1,
+        image_size: int = 224,
+        resize_size: int = None,
+        channel_last: bool = False,
+        normalization: str = "imagenet",
+        augmentation: str = None,
+        train_shuffle: bool = True,
+    ):
+        super().__init__()
+        if augmentation is None:
+            augmentation = "random_crop" if mode == "train" else "center_crop"
+        if resize_size is None:
+            resize_size = image_size * 8 // 7
+        random_crop, resize, mirror = AUGMENTATIONS[augmentation]
+        rgb_mean, rgb_std = NORMALIZATIONS[normalization]
+        output_layout = "NHWC" if channel_last else "NCHW"
+        shuffle = mode == "train" and train_shuffle
+
+        data_dir = os.path.join(ofrecord_root, mode)
+        # counts the records and part files, indexed on first use
+        self.index = OFRecordIndex.open_or_build(data_dir)
+        if dataset_size is None:
+            dataset_size = self.index.num_records
+
+        self.record_reader = flow.nn.OfrecordReader(
+            data_dir,
+            batch_size=batch_size,
+            data_part_num=self.index.num_parts,
+            part_name_suffix_length=self.index.part_name_suffix_length,
+            random_shuffle=shuffle,
+            shuffle_after_epoch=shuffle,
+        )
+        self.record_label_decoder = flow.nn.OfrecordRawDecoder(
+            "class/label", shape=(), dtype=flow.int32
+        )
+
+        color_space = "RGB"
+        self.record_image_decoder = (
+            flow.nn.OFRecordImageDecoderRandomCrop("encoded", color_space=color_space)
+            if random_crop
+            else flow.nn.OFRecordImageDecoder("encoded", color_space=color_space)
+        )
+
+        self.resize = (
+            flow.nn.image.Resize(target_size=[image_size, image_size])
+            if resize == "square"
+            else flow.nn.image.Resize(
+                resize_side="shorter", keep_aspect_ratio=True, target_size=resize_size
+            )
+        )
+
+        self.flip = flow.nn.CoinFlip(batch_size=batch_size) if mirror else None
+
+        self.crop_mirror_norm = (
+            flow.nn.CropMirrorNormalize(
+                color_space=color_space,
+                output_layout=output_layout,
+                mean=rgb_mean,
+                std=rgb_std,
+                output_dtype=flow.float,
+            )
+            if resize == "square"
+            else flow.nn.CropMirrorNormalize(
+                color_space=color_space,
+                output_layout=output_layout,
+                crop_h=image_size,
+                crop_w=image_size,
+                crop_pos_y=0.5,
+                crop_pos_x=0.5,
+                mean=rgb_mean,
+                std=rgb_std,
+                output_dtype=flow.float,
+            )
+        )
+
+        self.batch_size = batch_size
+        self.dataset_size = dataset_size
+
+    def __len__(self):
+        return self.dataset_size // self.batch_size
+
+    def forward(self):
+        record = self.record_reader()
+        label = self.record_label_decoder(record)
+        image_raw_buffer = self.record_image_decoder(record)
+        image = self.resize(image_raw_buffer)[0]
+        rng = self.flip() if self.flip is not None else None
+        image = self.crop_mirror_norm(image, rng)
+
+        return image, label
+
+    def get_batch(self):
+        return self()
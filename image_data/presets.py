@@ -0,0 +1,24 @@
+__all__ = ["IMAGENET_MEAN", "IMAGENET_STD", "NORMALIZATIONS", "AUGMENTATIONS"]
+
+# RGB, in the 0-255 range of decoded images
+IMAGENET_MEAN = [123.68, 116.779, 103.939]
+IMAGENET_STD = [58.393, 57.12, 57.375]
+
+# name -> (mean, std)
+NORMALIZATIONS = {
+    "imagenet": (IMAGENET_MEAN, IMAGENET_STD),
+    # to [-1, 1]
+    "inception": ([127.5, 127.5, 127.5], [127.5, 127.5, 127.5]),
+    "none": ([0.0, 0.0, 0.0], [1.0, 1.0, 1.0]),
+}
+
+# name -> (random crop while decoding, resize, random mirror)
+#   "random_crop": random area and aspect ratio crop resized to the image
+#       size, randomly mirrored, the training pipeline of the examples
+#   "resize_flip": whole image resized to the image size, randomly mirrored
+#   "center_crop": shorter side resized, then the center crop, for evaluation
+AUGMENTATIONS = {
+    "random_crop": (True, "square", True),
+    "resize_flip": (False, "square", True),
+    "center_crop": (False, "shorter", False),
+}
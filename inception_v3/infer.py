@@ -3,10 +3,12 @@ import oneflow as flow
 import argparse
 import numpy as np
 import time
+import sys
 
 from models.inceptionv3 import inception_v3
-from utils.imagenet1000_clsidx_to_labels import clsidx_2_labels
-from utils.numpy_data_utils import load_image
+
+sys.path.append("../")
+from image_data import clsidx_2_labels, load_image
 
 
 def _parse_args():
@@ -38,7 +40,7 @@ def main(args):
     inceptionv3_module.to("cuda")
 
     start_t = time.time()
-    image = load_image(args.image_path)
+    image = load_image(args.image_path, image_size=299)
     image = flow.Tensor(image, device=flow.device("cuda"))
     predictions, aux_predictions = inceptionv3_module(image)
     predictions = predictions.softmax()
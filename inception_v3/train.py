@@ -3,9 +3,12 @@ import argparse
 import numpy as np
 import os
 import time
+import sys
 
 from models.inceptionv3 import inception_v3
-from utils.ofrecord_data_utils import OFRecordDataLoader
+
+sys.path.append("../")
+from image_data import OFRecordDataLoader
 
 
 def _parse_args():
@@ -41,15 +44,17 @@ def main(args):
     train_data_loader = OFRecordDataLoader(
         ofrecord_root=args.ofrecord_path,
         mode="train",
-        dataset_size=9469,
         batch_size=args.train_batch_size,
+        image_size=299,
+        resize_size=299,
     )
 
     val_data_loader = OFRecordDataLoader(
         ofrecord_root=args.ofrecord_path,
         mode="val",
-        dataset_size=3925,
         batch_size=args.val_batch_size,
+        image_size=299,
+        resize_size=299,
     )
 
     # oneflow init
@@ -0,0 +1 @@
+from .fuse import fold_conv_bn, optimize_for_inference
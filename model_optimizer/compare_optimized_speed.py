@@ -0,0 +1,124 @@
+import oneflow as flow
+
+import argparse
+import importlib.util
+import os
+import time
+
+import numpy as np
+
+from model_optimizer import optimize_for_inference
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name -> (model file, factory, input size)
+MODELS = {
+    "resnet50": ("resnet50/models/resnet50.py", "resnet50", 224),
+    "mobilenetv2": ("mobilenetv2/models/mobilenetv2.py", "mobilenet_v2", 224),
+    "mobilenetv3": ("mobilenetv3/models/mobilenetv3.py", "mobilenet_v3_large", 224),
+    "ghostnet": ("ghostnet/models/ghostnet.py", "ghostnet", 224),
+    "shufflenetv2": ("shufflenetv2/models/shufflenetv2.py", "shufflenetv2_x1", 224),
+    "densenet121": ("densenet/models/densenet.py", "densenet121", 224),
+    "dla34": ("DLA/models/dla.py", "dla34", 224),
+    "inception_v3": ("inception_v3/models/inceptionv3.py", "inception_v3", 299),
+}
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        "flags for compare original and optimize_for_inference model speed"
+    )
+    parser.add_argument(
+        "--models",
+        type=str,
+        default=",".join(MODELS),
+        help="comma separated models to compare",
+    )
+    parser.add_argument("--batch_size", type=int, default=16, help="batch size")
+    parser.add_argument("--iters", type=int, default=30, help="timed iterations")
+    parser.add_argument("--device", type=str, default="cuda", help="cuda or cpu")
+    return parser.parse_args()
+
+
+def _load_factory(path, factory):
+    # every example ships its own ``models`` package, load the file directly
+    name = os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(
+        "_compare_" + name, os.path.join(ROOT, path)
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return getattr(module, factory)
+
+
+def _randomize_bn(model):
+    # fresh bn layers are identities, random statistics make the check meaningful
+    new_state_dict = dict()
+    for key, value in model.state_dict().items():
+        value = value.numpy()
+        if key.endswith("running_mean"):
+            value = np.random.uniform(-0.1, 0.1, value.shape).astype(value.dtype)
+        elif key.endswith("running_var"):
+            value = np.random.uniform(0.5, 1.5, value.shape).astype(value.dtype)
+        new_state_dict[key] = value
+    model.load_state_dict(new_state_dict)
+
+
+def _first_output(output):
+    if isinstance(output, (tuple, list)):
+        output = output[0]
+    return output
+
+
+def _benchmark(model, image, iters):
+    with flow.no_grad():
+        for _ in range(5):
+            _first_output(model(image)).numpy()
+        start_t = time.time()
+        for _ in range(iters):
+            output = _first_output(model(image))
+        output = output.numpy()
+    return output, (time.time() - start_t) / iters * 1000
+
+
+def _count(model, types):
+    return sum(isinstance(m, types) for m in model.modules())
+
+
+def main(args):
+    print(
+        "| model | bn before | bn after | original (ms) | optimized (ms) | speedup | max abs diff |"
+    )
+    print("|---|---|---|---|---|---|---|")
+    for name in args.models.split(","):
+        path, factory, size = MODELS[name]
+        model = _load_factory(path, factory)()
+        _randomize_bn(model)
+        model.eval()
+        model.to(args.device)
+        image = flow.Tensor(
+            np.random.randn(args.batch_size, 3, size, size),
+            device=flow.device(args.device),
+        )
+        bn_before = _count(model, flow.nn.BatchNorm2d)
+        original_out, original_time = _benchmark(model, image, args.iters)
+
+        optimize_for_inference(model, example_input=image)
+        optimized_out, optimized_time = _benchmark(model, image, args.iters)
+        print(
+            "| %s | %d | %d | %.2f | %.2f | %.2fx | %.2e |"
+            % (
+                name,
+                bn_before,
+                _count(model, flow.nn.BatchNorm2d),
+                original_time,
+                optimized_time,
+                original_time / optimized_time,
+                np.abs(original_out - optimized_out).max(),
+            )
+        )
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    main(args)
@@ -0,0 +1,231 @@
+import warnings
+
+import numpy as np
+import oneflow as flow
+import oneflow.nn as nn
+
+__all__ = ["fold_conv_bn", "optimize_for_inference"]
+
+
+def fold_conv_bn(conv, bn):
+    """Returns a conv with bias computing ``bn(conv(x))`` in eval mode.
+
+    Same math as ``QConvBN.fold_bn`` of the quantization example, with the
+    running statistics, computed on the host. Returns None when ``bn`` keeps
+    no running statistics.
+    """
+    if getattr(bn, "running_mean", None) is None:
+        return None
+    weight = conv.weight.numpy()
+    out_channels = weight.shape[0]
+    std = np.sqrt(bn.running_var.numpy() + bn.eps)
+    if bn.affine:
+        gamma_ = bn.weight.numpy() / std
+        beta = bn.bias.numpy()
+    else:
+        gamma_ = 1 / std
+        beta = np.zeros(out_channels, dtype=np.float32)
+    if conv.bias is not None:
+        bias = gamma_ * (conv.bias.numpy() - bn.running_mean.numpy()) + beta
+    else:
+        bias = beta - gamma_ * bn.running_mean.numpy()
+
+    fused = nn.Conv2d(
+        in_channels=weight.shape[1] * conv.groups,
+        out_channels=out_channels,
+        kernel_size=conv.kernel_size,
+        stride=conv.stride,
+        padding=conv.padding,
+        dilation=conv.dilation,
+        groups=conv.groups,
+        bias=True,
+    )
+    fused.load_state_dict(
+        {
+            "weight": (weight * gamma_.reshape(-1, 1, 1, 1)).astype(np.float32),
+            "bias": bias.astype(np.float32),
+        }
+    )
+    fused.to(conv.weight.device)
+    fused.eval()
+    return fused
+
+
+def _is_plain_sequential(module):
+    # subclasses with their own forward may index their children
+    return isinstance(module, nn.Sequential) and (
+        type(module).forward is nn.Sequential.forward
+    )
+
+
+def _fuse_sequential(seq):
+    """Folds the BatchNorm2d children following a Conv2d child of a
+    Sequential into it. The bn becomes an Identity rather than being removed,
+    so the indices and state dict keys of the later children do not move."""
+    items = list(seq._modules.items())
+    changed = False
+    for (name, module), (bn_name, bn) in zip(items, items[1:]):
+        if isinstance(module, nn.Conv2d) and isinstance(bn, nn.BatchNorm2d):
+            folded = fold_conv_bn(module, bn)
+            if folded is not None:
+                seq._modules[name] = folded
+                seq._modules[bn_name] = nn.Identity()
+                changed = True
+    return changed
+
+
+def _get_submodule(root, name):
+    module = root
+    for attr in name.split(".") if name else []:
+        module = getattr(module, attr)
+    return module
+
+
+def _set_submodule(root, name, module):
+    parent_name, _, attr = name.rpartition(".")
+    parent = _get_submodule(root, parent_name)
+    setattr(parent, attr, module)
+
+
+def _first_output(output):
+    if isinstance(output, (tuple, list)):
+        output = output[0]
+    return output.numpy()
+
+
+def _trace(root, example_input):
+    """Runs ``root`` once and records which conv fed which bn.
+
+    Returns the call count of every traced module and, for every bn, the name
+    of the module whose output tensor object was its input.
+    """
+    producers = {}
+    keep_alive = []
+    calls = {}
+    inputs = {}
+
+    def wrap(name, module, traced_input):
+        forward = module.forward
+
+        def traced(x, *args, **kwargs):
+            calls[name] = calls.get(name, 0) + 1
+            if traced_input:
+                inputs[name] = producers.get(id(x))
+            out = forward(x, *args, **kwargs)
+            producers[id(out)] = name
+            keep_alive.append(out)
+            return out
+
+        module.forward = traced
+
+    wrapped = []
+    for name, module in root.named_modules():
+        if isinstance(module, nn.Conv2d):
+            wrap(name, module, False)
+        elif isinstance(module, nn.BatchNorm2d):
+            wrap(name, module, True)
+        else:
+            continue
+        wrapped.append(module)
+    try:
+        with flow.no_grad():
+            root(example_input)
+    finally:
+        for module in wrapped:
+            del module.forward
+    return calls, inputs
+
+
+def _fuse_traced(root, example_input):
+    """Folds conv-bn pairs wired through attributes instead of a Sequential,
+    e.g. ``self.relu(self.bn1(self.conv1(x)))``.
+
+    Returns the replaced (name, original module) pairs.
+    """
+    calls, inputs = _trace(root, example_input)
+    modules = dict(root.named_modules())
+
+    def once(name):
+        return name is not None and calls.get(name) == 1
+
+    replacements = {}
+    for name, producer in inputs.items():
+        module = modules[name]
+        if not isinstance(module, nn.BatchNorm2d) or not once(name):
+            continue
+        if once(producer) and isinstance(modules[producer], nn.Conv2d):
+            conv = fold_conv_bn(modules[producer], module)
+            if conv is not None:
+                replacements[producer] = conv
+                replacements[name] = nn.Identity()
+
+    originals = []
+    for name, module in replacements.items():
+        originals.append((name, modules[name]))
+        _set_submodule(root, name, module)
+    return originals
+
+
+def _replace_dropout(root):
+    for name, module in list(root.named_modules()):
+        if name and isinstance(module, nn.Dropout):
+            _set_submodule(root, name, nn.Identity())
+
+
+def optimize_for_inference(module, example_input=None, rtol=1e-3, atol=1e-4):
+    """Rewrites a model in place for faster eval-mode inference.
+
+    * BatchNorm2d layers following a Conv2d are folded into its weights and
+      replaced by Identity, so module names and indices do not change.
+    * Dropout layers become Identity.
+
+    Activations are kept as they are: there is no fused conv + ReLU kernel to
+    call, the gain is the bn pass over the feature map saved per layer.
+
+    Pairs inside ``nn.Sequential`` are found from the module structure alone.
+    Pairs wired through attributes in a custom ``forward`` are found by
+    running ``example_input`` once and following the tensors from conv to bn;
+    the rewrite is then checked against the original outputs and undone if
+    they differ, e.g. when the conv output is also used elsewhere.
+
+    Args:
+        module (nn.Module): model to optimize, switched to eval mode.
+        example_input (flow.Tensor, optional): a batch on the model device,
+            enables the traced pass and the output check. Default is None.
+        rtol, atol (float, optional): tolerances of the output check.
+
+    Returns:
+        nn.Module: the optimized ``module``.
+    """
+    module.eval()
+    reference = None
+    if example_input is not None:
+        with flow.no_grad():
+            reference = _first_output(module(example_input))
+
+    def matches_reference():
+        with flow.no_grad():
+            output = _first_output(module(example_input))
+        return np.allclose(output, reference, rtol=rtol, atol=atol)
+
+    for child in list(module.modules()):
+        if _is_plain_sequential(child):
+            _fuse_sequential(child)
+    _replace_dropout(module)
+
+    if example_input is not None:
+        if not matches_reference():
+            raise RuntimeError(
+                "outputs changed after folding the Sequential containers of {}".format(
+                    type(module).__name__
+                )
+            )
+        originals = _fuse_traced(module, example_input)
+        if originals and not matches_reference():
+            warnings.warn(
+                "traced conv-bn folding changed the outputs of {}, "
+                "keeping the Sequential folding only".format(type(module).__name__)
+            )
+            for name, original in originals:
+                _set_submodule(module, name, original)
+    return module
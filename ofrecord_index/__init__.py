@@ -0,0 +1 @@
+from .index import build_index, OFRecordIndex
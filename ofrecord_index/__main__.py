@@ -0,0 +1,28 @@
+"""
+Builds the index of OFRecord directories ahead of training.
+
+    python3 -m ofrecord_index ofrecord/train ofrecord/val
+"""
+import argparse
+
+from ofrecord_index import build_index
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser("flags for OFRecord indexing")
+    parser.add_argument("data_dirs", nargs="+", help="directories of part-* files")
+    return parser.parse_args()
+
+
+def main(args):
+    for data_dir in args.data_dirs:
+        index = build_index(data_dir)
+        print(
+            "{}: {} records in {} parts".format(
+                data_dir, index.num_records, index.num_parts
+            )
+        )
+
+
+if __name__ == "__main__":
+    main(_parse_args())
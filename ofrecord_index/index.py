@@ -0,0 +1,216 @@
+import json
+import os
+import re
+import struct
+
+import numpy as np
+
+__all__ = ["build_index", "OFRecordIndex"]
+
+INDEX_FILE = "ofrecord_index.json"
+OFFSETS_FILE = "ofrecord_index.npy"
+
+# every record is an int64 byte length followed by the serialized OFRecord
+_HEADER = struct.Struct("<q")
+_PART_RE = re.compile(r"^part-(\d+)$")
+
+
+def list_parts(data_dir):
+    """``part-*`` file names of ``data_dir`` ordered by part number."""
+    parts = []
+    for name in os.listdir(data_dir):
+        match = _PART_RE.match(name)
+        if match is not None:
+            parts.append((int(match.group(1)), name))
+    return [name for _, name in sorted(parts)]
+
+
+def _scan_part(path):
+    """Offsets of the record headers of one part file, reading only the
+    headers."""
+    offsets = []
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        offset = 0
+        while offset < size:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                raise ValueError("truncated record header in {}".format(path))
+            (length,) = _HEADER.unpack(header)
+            if offset + _HEADER.size + length > size:
+                raise ValueError("truncated record in {}".format(path))
+            offsets.append(offset)
+            offset += _HEADER.size + length
+            f.seek(offset)
+    return offsets
+
+
+def _part_sizes(data_dir, parts):
+    return [os.path.getsize(os.path.join(data_dir, name)) for name in parts]
+
+
+def build_index(data_dir):
+    """Scans the OFRecord part files of ``data_dir`` once and writes the
+    record count of every part and the byte offset of every record next to
+    them.
+
+    The offsets go to ``ofrecord_index.npy`` and the parts, with their byte
+    sizes to detect changes, to ``ofrecord_index.json``, written last through
+    a rename so concurrent ranks never read a partial index.
+
+    Returns:
+        OFRecordIndex: the new index, kept in memory only if ``data_dir`` is
+            not writable
+    """
+    parts = list_parts(data_dir)
+    if not parts:
+        raise ValueError("no part-* files in {}".format(data_dir))
+    offsets = [_scan_part(os.path.join(data_dir, name)) for name in parts]
+    index = {
+        "parts": parts,
+        "sizes": _part_sizes(data_dir, parts),
+        "num_records": [len(part_offsets) for part_offsets in offsets],
+    }
+    offsets = np.concatenate(
+        [np.array(part_offsets, dtype=np.int64) for part_offsets in offsets]
+    )
+    try:
+        pid = os.getpid()
+        tmp_offsets = os.path.join(data_dir, "{}.{}".format(OFFSETS_FILE, pid))
+        with open(tmp_offsets, "wb") as f:
+            np.save(f, offsets)
+        os.replace(tmp_offsets, os.path.join(data_dir, OFFSETS_FILE))
+        tmp_index = os.path.join(data_dir, "{}.{}".format(INDEX_FILE, pid))
+        with open(tmp_index, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_index, os.path.join(data_dir, INDEX_FILE))
+    except OSError as e:
+        print("WARNING: could not write the index of {}: {}".format(data_dir, e))
+    return OFRecordIndex(data_dir, index, offsets)
+
+
+class OFRecordIndex:
+    """Record counts and offsets of the OFRecord part files of a directory.
+
+    Gives the dataset size without passing it by hand, and random access
+    to single records, e.g. to shard records over the ranks of data parallel
+    training.
+
+    Args:
+        data_dir (str): directory of the ``part-*`` files
+        index (dict): content of ``ofrecord_index.json``
+        offsets (np.array): int64 offsets of every record, part after part
+    """
+
+    def __init__(self, data_dir, index, offsets):
+        self.data_dir = data_dir
+        self.parts = index["parts"]
+        self.part_sizes = np.array(index["sizes"], dtype=np.int64)
+        self.part_num_records = np.array(index["num_records"], dtype=np.int64)
+        # global id of the first record of every part
+        self.part_starts = np.concatenate([[0], np.cumsum(self.part_num_records)])
+        self.offsets = offsets
+        self._files = {}
+
+    @classmethod
+    def open(cls, data_dir):
+        with open(os.path.join(data_dir, INDEX_FILE)) as f:
+            index = json.load(f)
+        offsets = np.load(os.path.join(data_dir, OFFSETS_FILE))
+        return cls(data_dir, index, offsets)
+
+    @classmethod
+    def open_or_build(cls, data_dir):
+        """Opens the index of ``data_dir``, building it first if it is
+        missing or the part files changed since."""
+        if os.path.exists(os.path.join(data_dir, INDEX_FILE)):
+            index = cls.open(data_dir)
+            parts = list_parts(data_dir)
+            if index.parts == parts and index.part_sizes.tolist() == _part_sizes(
+                data_dir, parts
+            ):
+                return index
+        print("Indexing OFRecord parts of {}".format(data_dir))
+        return build_index(data_dir)
+
+    @property
+    def num_parts(self):
+        return len(self.parts)
+
+    @property
+    def part_name_suffix_length(self):
+        """``part_name_suffix_length`` of ``OfrecordReader`` for these parts,
+        the zero padded width of the part numbers or -1 if not padded."""
+        suffixes = [name[len("part-") :] for name in self.parts]
+        if any(len(suffix) > 1 and suffix[0] == "0" for suffix in suffixes):
+            return len(suffixes[0])
+        return -1
+
+    @property
+    def num_records(self):
+        return int(self.part_starts[-1])
+
+    def __len__(self):
+        return self.num_records
+
+    def locate(self, i):
+        """(part, byte offset) of record ``i``."""
+        if not 0 <= i < self.num_records:
+            raise IndexError("record {} out of range".format(i))
+        part = int(np.searchsorted(self.part_starts, i, side="right")) - 1
+        return part, int(self.offsets[i])
+
+    def read(self, i):
+        """Serialized bytes of record ``i``, see ``parse``."""
+        part, offset = self.locate(i)
+        f = self._files.get(part)
+        if f is None:
+            f = self._files[part] = open(
+                os.path.join(self.data_dir, self.parts[part]), "rb"
+            )
+        f.seek(offset)
+        (length,) = _HEADER.unpack(f.read(_HEADER.size))
+        return f.read(length)
+
+    def __getitem__(self, i):
+        return self.read(i)
+
+    @staticmethod
+    def parse(buf):
+        """``oneflow.core.record.record_pb2.OFRecord`` of serialized bytes."""
+        from oneflow.core.record import record_pb2
+
+        return record_pb2.OFRecord.FromString(buf)
+
+    def shard(self, rank, world_size, shuffle=False, seed=0):
+        """Record ids read by ``rank`` out of ``world_size`` ranks.
+
+        Records are dealt round robin, after a permutation seeded by ``seed``
+        if ``shuffle``, e.g. the epoch so every rank draws the same one. Every
+        rank gets ``num_records // world_size`` records so all run the same
+        number of steps, the remainder is dropped.
+        """
+        ids = np.arange(self.num_records)
+        if shuffle:
+            ids = np.random.RandomState(seed).permutation(ids)
+        per_rank = self.num_records // world_size
+        return ids[rank : per_rank * world_size : world_size]
+
+    def iter_shard(self, rank, world_size, shuffle=False, seed=0):
+        """Serialized records of ``shard(rank, world_size, shuffle, seed)``."""
+        for i in self.shard(rank, world_size, shuffle, seed):
+            yield self.read(int(i))
+
+    def part_shard(self, rank, world_size):
+        """Part files of ``rank`` when whole parts are dealt round robin to
+        ``world_size`` ranks, and their number of records."""
+        parts = list(range(rank, self.num_parts, world_size))
+        return (
+            [self.parts[part] for part in parts],
+            int(self.part_num_records[parts].sum()),
+        )
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        self._files = {}
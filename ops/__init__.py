@@ -1,5 +1,5 @@
 from .roi_align import RoIAlign
-from .nms import nms
+from .nms import nms, batched_nms
 
 
 def lib_path():
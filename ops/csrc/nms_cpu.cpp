@@ -0,0 +1,110 @@
+#include "oneflow/core/framework/framework.h"
+#include "oneflow/core/thread/thread_manager.h"
+
+namespace oneflow {
+
+namespace {
+
+constexpr int kBlockSize = sizeof(int64_t) * 8;
+
+template<typename T>
+inline T CeilDiv(T a, T b) {
+  return (a + b - 1) / b;
+}
+
+template<typename T>
+inline T IoU(T const* const a, T const* const b) {
+  T interS = std::max(std::min(a[2], b[2]) - std::max(a[0], b[0]), static_cast<T>(0))
+             * std::max(std::min(a[3], b[3]) - std::max(a[1], b[1]), static_cast<T>(0));
+  T Sa = (a[2] - a[0]) * (a[3] - a[1]);
+  T Sb = (b[2] - b[0]) * (b[3] - b[1]);
+  return interS / (Sa + Sb - interS);
+}
+
+// Same layout as the gpu kernel: row i holds one bit per box j > i, packed into
+// num_blocks words, telling whether box j is suppressed by box i.
+template<typename T>
+void CalcSuppressionBitmaskMatrix(int num_boxes, int num_blocks, float iou_threshold,
+                                  const T* boxes, int64_t* suppression_bmask_matrix) {
+  MultiThreadLoop(num_boxes, [&](size_t i) {
+    const T* cur_box_ptr = boxes + i * 4;
+    int64_t* row_bmask = suppression_bmask_matrix + i * num_blocks;
+    for (int block = i / kBlockSize; block < num_blocks; ++block) {
+      const int col_size = std::min(num_boxes - block * kBlockSize, kBlockSize);
+      int start = 0;
+      if (block == i / kBlockSize) { start = i % kBlockSize + 1; }
+      uint64_t bits = 0;
+      for (int j = start; j < col_size; ++j) {
+        if (IoU(cur_box_ptr, boxes + (block * kBlockSize + j) * 4) > iou_threshold) {
+          bits |= 1ULL << j;
+        }
+      }
+      row_bmask[block] = static_cast<int64_t>(bits);
+    }
+  });
+}
+
+void ScanSuppression(int num_boxes, int num_blocks, int num_keep, const int64_t* suppression_bmask,
+                     int8_t* keep_mask) {
+  std::vector<uint64_t> remv(num_blocks, 0);
+  for (int i = 0; i < num_boxes && num_keep > 0; ++i) {
+    const int block_n = i / kBlockSize;
+    const int block_i = i % kBlockSize;
+    if (remv[block_n] & (1ULL << block_i)) { continue; }
+    keep_mask[i] = 1;
+    num_keep -= 1;
+    const int64_t* row_bmask = suppression_bmask + i * num_blocks;
+    for (int block = block_n; block < num_blocks; ++block) {
+      remv[block] |= static_cast<uint64_t>(row_bmask[block]);
+    }
+  }
+}
+
+}  // namespace
+
+template<typename T>
+class NmsCpuKernel final : public user_op::OpKernel {
+ public:
+  NmsCpuKernel() = default;
+  ~NmsCpuKernel() = default;
+
+ private:
+  void Compute(user_op::KernelComputeContext* ctx) const override {
+    const user_op::Tensor* boxes_blob = ctx->Tensor4ArgNameAndIndex("in", 0);
+    user_op::Tensor* keep_blob = ctx->Tensor4ArgNameAndIndex("out", 0);
+    user_op::Tensor* tmp_blob = ctx->Tensor4ArgNameAndIndex("tmp_buffer", 0);
+    const T* boxes = boxes_blob->dptr<T>();
+    int8_t* keep = keep_blob->mut_dptr<int8_t>();
+    int64_t* suppression_mask = tmp_blob->mut_dptr<int64_t>();
+
+    const int num_boxes = boxes_blob->shape().At(0);
+    int num_keep = ctx->Attr<int>("keep_n");
+    if (num_keep <= 0 || num_keep > num_boxes) { num_keep = num_boxes; }
+    const int num_blocks = CeilDiv<int>(num_boxes, kBlockSize);
+    std::memset(suppression_mask, 0, num_boxes * num_blocks * sizeof(int64_t));
+    std::memset(keep, 0, num_boxes * sizeof(int8_t));
+
+    CalcSuppressionBitmaskMatrix(num_boxes, num_blocks, ctx->Attr<float>("iou_threshold"), boxes,
+                                 suppression_mask);
+    ScanSuppression(num_boxes, num_blocks, num_keep, suppression_mask, keep);
+  }
+  bool AlwaysComputeWhenAllOutputsEmpty() const override { return false; }
+};
+
+#define REGISTER_NMS_CPU_KERNEL(dtype)                                                 \
+  REGISTER_USER_KERNEL("nms")                                                          \
+      .SetCreateFn<NmsCpuKernel<dtype>>()                                              \
+      .SetIsMatchedHob((user_op::HobDeviceTag() == "cpu")                              \
+                       & (user_op::HobDataType("out", 0) == DataType::kInt8)           \
+                       & (user_op::HobDataType("in", 0) == GetDataType<dtype>::value)) \
+      .SetInferTmpSizeFn([](user_op::InferContext* ctx) {                              \
+        Shape* in_shape = ctx->Shape4ArgNameAndIndex("in", 0);                         \
+        int64_t num_boxes = in_shape->At(0);                                           \
+        int64_t blocks = CeilDiv<int64_t>(num_boxes, kBlockSize);                      \
+        return num_boxes * blocks * sizeof(int64_t);                                   \
+      });
+
+REGISTER_NMS_CPU_KERNEL(float)
+REGISTER_NMS_CPU_KERNEL(double)
+
+}  // namespace oneflow
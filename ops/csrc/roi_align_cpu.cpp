@@ -0,0 +1,286 @@
+#include "oneflow/core/framework/framework.h"
+#include "oneflow/core/thread/thread_manager.h"
+
+namespace oneflow {
+
+namespace {
+
+template<typename T>
+T BilinearInterpolate(const T *channel_dptr, const int32_t height, const int32_t width, T y, T x) {
+  if (y < -1.0 || y > height || x < -1.0 || x > width) { return 0; }
+
+  if (y <= 0) { y = 0; }
+  if (x <= 0) { x = 0; }
+  int32_t y_low = static_cast<int32_t>(y);
+  int32_t x_low = static_cast<int32_t>(x);
+  int32_t y_high = 0;
+  int32_t x_high = 0;
+
+  if (y_low >= height - 1) {
+    y_low = height - 1;
+    y_high = y_low;
+    y = static_cast<T>(y_low);
+  } else {
+    y_high = y_low + 1;
+  }
+
+  if (x_low >= width - 1) {
+    x_low = width - 1;
+    x_high = x_low;
+    x = static_cast<T>(x_low);
+  } else {
+    x_high = x_low + 1;
+  }
+
+  const T ly = y - y_low;
+  const T lx = x - x_low;
+  const T hy = 1.f - ly;
+  const T hx = 1.f - lx;
+
+  const int64_t q11 = y_low * width + x_low;
+  const int64_t q21 = y_low * width + x_high;
+  const int64_t q12 = y_high * width + x_low;
+  const int64_t q22 = y_high * width + x_high;
+  return (hy * hx) * channel_dptr[q11] + (hy * lx) * channel_dptr[q21]
+         + (ly * hx) * channel_dptr[q12] + (ly * lx) * channel_dptr[q22];
+}
+
+template<typename T>
+bool BilinearInterpolateDiff(const T bin_diff_avg, const int64_t height, const int64_t width, T y,
+                             T x, T &diff11, T &diff21, T &diff12, T &diff22, int32_t &x_low,
+                             int32_t &x_high, int32_t &y_low, int32_t &y_high) {
+  if (y < -1.0 || y > height || x < -1.0 || x > width) { return false; }
+
+  if (y <= 0) { y = 0; }
+  if (x <= 0) { x = 0; }
+
+  y_low = static_cast<int32_t>(y);
+  x_low = static_cast<int32_t>(x);
+
+  if (y_low >= height - 1) {
+    y_low = height - 1;
+    y_high = y_low;
+    y = static_cast<T>(y_low);
+  } else {
+    y_high = y_low + 1;
+  }
+
+  if (x_low >= width - 1) {
+    x_low = width - 1;
+    x_high = x_low;
+    x = static_cast<T>(x_low);
+  } else {
+    x_high = x_low + 1;
+  }
+
+  const T ly = y - y_low;
+  const T lx = x - x_low;
+  const T hy = 1.f - ly;
+  const T hx = 1.f - lx;
+
+  diff11 = bin_diff_avg * hy * hx;
+  diff21 = bin_diff_avg * hy * lx;
+  diff12 = bin_diff_avg * ly * hx;
+  diff22 = bin_diff_avg * ly * lx;
+  return true;
+}
+
+template<typename T>
+struct RoiGeometry {
+  int64_t n;
+  T roi_start_h;
+  T roi_start_w;
+  T bin_height;
+  T bin_width;
+  int32_t bin_grid_height;
+  int32_t bin_grid_width;
+};
+
+template<typename T>
+RoiGeometry<T> GetRoiGeometry(const T *offset_rois_dptr, const T spatial_scale,
+                              const int32_t sampling_ratio, const int64_t pooled_height,
+                              const int64_t pooled_width, const bool aligned) {
+  RoiGeometry<T> geo;
+  geo.n = static_cast<int64_t>(offset_rois_dptr[0]);
+  const T align_offset = aligned ? static_cast<T>(0.5) : static_cast<T>(0.f);
+  geo.roi_start_w = offset_rois_dptr[1] * spatial_scale - align_offset;
+  geo.roi_start_h = offset_rois_dptr[2] * spatial_scale - align_offset;
+  const T roi_end_w = offset_rois_dptr[3] * spatial_scale - align_offset;
+  const T roi_end_h = offset_rois_dptr[4] * spatial_scale - align_offset;
+  T roi_height = roi_end_h - geo.roi_start_h;
+  T roi_width = roi_end_w - geo.roi_start_w;
+  // aligned == false is for compatibility. the argument "aligned" doesn't
+  // have the semantic of determining minimum roi size
+  if (aligned == false) {
+    roi_height = std::max(roi_height, static_cast<T>(1.0));
+    roi_width = std::max(roi_width, static_cast<T>(1.0));
+  }
+  geo.bin_height = static_cast<T>(roi_height) / static_cast<T>(pooled_height);
+  geo.bin_width = static_cast<T>(roi_width) / static_cast<T>(pooled_width);
+  geo.bin_grid_height =
+      (sampling_ratio > 0) ? sampling_ratio : std::ceil(roi_height / pooled_height);
+  geo.bin_grid_width = (sampling_ratio > 0) ? sampling_ratio : std::ceil(roi_width / pooled_width);
+  return geo;
+}
+
+// One task per (roi, channel) pair, each task computing a whole pooled plane.
+template<typename T>
+void RoiAlignForward(const int64_t num_rois, const T *in_dptr, const T *rois_dptr,
+                     const T spatial_scale, const int32_t sampling_ratio,
+                     const int64_t channel_num, const int64_t height, const int64_t width,
+                     const int64_t pooled_height, const int64_t pooled_width, const bool aligned,
+                     T *out_dptr) {
+  const int64_t pooled_area = pooled_height * pooled_width;
+  MultiThreadLoop(num_rois * channel_num, [&](size_t task) {
+    const int64_t r = task / channel_num;
+    const int64_t c = task % channel_num;
+    const RoiGeometry<T> geo = GetRoiGeometry(rois_dptr + r * 5, spatial_scale, sampling_ratio,
+                                              pooled_height, pooled_width, aligned);
+    const T count = std::max(geo.bin_grid_height * geo.bin_grid_width, 1);
+    const T *channel_dptr = in_dptr + (geo.n * channel_num + c) * height * width;
+    T *out_plane_dptr = out_dptr + task * pooled_area;
+    FOR_RANGE(int64_t, h, 0, pooled_height) {
+      FOR_RANGE(int64_t, w, 0, pooled_width) {
+        T out_val = 0.0;
+        FOR_RANGE(int64_t, grid_i, 0, geo.bin_grid_height) {
+          // + .5f for center position
+          T y = geo.roi_start_h + h * geo.bin_height
+                + static_cast<T>(grid_i + 0.5f) * geo.bin_height
+                      / static_cast<T>(geo.bin_grid_height);
+          FOR_RANGE(int64_t, grid_j, 0, geo.bin_grid_width) {
+            T x = geo.roi_start_w + w * geo.bin_width
+                  + static_cast<T>(grid_j + 0.5f) * geo.bin_width
+                        / static_cast<T>(geo.bin_grid_width);
+            out_val += BilinearInterpolate(channel_dptr, height, width, y, x);
+          }
+        }
+        out_plane_dptr[h * pooled_width + w] = out_val / count;
+      }
+    }
+  });
+}
+
+// Several rois may scatter into the same input plane, so the backward pass is
+// parallelized over channels only: every task owns the dx planes of one channel
+// and walks all rois, which needs no atomics.
+template<typename T>
+void RoiAlignBackward(const int64_t num_rois, const T *out_diff_dptr, const T *rois_dptr,
+                      const T spatial_scale, const int32_t sampling_ratio,
+                      const int64_t channel_num, const int64_t height, const int64_t width,
+                      const int64_t pooled_height, const int64_t pooled_width, const bool aligned,
+                      T *in_diff_dptr) {
+  const int64_t pooled_area = pooled_height * pooled_width;
+  MultiThreadLoop(channel_num, [&](size_t c) {
+    FOR_RANGE(int64_t, r, 0, num_rois) {
+      const RoiGeometry<T> geo = GetRoiGeometry(rois_dptr + r * 5, spatial_scale, sampling_ratio,
+                                                pooled_height, pooled_width, aligned);
+      const T count = std::max(geo.bin_grid_height * geo.bin_grid_width, 1);
+      const T *out_diff_plane_dptr = out_diff_dptr + (r * channel_num + c) * pooled_area;
+      T *in_diff_channel_dptr = in_diff_dptr + (geo.n * channel_num + c) * height * width;
+      FOR_RANGE(int64_t, h, 0, pooled_height) {
+        FOR_RANGE(int64_t, w, 0, pooled_width) {
+          const T bin_diff_avg = out_diff_plane_dptr[h * pooled_width + w] / count;
+          FOR_RANGE(int64_t, grid_i, 0, geo.bin_grid_height) {
+            // + .5f for center position
+            T y = geo.roi_start_h + h * geo.bin_height
+                  + static_cast<T>(grid_i + 0.5f) * geo.bin_height
+                        / static_cast<T>(geo.bin_grid_height);
+            FOR_RANGE(int64_t, grid_j, 0, geo.bin_grid_width) {
+              T x = geo.roi_start_w + w * geo.bin_width
+                    + static_cast<T>(grid_j + 0.5f) * geo.bin_width
+                          / static_cast<T>(geo.bin_grid_width);
+              T diff11 = 0;
+              T diff21 = 0;
+              T diff12 = 0;
+              T diff22 = 0;
+              int32_t x_low = 0;
+              int32_t x_high = 0;
+              int32_t y_low = 0;
+              int32_t y_high = 0;
+              bool has_diff =
+                  BilinearInterpolateDiff(bin_diff_avg, height, width, y, x, diff11, diff21,
+                                          diff12, diff22, x_low, x_high, y_low, y_high);
+              if (has_diff) {
+                in_diff_channel_dptr[y_low * width + x_low] += diff11;
+                in_diff_channel_dptr[y_low * width + x_high] += diff21;
+                in_diff_channel_dptr[y_high * width + x_low] += diff12;
+                in_diff_channel_dptr[y_high * width + x_high] += diff22;
+              }
+            }
+          }
+        }
+      }
+    }
+  });
+}
+
+}  // namespace
+
+template<typename T>
+class RoIAlignCpuKernel final : public user_op::OpKernel {
+ public:
+  RoIAlignCpuKernel() = default;
+  ~RoIAlignCpuKernel() = default;
+
+ private:
+  void Compute(user_op::KernelComputeContext *ctx) const override {
+    const user_op::Tensor *x_blob = ctx->Tensor4ArgNameAndIndex("x", 0);
+    const user_op::Tensor *rois_blob = ctx->Tensor4ArgNameAndIndex("rois", 0);
+    user_op::Tensor *y_blob = ctx->Tensor4ArgNameAndIndex("y", 0);
+    const int32_t pooled_h = ctx->Attr<int32_t>("pooled_h");
+    const int32_t pooled_w = ctx->Attr<int32_t>("pooled_w");
+    const float spatial_scale = ctx->Attr<float>("spatial_scale");
+    const int32_t sampling_ratio = ctx->Attr<int32_t>("sampling_ratio");
+    const bool aligned = ctx->Attr<bool>("aligned");
+
+    RoiAlignForward<T>(rois_blob->shape().At(0), x_blob->dptr<T>(), rois_blob->dptr<T>(),
+                       spatial_scale, sampling_ratio, x_blob->shape().At(1),
+                       x_blob->shape().At(2), x_blob->shape().At(3), pooled_h, pooled_w, aligned,
+                       y_blob->mut_dptr<T>());
+  }
+  bool AlwaysComputeWhenAllOutputsEmpty() const override { return false; }
+};
+
+template<typename T>
+class RoIAlignGradCpuKernel final : public user_op::OpKernel {
+ public:
+  RoIAlignGradCpuKernel() = default;
+  ~RoIAlignGradCpuKernel() = default;
+
+ private:
+  void Compute(user_op::KernelComputeContext *ctx) const override {
+    user_op::Tensor *dx_blob = ctx->Tensor4ArgNameAndIndex("dx", 0);
+    if (dx_blob == nullptr) { return; }
+    std::memset(dx_blob->mut_dptr<T>(), 0, dx_blob->shape().elem_cnt() * sizeof(T));
+    const user_op::Tensor *dy_blob = ctx->Tensor4ArgNameAndIndex("dy", 0);
+    const user_op::Tensor *rois_blob = ctx->Tensor4ArgNameAndIndex("rois", 0);
+    const int32_t pooled_h = ctx->Attr<int32_t>("pooled_h");
+    const int32_t pooled_w = ctx->Attr<int32_t>("pooled_w");
+    const float spatial_scale = ctx->Attr<float>("spatial_scale");
+    const int32_t sampling_ratio = ctx->Attr<int32_t>("sampling_ratio");
+    const bool aligned = ctx->Attr<bool>("aligned");
+
+    if (dy_blob->shape().elem_cnt() > 0) {
+      RoiAlignBackward<T>(rois_blob->shape().At(0), dy_blob->dptr<T>(), rois_blob->dptr<T>(),
+                          spatial_scale, sampling_ratio, dx_blob->shape().At(1),
+                          dx_blob->shape().At(2), dx_blob->shape().At(3), pooled_h, pooled_w,
+                          aligned, dx_blob->mut_dptr<T>());
+    }
+  }
+  bool AlwaysComputeWhenAllOutputsEmpty() const override { return false; }
+};
+
+#define REGISTER_ROI_ALIGN_CPU_KERNEL(dtype)                                                   \
+  REGISTER_USER_KERNEL("roi_align")                                                            \
+      .SetCreateFn<RoIAlignCpuKernel<dtype>>()                                                 \
+      .SetIsMatchedHob((user_op::HobDeviceTag() == "cpu")                                      \
+                       & (user_op::HobDataType("y", 0) == GetDataType<dtype>::value));         \
+  REGISTER_USER_KERNEL("roi_align_grad")                                                       \
+      .SetCreateFn<RoIAlignGradCpuKernel<dtype>>()                                             \
+      .SetIsMatchedHob((user_op::HobDeviceTag() == "cpu")                                      \
+                       & (user_op::HobDataType("dx", 0) == GetDataType<dtype>::value));
+
+REGISTER_ROI_ALIGN_CPU_KERNEL(float)
+REGISTER_ROI_ALIGN_CPU_KERNEL(double)
+
+}  // namespace oneflow
@@ -3,17 +3,62 @@ import oneflow as flow_exp
 from oneflow import Tensor
 
 
-def nms(boxes: Tensor, scores: Tensor, iou_threshold: float) -> Tensor:
-    scores_inds = flow_exp.argsort(scores, dim=0, descending=True)
-    boxes = flow.F.gather(boxes, scores_inds, axis=0)
-    _nms_op = (
+def _nms_op(iou_threshold: float, keep_n: int):
+    return (
         flow_exp.builtin_op("nms")
         .Input("in")
         .Output("out")
         .Attr("iou_threshold", iou_threshold)
-        .Attr("keep_n", -1)
+        .Attr("keep_n", keep_n)
         .Build()
     )
-    keep = _nms_op(boxes)[0]
+
+
+def nms(
+    boxes: Tensor, scores: Tensor, iou_threshold: float, keep_n: int = -1
+) -> Tensor:
+    """Returns the indices of the kept boxes sorted by decreasing score.
+
+    ``keep_n`` caps the number of kept boxes, ``-1`` keeps all of them.
+    """
+    scores_inds = flow_exp.argsort(scores, dim=0, descending=True)
+    boxes = flow.F.gather(boxes, scores_inds, axis=0)
+    keep = _nms_op(iou_threshold, keep_n)(boxes)[0]
+    index = flow_exp.squeeze(flow_exp.argwhere(keep), dim=[1])
+    return flow.F.gather(scores_inds, index, axis=0)
+
+
+def batched_nms(
+    boxes: Tensor,
+    scores: Tensor,
+    idxs: Tensor,
+    iou_threshold: float,
+    pre_nms_top_n: int = -1,
+    post_nms_top_n: int = -1,
+) -> Tensor:
+    """Class-aware nms over all boxes in a single op launch.
+
+    Boxes only suppress boxes sharing the same value in ``idxs`` (a class id,
+    an image id or a combination of both). Every group is shifted by an offset
+    larger than the largest coordinate so boxes of different groups never
+    overlap, then one nms runs over the shifted boxes.
+
+    ``pre_nms_top_n`` keeps only the highest scoring boxes before nms and
+    ``post_nms_top_n`` caps the number of boxes returned, ``-1`` disables
+    either limit. Returns indices into ``boxes`` sorted by decreasing score.
+    """
+    if boxes.shape[0] == 0:
+        return flow.Tensor([], dtype=flow.int64, device=boxes.device)
+
+    scores_inds = flow_exp.argsort(scores, dim=0, descending=True)
+    if 0 < pre_nms_top_n < boxes.shape[0]:
+        scores_inds = scores_inds[:pre_nms_top_n]
+
+    max_coordinate = flow_exp.max(boxes)
+    offsets = idxs.to(dtype=boxes.dtype) * (max_coordinate + 1)
+    boxes_for_nms = boxes + flow_exp.unsqueeze(offsets, 1)
+    boxes_for_nms = flow.F.gather(boxes_for_nms, scores_inds, axis=0)
+
+    keep = _nms_op(iou_threshold, post_nms_top_n)(boxes_for_nms)[0]
     index = flow_exp.squeeze(flow_exp.argwhere(keep), dim=[1])
     return flow.F.gather(scores_inds, index, axis=0)
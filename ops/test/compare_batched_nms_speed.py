@@ -0,0 +1,82 @@
+import argparse
+import ctypes
+import time
+
+import numpy as np
+
+import oneflow as flow
+from ops import nms, batched_nms, lib_path
+
+p = ctypes.CDLL(lib_path())
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser("flags for compare batched nms and per-class nms")
+    parser.add_argument("--device", type=str, default="cuda")
+    parser.add_argument("--num_classes", type=int, default=80)
+    parser.add_argument("--iou_threshold", type=float, default=0.5)
+    parser.add_argument("--iters", type=int, default=10)
+    return parser.parse_args()
+
+
+def per_class_nms(boxes, scores, idxs, iou_threshold, num_classes):
+    keep = []
+    for c in range(num_classes):
+        inds = flow.squeeze(flow.argwhere(idxs == c), dim=[1])
+        if inds.shape[0] == 0:
+            continue
+        class_keep = nms(
+            flow.F.gather(boxes, inds, axis=0),
+            flow.F.gather(scores, inds, axis=0),
+            iou_threshold,
+        )
+        keep.append(flow.F.gather(inds, class_keep, axis=0))
+    return flow.cat(keep, dim=0)
+
+
+def timeit(fn, iters):
+    fn().numpy()
+    start_t = time.time()
+    for _ in range(iters):
+        out = fn()
+    out.numpy()
+    return (time.time() - start_t) / iters
+
+
+def main(args):
+    device = flow.device(args.device)
+    for num_boxes in [1000, 10000, 100000]:
+        boxes = np.random.rand(num_boxes, 4) * 1000
+        boxes[:, 2:] = boxes[:, :2] + np.random.rand(num_boxes, 2) * 100
+        boxes = flow.Tensor(boxes, dtype=flow.float32, device=device)
+        scores = flow.Tensor(
+            np.random.rand(num_boxes), dtype=flow.float32, device=device
+        )
+        idxs = flow.Tensor(
+            np.random.randint(0, args.num_classes, size=(num_boxes,)),
+            dtype=flow.int64,
+            device=device,
+        )
+
+        loop_time = timeit(
+            lambda: per_class_nms(
+                boxes, scores, idxs, args.iou_threshold, args.num_classes
+            ),
+            args.iters,
+        )
+        batched_time = timeit(
+            lambda: batched_nms(boxes, scores, idxs, args.iou_threshold), args.iters
+        )
+        print(
+            "boxes: {:>6d}, per-class loop: {:.3f} ms, batched_nms: {:.3f} ms, speedup: {:.2f}x".format(
+                num_boxes,
+                loop_time * 1000,
+                batched_time * 1000,
+                loop_time / batched_time,
+            )
+        )
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    main(args)
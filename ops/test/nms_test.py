@@ -1,4 +1,5 @@
 import ctypes
+import time
 import unittest
 from collections import OrderedDict
 
@@ -6,7 +7,7 @@ import numpy as np
 
 import oneflow as flow
 from oneflow.test.modules.test_util import GenArgList
-from ops import nms, lib_path
+from ops import nms, batched_nms, lib_path
 
 p = ctypes.CDLL(lib_path())
 
@@ -69,16 +70,50 @@ def _test_nms(test_case, device):
     boxes, scores = create_tensors_with_iou(1000, iou)
     boxes = flow.Tensor(boxes, dtype=flow.float32, device=flow.device(device))
     scores = flow.Tensor(scores, dtype=flow.float32, device=flow.device(device))
+    start = time.perf_counter()
     keep_np = nms_np(boxes.numpy(), scores.numpy(), iou)
-    keep = nms(boxes, scores, iou)
-    test_case.assertTrue(np.allclose(keep.numpy(), keep_np))
+    np_time = time.perf_counter() - start
+    start = time.perf_counter()
+    keep = nms(boxes, scores, iou).numpy()
+    of_time = time.perf_counter() - start
+    print(
+        f"nms {device}: oneflow {of_time * 1000:.3f} ms, numpy {np_time * 1000:.3f} ms"
+    )
+    test_case.assertTrue(np.allclose(keep, keep_np))
+
+
+def batched_nms_np(boxes, scores, idxs, iou_threshold, pre_nms_top_n, post_nms_top_n):
+    order = np.argsort(-scores, kind="stable")
+    if pre_nms_top_n > 0:
+        order = order[:pre_nms_top_n]
+    picked = []
+    for idx in np.unique(idxs[order]):
+        group = order[idxs[order] == idx]
+        picked.append(group[nms_np(boxes[group], scores[group], iou_threshold)])
+    picked = np.concatenate(picked)
+    picked = picked[np.argsort(-scores[picked], kind="stable")]
+    if post_nms_top_n > 0:
+        picked = picked[:post_nms_top_n]
+    return picked
+
+
+def _test_batched_nms(test_case, device):
+    iou = 0.5
+    boxes, scores = create_tensors_with_iou(1000, iou)
+    idxs = np.random.randint(low=0, high=10, size=(1000,))
+    keep_np = batched_nms_np(boxes, scores, idxs, iou, 800, 300)
+    boxes = flow.Tensor(boxes, dtype=flow.float32, device=flow.device(device))
+    scores = flow.Tensor(scores, dtype=flow.float32, device=flow.device(device))
+    idxs = flow.Tensor(idxs, dtype=flow.int64, device=flow.device(device))
+    keep = batched_nms(boxes, scores, idxs, iou, 800, 300)
+    test_case.assertTrue(np.array_equal(keep.numpy(), keep_np))
 
 
 class TestNMS(flow.unittest.TestCase):
     def test_nms(test_case):
         arg_dict = OrderedDict()
-        arg_dict["test_fun"] = [_test_nms]
-        arg_dict["device"] = ["cuda"]
+        arg_dict["test_fun"] = [_test_nms, _test_batched_nms]
+        arg_dict["device"] = ["cpu", "cuda"]
         for arg in GenArgList(arg_dict):
             arg[0](test_case, *arg[1:])
 
@@ -1,4 +1,5 @@
 import ctypes
+import time
 import unittest
 from collections import OrderedDict
 
@@ -497,9 +498,16 @@ def _test_roi_align(test_case, device):
     )
 
     roi_align_module = RoIAlign((14, 14), 2.0, 2, True)
-    of_out = roi_align_module(input, rois)
+    start = time.perf_counter()
+    of_out = roi_align_module(input, rois).numpy()
+    of_time = time.perf_counter() - start
+    start = time.perf_counter()
     np_out = roi_align_np(input.numpy(), rois.numpy(), 14, 14, 2.0, 2, True)
-    test_case.assertTrue(np.allclose(of_out.numpy(), np_out, rtol=1e-4, atol=1e-4))
+    np_time = time.perf_counter() - start
+    print(
+        f"roi_align {device}: oneflow {of_time * 1000:.3f} ms, numpy {np_time * 1000:.3f} ms"
+    )
+    test_case.assertTrue(np.allclose(of_out, np_out, rtol=1e-4, atol=1e-4))
 
 
 def _test_roi_align_backward(test_case, device):
@@ -508,18 +516,20 @@ def _test_roi_align_backward(test_case, device):
     )
     rois = flow.Tensor(rois_np, dtype=flow.float32, device=flow.device(device))
     roi_align_module = RoIAlign((5, 5), 2.0, 2, True)
+    start = time.perf_counter()
     of_out = roi_align_module(input, rois)
     of_out.sum().backward()
-    test_case.assertTrue(
-        np.allclose(input.grad.numpy(), input_grad_np, rtol=1e-5, atol=1e-5)
-    )
+    input_grad = input.grad.numpy()
+    of_time = time.perf_counter() - start
+    print(f"roi_align backward {device}: oneflow {of_time * 1000:.3f} ms")
+    test_case.assertTrue(np.allclose(input_grad, input_grad_np, rtol=1e-5, atol=1e-5))
 
 
 class TestRoIAlign(flow.unittest.TestCase):
     def test_roi_align(test_case):
         arg_dict = OrderedDict()
-        arg_dict["test_fun"] = [_test_roi_align]
-        arg_dict["device"] = ["cuda"]
+        arg_dict["test_fun"] = [_test_roi_align, _test_roi_align_backward]
+        arg_dict["device"] = ["cpu", "cuda"]
         for arg in GenArgList(arg_dict):
             arg[0](test_case, *arg[1:])
 
@@ -2,11 +2,14 @@ import oneflow as flow
 import argparse
 import numpy as np
 import time
+import sys
 
 from models.posenet import PoseNet
 
 from utils.clsidx_to_labels import clsidx_2_labels
-from utils.numpy_data_utils import load_image
+
+sys.path.append("../")
+from image_data import load_image
 
 
 def _parse_args():
@@ -42,7 +45,7 @@ def main(args):
     posenet_module.to("cuda")
 
     start_t = time.time()
-    image = load_image(args.image_path)
+    image = load_image(args.image_path, image_size=299)
     image = flow.Tensor(image, device=flow.device("cuda"))
     logits = posenet_module(image)
     predictions = logits.softmax()
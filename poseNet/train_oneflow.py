@@ -3,10 +3,12 @@ import argparse
 import numpy as np
 import os
 import time
+import sys
 
 from models.posenet import PoseNet
 
-from utils.ofrecord_data_utils import OFRecordDataLoader
+sys.path.append("../")
+from image_data import OFRecordDataLoader
 
 from visdom import Visdom
 
@@ -50,16 +52,17 @@ def main(args):
     train_data_loader = OFRecordDataLoader(
         ofrecord_root=args.ofrecord_path,
         mode="train",
-        # NOTE(Liang Depeng): needs to explictly set the dataset size
-        dataset_size=7459,
         batch_size=args.train_batch_size,
+        image_size=299,
+        resize_size=299,
     )
 
     val_data_loader = OFRecordDataLoader(
         ofrecord_root=args.ofrecord_path,
         mode="val",
-        dataset_size=1990,
         batch_size=args.val_batch_size,
+        image_size=299,
+        resize_size=299,
     )
 
     # oneflow init
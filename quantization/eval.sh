@@ -0,0 +1,23 @@
+set -aux
+
+PRETRAIN_MODEL_PATH="./checkpoints/epoch_19_val_acc_0.732143"
+OFRECORD_PATH="ofrecord"
+VAL_BATCH_SIZE=16
+QUANTIZATION_BIT=8
+QUANTIZATION_SCHEME="symmetric"
+QUANTIZATION_FORMULA="google"
+PER_LAYER_QUANTIZATION=True
+
+if [ ! -d "$OFRECORD_PATH" ]; then
+    wget https://oneflow-public.oss-cn-beijing.aliyuncs.com/datasets/imagenette_ofrecord.tar.gz
+    tar zxf imagenette_ofrecord.tar.gz
+fi
+
+python3 quantization_eval.py \
+    --model_path $PRETRAIN_MODEL_PATH \
+    --ofrecord_path $OFRECORD_PATH \
+    --val_batch_size $VAL_BATCH_SIZE \
+    --quantization_bit $QUANTIZATION_BIT \
+    --quantization_scheme $QUANTIZATION_SCHEME \
+    --quantization_formula $QUANTIZATION_FORMULA \
+    --per_layer_quantization $PER_LAYER_QUANTIZATION
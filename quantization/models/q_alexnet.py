@@ -1,3 +1,4 @@
+import numpy as np
 import oneflow as flow
 import oneflow.nn as nn
 from quantization_ops import *
@@ -47,6 +48,7 @@ class QuantizationAlexNet(nn.Module):
         quantization_scheme="symmetric",
         quantization_formula="google",
         per_layer_quantization=True,
+        activation_observer="minmax",
     ):
         self.q_features = nn.Sequential(
             q_conv(
@@ -57,6 +59,7 @@ class QuantizationAlexNet(nn.Module):
                 quantization_scheme=quantization_scheme,
                 quantization_formula=quantization_formula,
                 per_layer_quantization=per_layer_quantization,
+                activation_observer=activation_observer,
             ),
             nn.ReLU(inplace=True),
             nn.MaxPool2d(kernel_size=3, stride=2),
@@ -68,6 +71,7 @@ class QuantizationAlexNet(nn.Module):
                 quantization_scheme=quantization_scheme,
                 quantization_formula=quantization_formula,
                 per_layer_quantization=per_layer_quantization,
+                activation_observer=activation_observer,
             ),
             nn.ReLU(inplace=True),
             nn.MaxPool2d(kernel_size=3, stride=2),
@@ -79,6 +83,7 @@ class QuantizationAlexNet(nn.Module):
                 quantization_scheme=quantization_scheme,
                 quantization_formula=quantization_formula,
                 per_layer_quantization=per_layer_quantization,
+                activation_observer=activation_observer,
             ),
             nn.ReLU(inplace=True),
             q_conv(
@@ -89,6 +94,7 @@ class QuantizationAlexNet(nn.Module):
                 quantization_scheme=quantization_scheme,
                 quantization_formula=quantization_formula,
                 per_layer_quantization=per_layer_quantization,
+                activation_observer=activation_observer,
             ),
             nn.ReLU(inplace=True),
             q_conv(
@@ -99,6 +105,7 @@ class QuantizationAlexNet(nn.Module):
                 quantization_scheme=quantization_scheme,
                 quantization_formula=quantization_formula,
                 per_layer_quantization=per_layer_quantization,
+                activation_observer=activation_observer,
             ),
             nn.ReLU(inplace=True),
             nn.MaxPool2d(kernel_size=3, stride=2),
@@ -114,6 +121,7 @@ class QuantizationAlexNet(nn.Module):
                 quantization_scheme=quantization_scheme,
                 quantization_formula=quantization_formula,
                 per_layer_quantization=per_layer_quantization,
+                activation_observer=activation_observer,
             ),
             nn.ReLU(inplace=True),
             nn.Dropout(),
@@ -125,6 +133,7 @@ class QuantizationAlexNet(nn.Module):
                 quantization_scheme=quantization_scheme,
                 quantization_formula=quantization_formula,
                 per_layer_quantization=per_layer_quantization,
+                activation_observer=activation_observer,
             ),
             nn.ReLU(inplace=True),
             q_linear(
@@ -135,6 +144,7 @@ class QuantizationAlexNet(nn.Module):
                 quantization_scheme=quantization_scheme,
                 quantization_formula=quantization_formula,
                 per_layer_quantization=per_layer_quantization,
+                activation_observer=activation_observer,
             ),
         )
 
@@ -145,6 +155,15 @@ class QuantizationAlexNet(nn.Module):
         x = self.q_classifier(x)
         return x
 
+    def calibrate(self, data_loader, num_batches, device="cuda"):
+        """Post-training calibration: runs ``num_batches`` quantized forward
+        passes without backward so the observers can collect ranges."""
+        self.eval()
+        with flow.no_grad():
+            for b in range(num_batches):
+                image, _ = data_loader.get_batch()
+                self.quantize_forward(image.to(device))
+
     def freeze(self):
         self.q_features[0].freeze()
         self.q_features[3].freeze(self.q_features[0].qo)
@@ -154,3 +173,19 @@ class QuantizationAlexNet(nn.Module):
         self.q_classifier[1].freeze(self.q_features[10].qo)
         self.q_classifier[4].freeze(self.q_classifier[1].qo)
         self.q_classifier[6].freeze(self.q_classifier[4].qo)
+
+    def to_integer(self):
+        """Builds the integer-only engine from the frozen quantized layers."""
+        layers, qo = convert_sequential(self.q_features, self.q_features[0].qi)
+        layers += convert_sequential([self.q_avgpool, nn.Flatten(1)], qo)[0]
+        layers += convert_sequential(self.q_classifier, qo)[0]
+        self.integer_model = IntegerModel(
+            layers, self.q_features[0].qi, self.q_classifier[6].qo
+        )
+        return self.integer_model
+
+    def quantize_inference(self, x):
+        if not hasattr(self, "integer_model"):
+            self.to_integer()
+        x = x.numpy() if isinstance(x, flow.Tensor) else np.asarray(x)
+        return flow.Tensor(self.integer_model(x))
@@ -0,0 +1,127 @@
+import oneflow as flow
+
+import argparse
+import os
+import sys
+
+from models.q_alexnet import QuantizationAlexNet
+from quantization_eval import evaluate
+
+sys.path.append("../")
+from image_data import OFRecordDataLoader
+
+
+def _str2bool(v):
+    return str(v).lower() in ("true", "yes", "1")
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser("flags for post training quantization")
+    parser.add_argument(
+        "--model_path",
+        type=str,
+        default="./alexnet_oneflow_model",
+        help="float alexnet model path",
+    )
+    parser.add_argument(
+        "--ofrecord_path", type=str, default="./ofrecord", help="dataset path"
+    )
+    parser.add_argument(
+        "--save_checkpoint_path",
+        type=str,
+        default="",
+        help="save the calibrated model if not empty",
+    )
+    parser.add_argument(
+        "--calib_batch_size", type=int, default=32, help="calibration batch size"
+    )
+    parser.add_argument(
+        "--calibration_batches",
+        type=int,
+        default=32,
+        help="number of batches run to collect activation ranges",
+    )
+    parser.add_argument("--val_batch_size", type=int, default=16, help="val batch size")
+    parser.add_argument(
+        "--quantization_bit", type=int, default=8, help="quantization bit"
+    )
+    parser.add_argument(
+        "--quantization_scheme",
+        type=str,
+        default="symmetric",
+        help="quantization scheme",
+    )
+    parser.add_argument(
+        "--quantization_formula",
+        type=str,
+        default="google",
+        help="quantization formula",
+    )
+    parser.add_argument(
+        "--per_layer_quantization",
+        type=_str2bool,
+        default=False,
+        help="quantize weights per layer instead of per output channel",
+    )
+    parser.add_argument(
+        "--activation_observer",
+        type=str,
+        default="histogram",
+        choices=["minmax", "moving_average", "histogram"],
+        help="observer collecting activation ranges",
+    )
+    return parser.parse_args()
+
+
+def main(args):
+    calib_data_loader = OFRecordDataLoader(
+        ofrecord_root=args.ofrecord_path,
+        mode="train",
+        batch_size=args.calib_batch_size,
+    )
+    val_data_loader = OFRecordDataLoader(
+        ofrecord_root=args.ofrecord_path, mode="val", batch_size=args.val_batch_size,
+    )
+
+    quantization_module = QuantizationAlexNet()
+    # the quantized layers wrap the float ones, so loading the float weights
+    # before quantize() is enough
+    quantization_module.load_state_dict(flow.load(args.model_path))
+    quantization_module.quantize(
+        quantization_bit=args.quantization_bit,
+        quantization_scheme=args.quantization_scheme,
+        quantization_formula=args.quantization_formula,
+        per_layer_quantization=args.per_layer_quantization,
+        activation_observer=args.activation_observer,
+    )
+    quantization_module.to("cuda")
+    quantization_module.eval()
+
+    evaluate(
+        lambda image: quantization_module(image.to("cuda")),
+        val_data_loader,
+        args.val_batch_size,
+        "float",
+    )
+
+    quantization_module.calibrate(calib_data_loader, args.calibration_batches)
+    if args.save_checkpoint_path != "":
+        flow.save(
+            quantization_module.state_dict(),
+            os.path.join(
+                args.save_checkpoint_path, "ptq_%s" % args.activation_observer
+            ),
+        )
+
+    quantization_module.freeze()
+    evaluate(
+        quantization_module.quantize_inference,
+        val_data_loader,
+        args.val_batch_size,
+        "integer",
+    )
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    main(args)
@@ -0,0 +1,25 @@
+set -aux
+
+FLOAT_MODEL_PATH="./alexnet_oneflow_model"
+OFRECORD_PATH="ofrecord"
+CALIBRATION_BATCHES=32
+QUANTIZATION_BIT=8
+QUANTIZATION_SCHEME="symmetric"
+QUANTIZATION_FORMULA="google"
+PER_LAYER_QUANTIZATION=False
+ACTIVATION_OBSERVER="histogram"
+
+if [ ! -d "$OFRECORD_PATH" ]; then
+    wget https://oneflow-public.oss-cn-beijing.aliyuncs.com/datasets/imagenette_ofrecord.tar.gz
+    tar zxf imagenette_ofrecord.tar.gz
+fi
+
+python3 post_training_quantization.py \
+    --model_path $FLOAT_MODEL_PATH \
+    --ofrecord_path $OFRECORD_PATH \
+    --calibration_batches $CALIBRATION_BATCHES \
+    --quantization_bit $QUANTIZATION_BIT \
+    --quantization_scheme $QUANTIZATION_SCHEME \
+    --quantization_formula $QUANTIZATION_FORMULA \
+    --per_layer_quantization $PER_LAYER_QUANTIZATION \
+    --activation_observer $ACTIVATION_OBSERVER
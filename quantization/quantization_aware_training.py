@@ -3,8 +3,10 @@ import argparse
 import numpy as np
 import os
 import time
+import sys
 
-from utils.ofrecord_data_utils import OFRecordDataLoader
+sys.path.append("../")
+from image_data import OFRecordDataLoader
 from models.q_alexnet import QuantizationAlexNet
 
 
@@ -62,15 +64,11 @@ def main(args):
     train_data_loader = OFRecordDataLoader(
         ofrecord_root=args.ofrecord_path,
         mode="train",
-        dataset_size=9469,
         batch_size=args.train_batch_size,
     )
 
     val_data_loader = OFRecordDataLoader(
-        ofrecord_root=args.ofrecord_path,
-        mode="val",
-        dataset_size=3925,
-        batch_size=args.val_batch_size,
+        ofrecord_root=args.ofrecord_path, mode="val", batch_size=args.val_batch_size,
     )
 
     # oneflow init
@@ -0,0 +1,121 @@
+import oneflow as flow
+
+import argparse
+import numpy as np
+import time
+import sys
+
+from models.q_alexnet import QuantizationAlexNet
+
+sys.path.append("../")
+from image_data import OFRecordDataLoader
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        "flags for compare float, fake quantized and integer alexnet"
+    )
+    parser.add_argument(
+        "--model_path", type=str, default="./alexnet_oneflow_model", help="model path"
+    )
+    parser.add_argument(
+        "--ofrecord_path", type=str, default="./ofrecord", help="dataset path"
+    )
+    parser.add_argument("--val_batch_size", type=int, default=16, help="val batch size")
+    parser.add_argument(
+        "--calibration_batches",
+        type=int,
+        default=10,
+        help="batches used to collect activation ranges before freezing",
+    )
+    parser.add_argument(
+        "--quantization_bit", type=int, default=8, help="quantization bit"
+    )
+    parser.add_argument(
+        "--quantization_scheme",
+        type=str,
+        default="symmetric",
+        help="quantization scheme",
+    )
+    parser.add_argument(
+        "--quantization_formula",
+        type=str,
+        default="google",
+        help="quantization formula",
+    )
+    parser.add_argument(
+        "--per_layer_quantization",
+        type=bool,
+        default=True,
+        help="per_layer_quantization",
+    )
+    return parser.parse_args()
+
+
+def evaluate(forward, data_loader, batch_size, name):
+    correct = 0.0
+    infer_time = 0.0
+    for b in range(len(data_loader)):
+        image, label = data_loader.get_batch()
+        start_t = time.time()
+        with flow.no_grad():
+            logits = forward(image)
+        clsidxs = np.argmax(logits.numpy(), axis=1)
+        infer_time += time.time() - start_t
+        correct += np.sum(clsidxs == label.numpy())
+    samples = len(data_loader) * batch_size
+    print(
+        "%s top1 val acc: %f, latency: %.3f ms/batch, throughput: %.1f images/s"
+        % (
+            name,
+            correct / samples,
+            infer_time / len(data_loader) * 1000,
+            samples / infer_time,
+        )
+    )
+
+
+def main(args):
+    val_data_loader = OFRecordDataLoader(
+        ofrecord_root=args.ofrecord_path, mode="val", batch_size=args.val_batch_size,
+    )
+
+    quantization_module = QuantizationAlexNet()
+    quantization_module.quantize(
+        quantization_bit=args.quantization_bit,
+        quantization_scheme=args.quantization_scheme,
+        quantization_formula=args.quantization_formula,
+        per_layer_quantization=args.per_layer_quantization,
+    )
+    quantization_module.load_state_dict(flow.load(args.model_path))
+    quantization_module.eval()
+
+    # float and fake quantized models run on cpu as well so the numbers are
+    # comparable with the cpu integer engine
+    evaluate(quantization_module, val_data_loader, args.val_batch_size, "float")
+    evaluate(
+        quantization_module.quantize_forward,
+        val_data_loader,
+        args.val_batch_size,
+        "fake quantized",
+    )
+
+    # freeze() uses the ranges the observers saw last, refresh them on a few batches
+    for b in range(args.calibration_batches):
+        image, _ = val_data_loader.get_batch()
+        with flow.no_grad():
+            quantization_module.quantize_forward(image)
+    quantization_module.freeze()
+    integer_model = quantization_module.to_integer()
+    print("integer weights: %.2f MB" % (integer_model.weight_bytes() / 1024 ** 2))
+    evaluate(
+        quantization_module.quantize_inference,
+        val_data_loader,
+        args.val_batch_size,
+        "integer",
+    )
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    main(args)
@@ -1,3 +1,4 @@
 from quantization_ops.conv import QConv2d as q_conv
 from quantization_ops.linear import QLinear as q_linear
 from quantization_ops.conv_bn import QConvBN as q_conv_bn
+from quantization_ops.int_inference import IntegerModel, convert_sequential
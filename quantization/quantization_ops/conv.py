@@ -14,6 +14,7 @@ class QConv2d(QModule):
         quantization_scheme="symmetric",
         quantization_formula="google",
         per_layer_quantization=True,
+        activation_observer="minmax",
     ):
         super(QConv2d, self).__init__(
             qi=qi,
@@ -22,6 +23,7 @@ class QConv2d(QModule):
             quantization_scheme=quantization_scheme,
             quantization_formula=quantization_formula,
             per_layer_quantization=per_layer_quantization,
+            activation_observer=activation_observer,
         )
         self.quantization_bit = quantization_bit
         self.quantization_scheme = quantization_scheme
@@ -87,10 +89,8 @@ class QConv2d(QModule):
         self.M = self.qw.scale.numpy() * self.qi.scale.numpy() / self.qo.scale.numpy()
 
         self.conv_module.weight = flow.nn.Parameter(
-            self.qw.quantize_tensor(self.conv_module.weight) - self.qw.zero_point
+            self.quantize_weight(self.conv_module.weight)
         )
         self.conv_module.bias = flow.nn.Parameter(
-            self.quantization(
-                self.conv_module.bias, self.qi.scale * self.qw.scale, flow.Tensor([0])
-            )
+            self.quantize_bias(self.conv_module.bias)
         )
@@ -15,6 +15,7 @@ class QConvBN(QModule):
         quantization_scheme="symmetric",
         quantization_formula="google",
         per_layer_quantization=True,
+        activation_observer="minmax",
     ):
         super(QConvBN, self).__init__(
             qi=qi,
@@ -23,6 +24,7 @@ class QConvBN(QModule):
             quantization_scheme=quantization_scheme,
             quantization_formula=quantization_formula,
             per_layer_quantization=per_layer_quantization,
+            activation_observer=activation_observer,
         )
         self.quantization_bit = quantization_bit
         self.quantization_scheme = quantization_scheme
@@ -135,13 +137,8 @@ class QConvBN(QModule):
             self.qo = qo
         self.M = self.qw.scale.numpy() * self.qi.scale.numpy() / self.qo.scale.numpy()
 
-        weight, bias = self.fold_bn(
-            self.bn_module.running_mean, self.bn_module.running_var
-        )
-        self.conv_module.weight = flow.nn.Parameter(
-            self.qw.quantize_tensor(weight) - self.qw.zero_point
-        )
+        std = flow.sqrt(self.bn_module.running_var + self.bn_module.eps)
+        weight, bias = self.fold_bn(self.bn_module.running_mean, std)
+        self.conv_module.weight = flow.nn.Parameter(self.quantize_weight(weight))
 
-        self.conv_module.bias = flow.nn.Parameter(
-            self.quantization(bias, self.qi.scale * self.qw.scale, flow.Tensor([0]))
-        )
+        self.conv_module.bias = flow.nn.Parameter(self.quantize_bias(bias))
@@ -0,0 +1,329 @@
+import numpy as np
+import oneflow.nn as nn
+
+from quantization_ops.conv import QConv2d
+from quantization_ops.conv_bn import QConvBN
+from quantization_ops.linear import QLinear
+
+__all__ = [
+    "IntegerModel",
+    "IntConv2d",
+    "IntLinear",
+    "IntReLU",
+    "IntMaxPool2d",
+    "IntAdaptiveAvgPool2d",
+    "IntFlatten",
+    "convert_sequential",
+    "quantize_multiplier",
+]
+
+
+def _pair(x):
+    return tuple(x) if isinstance(x, (tuple, list)) else (x, x)
+
+
+def quantized_range(qparam):
+    bit = qparam.quantization_bit
+    if qparam.quantization_scheme == "affine":
+        return 0, 2 ** bit - 1
+    return -(2 ** (bit - 1) - 1), 2 ** (bit - 1) - 1
+
+
+def _scale_and_zero_point(qparam):
+    scale = qparam.scale.numpy().astype(np.float64).reshape(-1)
+    zero_point = np.rint(qparam.zero_point.numpy()).astype(np.int64).reshape(-1)
+    return scale, zero_point
+
+
+def _per_tensor(qparam, name):
+    scale, zero_point = _scale_and_zero_point(qparam)
+    if scale.size != 1:
+        raise ValueError(
+            "%s must be quantized per layer for integer inference, got %d scales"
+            % (name, scale.size)
+        )
+    return scale[0], int(zero_point[0])
+
+
+def _compact(array):
+    """Stores integer weights in the narrowest signed type holding them."""
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if array.min() >= info.min and array.max() <= info.max:
+            return array.astype(dtype)
+    return array.astype(np.int64)
+
+
+def quantize_multiplier(M):
+    """Splits real multipliers M into int32 mantissas M0 and shifts so that
+    ``x * M == (x * M0) >> shift`` up to rounding."""
+    M = np.asarray(M, dtype=np.float64).reshape(-1)
+    mantissa, exponent = np.frexp(M)
+    M0 = np.rint(mantissa * (1 << 31)).astype(np.int64)
+    overflow = M0 == (1 << 31)
+    M0[overflow] //= 2
+    exponent[overflow] += 1
+    return M0, (31 - exponent).astype(np.int64)
+
+
+def fixed_point_multiply(acc, M0, shift):
+    """Rounding fixed-point multiply of int64 accumulators, no float math."""
+    left = np.maximum(-shift, 0)
+    right = np.maximum(shift, 0)
+    prod = (acc << left) * M0
+    rounding = (np.int64(1) << right) >> 1
+    return (prod + rounding) >> right
+
+
+def _int_matmul(a, b):
+    # int8 x int8 products summed over at most a few hundred thousand terms
+    # stay far below 2 ** 53, so a float64 GEMM gives the exact int32
+    # accumulator while running on the BLAS backend.
+    return np.rint(np.matmul(a.astype(np.float64), b.astype(np.float64))).astype(
+        np.int64
+    )
+
+
+class IntConv2d(object):
+    def __init__(
+        self,
+        weight,
+        bias,
+        M0,
+        shift,
+        in_zero_point,
+        out_zero_point,
+        out_range,
+        stride=1,
+        padding=0,
+        dilation=1,
+        groups=1,
+    ):
+        self.weight = _compact(weight)
+        self.bias = None if bias is None else bias.astype(np.int32)
+        self.M0 = M0.reshape(1, -1, 1, 1)
+        self.shift = shift.reshape(1, -1, 1, 1)
+        self.in_zero_point = in_zero_point
+        self.out_zero_point = out_zero_point
+        self.out_range = out_range
+        self.stride = _pair(stride)
+        self.padding = _pair(padding)
+        self.dilation = _pair(dilation)
+        self.groups = groups
+
+    @classmethod
+    def from_qmodule(cls, qmodule):
+        if not hasattr(qmodule, "M"):
+            raise ValueError("%s must be frozen first" % type(qmodule).__name__)
+        conv = qmodule.conv_module
+        M0, shift = quantize_multiplier(qmodule.M)
+        bias = None
+        if conv.bias is not None:
+            bias = np.rint(conv.bias.numpy()).astype(np.int64)
+        return cls(
+            np.rint(conv.weight.numpy()).astype(np.int64),
+            bias,
+            M0,
+            shift,
+            _per_tensor(qmodule.qi, "qi")[1],
+            _per_tensor(qmodule.qo, "qo")[1],
+            quantized_range(qmodule.qo),
+            stride=conv.stride,
+            padding=conv.padding,
+            dilation=conv.dilation,
+            groups=conv.groups,
+        )
+
+    def _im2col(self, x):
+        kh, kw = self.weight.shape[2:]
+        sh, sw = self.stride
+        ph, pw = self.padding
+        dh, dw = self.dilation
+        # zero padding of the zero-point shifted input equals padding the
+        # quantized input with its zero point
+        x = np.pad(x, ((0, 0), (0, 0), (ph, ph), (pw, pw)))
+        windows = np.lib.stride_tricks.sliding_window_view(
+            x, ((kh - 1) * dh + 1, (kw - 1) * dw + 1), axis=(2, 3)
+        )[:, :, ::sh, ::sw, ::dh, ::dw]
+        n, c, oh, ow = windows.shape[:4]
+        cols = windows.transpose(0, 1, 4, 5, 2, 3).reshape(n, c * kh * kw, oh * ow)
+        return cols, oh, ow
+
+    def __call__(self, x):
+        x = x.astype(np.int64) - self.in_zero_point
+        n = x.shape[0]
+        out_channels = self.weight.shape[0]
+        in_per_group = x.shape[1] // self.groups
+        out_per_group = out_channels // self.groups
+        outs = []
+        for g in range(self.groups):
+            cols, oh, ow = self._im2col(x[:, g * in_per_group : (g + 1) * in_per_group])
+            w = self.weight[g * out_per_group : (g + 1) * out_per_group]
+            outs.append(_int_matmul(w.reshape(out_per_group, -1), cols))
+        acc = np.concatenate(outs, axis=1).reshape(n, out_channels, oh, ow)
+        if self.bias is not None:
+            acc += self.bias.reshape(1, -1, 1, 1)
+        out = fixed_point_multiply(acc, self.M0, self.shift) + self.out_zero_point
+        return np.clip(out, *self.out_range)
+
+
+class IntLinear(object):
+    def __init__(
+        self, weight, bias, M0, shift, in_zero_point, out_zero_point, out_range
+    ):
+        self.weight = _compact(weight)
+        self.bias = None if bias is None else bias.astype(np.int32)
+        self.M0 = M0.reshape(1, -1)
+        self.shift = shift.reshape(1, -1)
+        self.in_zero_point = in_zero_point
+        self.out_zero_point = out_zero_point
+        self.out_range = out_range
+
+    @classmethod
+    def from_qmodule(cls, qmodule):
+        if not hasattr(qmodule, "M"):
+            raise ValueError("%s must be frozen first" % type(qmodule).__name__)
+        fc = qmodule.fc_module
+        M0, shift = quantize_multiplier(qmodule.M)
+        bias = None
+        if fc.bias is not None:
+            bias = np.rint(fc.bias.numpy()).astype(np.int64)
+        return cls(
+            np.rint(fc.weight.numpy()).astype(np.int64),
+            bias,
+            M0,
+            shift,
+            _per_tensor(qmodule.qi, "qi")[1],
+            _per_tensor(qmodule.qo, "qo")[1],
+            quantized_range(qmodule.qo),
+        )
+
+    def __call__(self, x):
+        x = x.astype(np.int64) - self.in_zero_point
+        acc = _int_matmul(x, self.weight.T)
+        if self.bias is not None:
+            acc += self.bias.reshape(1, -1)
+        out = fixed_point_multiply(acc, self.M0, self.shift) + self.out_zero_point
+        return np.clip(out, *self.out_range)
+
+
+class IntReLU(object):
+    def __init__(self, zero_point):
+        self.zero_point = zero_point
+
+    def __call__(self, x):
+        return np.maximum(x, self.zero_point)
+
+
+class IntMaxPool2d(object):
+    def __init__(self, kernel_size, stride=None, padding=0):
+        self.kernel_size = _pair(kernel_size)
+        self.stride = _pair(stride if stride is not None else kernel_size)
+        self.padding = _pair(padding)
+
+    def __call__(self, x):
+        ph, pw = self.padding
+        if ph or pw:
+            x = np.pad(
+                x,
+                ((0, 0), (0, 0), (ph, ph), (pw, pw)),
+                constant_values=np.iinfo(np.int64).min,
+            )
+        windows = np.lib.stride_tricks.sliding_window_view(
+            x, self.kernel_size, axis=(2, 3)
+        )[:, :, :: self.stride[0], :: self.stride[1]]
+        return windows.max(axis=(4, 5))
+
+
+class IntAdaptiveAvgPool2d(object):
+    def __init__(self, output_size):
+        self.output_size = _pair(output_size)
+
+    def __call__(self, x):
+        h, w = x.shape[2:]
+        oh, ow = self.output_size
+        if (h, w) == (oh, ow):
+            return x
+        out = np.empty(x.shape[:2] + (oh, ow), dtype=np.int64)
+        for i in range(oh):
+            hs, he = (i * h) // oh, -(-((i + 1) * h) // oh)
+            for j in range(ow):
+                ws, we = (j * w) // ow, -(-((j + 1) * w) // ow)
+                count = (he - hs) * (we - ws)
+                total = x[:, :, hs:he, ws:we].sum(axis=(2, 3))
+                out[:, :, i, j] = (2 * total + count) // (2 * count)
+        return out
+
+
+class IntFlatten(object):
+    def __call__(self, x):
+        return x.reshape(x.shape[0], -1)
+
+
+def convert_sequential(modules, qparam):
+    """Converts frozen quantized modules into integer layers.
+
+    ``qparam`` describes the quantized input of ``modules``; it is needed to
+    clamp ReLUs at the right zero point. Returns the layers and the qparam of
+    the last output.
+    """
+    layers = []
+    for module in modules:
+        if isinstance(module, (QConv2d, QConvBN)):
+            layers.append(IntConv2d.from_qmodule(module))
+            qparam = module.qo
+        elif isinstance(module, QLinear):
+            layers.append(IntLinear.from_qmodule(module))
+            qparam = module.qo
+        elif isinstance(module, nn.ReLU):
+            layers.append(IntReLU(_per_tensor(qparam, "relu input")[1]))
+        elif isinstance(module, nn.MaxPool2d):
+            layers.append(
+                IntMaxPool2d(module.kernel_size, module.stride, module.padding)
+            )
+        elif isinstance(module, nn.AdaptiveAvgPool2d):
+            layers.append(IntAdaptiveAvgPool2d(module.output_size))
+        elif isinstance(module, nn.Flatten):
+            layers.append(IntFlatten())
+        elif isinstance(module, nn.Dropout):
+            continue
+        else:
+            raise NotImplementedError(
+                "no integer kernel for %s" % type(module).__name__
+            )
+    return layers, qparam
+
+
+class IntegerModel(object):
+    """Runs frozen quantized layers with integer arithmetic only.
+
+    The float input is quantized once with ``qi`` and the final integer output
+    is dequantized once with ``qo``, every layer in between consumes and
+    produces integers.
+    """
+
+    def __init__(self, layers, qi, qo):
+        self.layers = layers
+        self.in_scale, self.in_zero_point = _per_tensor(qi, "qi")
+        self.in_range = quantized_range(qi)
+        self.out_scale, self.out_zero_point = _per_tensor(qo, "qo")
+
+    def quantize(self, x):
+        q = np.rint(x / self.in_scale) + self.in_zero_point
+        return np.clip(q, *self.in_range).astype(np.int64)
+
+    def dequantize(self, q):
+        return ((q - self.out_zero_point) * self.out_scale).astype(np.float32)
+
+    def __call__(self, x):
+        q = self.quantize(x)
+        for layer in self.layers:
+            q = layer(q)
+        return self.dequantize(q)
+
+    def weight_bytes(self):
+        return sum(
+            layer.weight.nbytes + (0 if layer.bias is None else layer.bias.nbytes)
+            for layer in self.layers
+            if isinstance(layer, (IntConv2d, IntLinear))
+        )
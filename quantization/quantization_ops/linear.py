@@ -14,16 +14,21 @@ class QLinear(QModule):
         quantization_scheme="symmetric",
         quantization_formula="google",
         per_layer_quantization=True,
+        activation_observer="minmax",
     ):
         super(QLinear, self).__init__(
             qi=qi,
             qo=qo,
             quantization_bit=quantization_bit,
-            quantization_scheme="symmetric",
-            quantization_formula="google",
-            per_layer_quantization=True,
+            quantization_scheme=quantization_scheme,
+            quantization_formula=quantization_formula,
+            per_layer_quantization=per_layer_quantization,
+            activation_observer=activation_observer,
         )
         self.quantization_bit = quantization_bit
+        self.quantization_scheme = quantization_scheme
+        self.quantization_formula = quantization_formula
+        self.per_layer_quantization = per_layer_quantization
         self.fc_module = fc_module
         self.fake_quantization = flow.nn.FakeQuantization(
             quantization_formula=quantization_formula,
@@ -32,9 +37,9 @@ class QLinear(QModule):
         )
         self.qw = QParam(
             quantization_bit=quantization_bit,
-            quantization_scheme="symmetric",
-            quantization_formula="google",
-            per_layer_quantization=True,
+            quantization_scheme=quantization_scheme,
+            quantization_formula=quantization_formula,
+            per_layer_quantization=per_layer_quantization,
         )
         self.quantization = flow.nn.Quantization(
             quantization_bit=32,
@@ -61,11 +66,9 @@ class QLinear(QModule):
         self.M = self.qw.scale.numpy() * self.qi.scale.numpy() / self.qo.scale.numpy()
 
         self.fc_module.weight = flow.nn.Parameter(
-            self.qw.quantize_tensor(self.conv_module.weight) - self.qw.zero_point
-        )
-        self.fc_module.bias = flow.nn.Parameter(
-            self.qw.quantize_tensor(self.conv_module.weight) - self.qw.zero_point
+            self.quantize_weight(self.fc_module.weight)
         )
+        self.fc_module.bias = flow.nn.Parameter(self.quantize_bias(self.fc_module.bias))
 
     def forward(self, x):
         if hasattr(self, "qi"):
@@ -0,0 +1,202 @@
+import numpy as np
+import oneflow as flow
+
+__all__ = [
+    "MinMaxObserver",
+    "MovingAverageMinMaxObserver",
+    "HistogramObserver",
+    "build_observer",
+]
+
+
+def _qparams_from_range(min_val, max_val, quantization_bit, quantization_scheme):
+    """Same formulas as the google formula of flow.nn.MinMaxObserver."""
+    min_val = np.minimum(min_val, 0.0)
+    max_val = np.maximum(max_val, 0.0)
+    if quantization_scheme == "symmetric":
+        scale = np.maximum(np.abs(min_val), np.abs(max_val)) / (
+            2 ** (quantization_bit - 1) - 1
+        )
+        scale = np.maximum(scale, np.finfo(np.float32).eps)
+        zero_point = np.zeros_like(scale)
+    else:
+        scale = (max_val - min_val) / (2 ** quantization_bit - 1)
+        scale = np.maximum(scale, np.finfo(np.float32).eps)
+        zero_point = -np.round(min_val / scale)
+    return scale, zero_point
+
+
+class MinMaxObserver(object):
+    """Ranges of the current tensor only, computed on device."""
+
+    def __init__(
+        self,
+        quantization_bit=8,
+        quantization_scheme="symmetric",
+        quantization_formula="google",
+        per_layer_quantization=True,
+    ):
+        self.observer = flow.nn.MinMaxObserver(
+            quantization_formula=quantization_formula,
+            quantization_bit=quantization_bit,
+            quantization_scheme=quantization_scheme,
+            per_layer_quantization=per_layer_quantization,
+        )
+
+    def __call__(self, tensor):
+        return self.observer(tensor)
+
+
+class _StatefulObserver(object):
+    """Base of the observers accumulating statistics over several batches.
+
+    Statistics are kept on the host, ``per_layer_quantization=False`` gives one
+    range per slice along axis 0 (output channels of conv/linear weights).
+    """
+
+    def __init__(
+        self,
+        quantization_bit=8,
+        quantization_scheme="symmetric",
+        quantization_formula="google",
+        per_layer_quantization=True,
+    ):
+        if quantization_formula != "google":
+            raise NotImplementedError(
+                "%s only supports the google formula" % type(self).__name__
+            )
+        self.quantization_bit = quantization_bit
+        self.quantization_scheme = quantization_scheme
+        self.per_layer_quantization = per_layer_quantization
+
+    def _values(self, tensor):
+        values = tensor.numpy().astype(np.float64)
+        if self.per_layer_quantization:
+            return values.reshape(1, -1)
+        return values.reshape(values.shape[0], -1)
+
+    def observe(self, values):
+        raise NotImplementedError
+
+    def calculate_range(self):
+        raise NotImplementedError
+
+    def __call__(self, tensor):
+        self.observe(self._values(tensor))
+        scale, zero_point = _qparams_from_range(
+            *self.calculate_range(), self.quantization_bit, self.quantization_scheme
+        )
+        return (
+            flow.Tensor(scale.astype(np.float32), device=tensor.device),
+            flow.Tensor(zero_point.astype(np.float32), device=tensor.device),
+        )
+
+
+class MovingAverageMinMaxObserver(_StatefulObserver):
+    """Exponential moving average of the per-batch min and max."""
+
+    def __init__(self, momentum=0.95, **kwargs):
+        super(MovingAverageMinMaxObserver, self).__init__(**kwargs)
+        self.momentum = momentum
+        self.min_val = None
+        self.max_val = None
+
+    def observe(self, values):
+        min_val = values.min(axis=1)
+        max_val = values.max(axis=1)
+        if self.min_val is None:
+            self.min_val, self.max_val = min_val, max_val
+        else:
+            self.min_val = self.momentum * self.min_val + (1 - self.momentum) * min_val
+            self.max_val = self.momentum * self.max_val + (1 - self.momentum) * max_val
+
+    def calculate_range(self):
+        return self.min_val, self.max_val
+
+
+class HistogramObserver(_StatefulObserver):
+    """Accumulates a histogram and picks the clipping range with the lowest
+    expected quantization error (rounding noise inside, clipping outside)."""
+
+    def __init__(self, bins=2048, **kwargs):
+        super(HistogramObserver, self).__init__(**kwargs)
+        if not self.per_layer_quantization:
+            raise ValueError("HistogramObserver only supports per layer quantization")
+        self.bins = bins
+        self.histogram = None
+        self.min_val = None
+        self.max_val = None
+
+    def observe(self, values):
+        values = values.reshape(-1)
+        min_val, max_val = values.min(), values.max()
+        if self.histogram is None:
+            self.min_val, self.max_val = min_val, max_val
+            self.histogram = np.zeros(self.bins)
+        elif min_val < self.min_val or max_val > self.max_val:
+            # spread the old counts over the widened range
+            old_centers = self._centers()
+            self.min_val = min(self.min_val, min_val)
+            self.max_val = max(self.max_val, max_val)
+            self.histogram, _ = np.histogram(
+                old_centers,
+                bins=self.bins,
+                range=(self.min_val, self.max_val),
+                weights=self.histogram,
+            )
+        histogram, _ = np.histogram(
+            values, bins=self.bins, range=(self.min_val, self.max_val)
+        )
+        self.histogram = self.histogram + histogram
+
+    def _centers(self):
+        edges = np.linspace(self.min_val, self.max_val, self.bins + 1)
+        return (edges[:-1] + edges[1:]) / 2
+
+    def calculate_range(self):
+        centers = self._centers()
+        cdf = np.cumsum(self.histogram) / max(self.histogram.sum(), 1)
+        # candidate ranges drop a growing fraction of the mass at both tails
+        tails = np.concatenate([[0.0], np.logspace(-6, -1, 26)])
+        lo = centers[np.searchsorted(cdf, tails, side="right").clip(0, self.bins - 1)]
+        hi = centers[
+            np.searchsorted(cdf, 1 - tails, side="left").clip(0, self.bins - 1)
+        ]
+        lo = np.minimum(lo, 0.0)
+        hi = np.maximum(hi, 0.0)
+        lo[0], hi[0] = min(self.min_val, 0.0), max(self.max_val, 0.0)
+        if self.quantization_scheme == "symmetric":
+            hi = np.maximum(np.abs(lo), hi)
+            lo = -hi
+            levels = 2 ** self.quantization_bit - 1
+        else:
+            levels = 2 ** self.quantization_bit
+        step = (hi - lo) / (levels - 1)
+        clipped = np.clip(centers[None, :], lo[:, None], hi[:, None])
+        error = (centers[None, :] - clipped) ** 2 + step[:, None] ** 2 / 12
+        best = np.argmin((error * self.histogram[None, :]).sum(axis=1))
+        return np.array([lo[best]]), np.array([hi[best]])
+
+
+def build_observer(
+    observer="minmax",
+    quantization_bit=8,
+    quantization_scheme="symmetric",
+    quantization_formula="google",
+    per_layer_quantization=True,
+):
+    observers = {
+        "minmax": MinMaxObserver,
+        "moving_average": MovingAverageMinMaxObserver,
+        "histogram": HistogramObserver,
+    }
+    if observer not in observers:
+        raise ValueError(
+            "observer should be one of %s, got %s" % (list(observers), observer)
+        )
+    return observers[observer](
+        quantization_bit=quantization_bit,
+        quantization_scheme=quantization_scheme,
+        quantization_formula=quantization_formula,
+        per_layer_quantization=per_layer_quantization,
+    )
@@ -1,5 +1,6 @@
 import oneflow as flow
 import oneflow.nn as nn
+from quantization_ops.observer import build_observer
 
 __all__ = ["QParam", "QModule"]
 
@@ -11,6 +12,7 @@ class QParam:
         quantization_scheme="symmetric",
         quantization_formula="google",
         per_layer_quantization=True,
+        observer="minmax",
     ):
         self.quantization_bit = quantization_bit
         self.quantization_scheme = quantization_scheme
@@ -18,7 +20,8 @@ class QParam:
         self.per_layer_quantization = per_layer_quantization
         self.scale = None
         self.zero_point = None
-        self.min_max_observer = flow.nn.MinMaxObserver(
+        self.observer = build_observer(
+            observer,
             quantization_formula=quantization_formula,
             quantization_bit=quantization_bit,
             quantization_scheme=quantization_scheme,
@@ -36,7 +39,7 @@ class QParam:
         )
 
     def update(self, tensor):
-        self.scale, self.zero_point = self.min_max_observer(tensor)
+        self.scale, self.zero_point = self.observer(tensor)
 
     def quantize_tensor(self, tensor):
         return self.quantization(tensor, self.scale, self.zero_point)
@@ -45,6 +48,8 @@ class QParam:
         return self.fake_quantization(tensor, self.scale, self.zero_point)
 
     def __str__(self):
+        if self.scale.numpy().size > 1:
+            return "scale: %s zp: %s " % (self.scale.numpy(), self.zero_point.numpy())
         info = "scale: %.10f " % self.scale.numpy()
         info += "zp: %d " % self.zero_point.numpy()
         return info
@@ -59,22 +64,37 @@ class QModule(nn.Module):
         quantization_scheme="symmetric",
         quantization_formula="google",
         per_layer_quantization=True,
+        activation_observer="minmax",
     ):
         super(QModule, self).__init__()
+        # per_layer_quantization only applies to weights, activations always
+        # use one scale per tensor (axis 0 of an activation is the batch)
         if qi:
             self.qi = QParam(
                 quantization_bit=quantization_bit,
                 quantization_scheme=quantization_scheme,
                 quantization_formula=quantization_formula,
-                per_layer_quantization=per_layer_quantization,
+                per_layer_quantization=True,
+                observer=activation_observer,
             )
         if qo:
             self.qo = QParam(
                 quantization_bit=quantization_bit,
                 quantization_scheme=quantization_scheme,
                 quantization_formula=quantization_formula,
-                per_layer_quantization=per_layer_quantization,
+                per_layer_quantization=True,
+                observer=activation_observer,
             )
 
     def freeze(self):
         pass
+
+    def quantize_bias(self, bias):
+        scale = self.qi.scale * self.qw.scale
+        return self.quantization(bias, scale, flow.zeros_like(scale))
+
+    def quantize_weight(self, weight):
+        zero_point = self.qw.zero_point
+        if zero_point.shape[0] > 1:
+            zero_point = zero_point.reshape([-1] + [1] * (weight.dim() - 1))
+        return self.qw.quantize_tensor(weight) - zero_point
@@ -0,0 +1,72 @@
+# -*- coding:utf-8 -*-
+import argparse
+import time
+
+from data_loader import (
+    Market1501,
+    RandomIdentitySampler,
+    ImageDataset,
+    PrefetchBatchLoader,
+)
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        "flags for compare training image throughput against worker count"
+    )
+    parser.add_argument(
+        "--data_dir", type=str, default="./datasets", help="dataset directory"
+    )
+    parser.add_argument("--batch_size", type=int, default=64)
+    parser.add_argument("--num_instances", type=int, default=4)
+    parser.add_argument("--image_height", type=int, default=256)
+    parser.add_argument("--image_width", type=int, default=128)
+    parser.add_argument("--num_batches", type=int, default=20)
+    parser.add_argument("--prefetch", type=int, default=4)
+    parser.add_argument(
+        "--workers", type=str, default="0,1,2,4,8", help="worker counts to compare"
+    )
+    return parser.parse_args()
+
+
+def main(args):
+    dataset = Market1501(root=args.data_dir, show_summery=False)
+    _, train_id, _ = map(list, zip(*dataset.train))
+    train_dataset = ImageDataset(
+        dataset.train, flag="train", process_size=(args.image_height, args.image_width)
+    )
+    indicies = [
+        x for x in RandomIdentitySampler(train_id, args.batch_size, args.num_instances)
+    ]
+    # +1 batch, the first one only warms the pool up
+    indicies = indicies[: (args.num_batches + 1) * args.batch_size]
+
+    print("workers | images/s")
+    baseline = None
+    for num_workers in map(int, args.workers.split(",")):
+        loader = PrefetchBatchLoader(
+            train_dataset,
+            args.batch_size,
+            num_workers=num_workers,
+            prefetch=args.prefetch,
+        )
+        batches = loader(indicies)
+        next(batches)
+        start_t = time.time()
+        num_images = 0
+        for imgs, pids, camids in batches:
+            num_images += len(imgs)
+        throughput = num_images / (time.time() - start_t)
+        loader.close()
+        if baseline is None:
+            baseline = throughput
+        print(
+            "{:7d} | {:8.1f} ({:.1f}x)".format(
+                num_workers, throughput, throughput / baseline
+            )
+        )
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    main(args)
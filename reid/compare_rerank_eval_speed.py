@@ -0,0 +1,246 @@
+# -*- coding:utf-8 -*-
+import argparse
+import time
+
+import numpy as np
+
+from utils.distance import compute_distance_matrix
+from utils.rank import evaluate_rank, re_ranking
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        "flags for compare loop and vectorized re-ranking and cmc/mAP evaluation"
+    )
+    parser.add_argument("--num_query", type=int, default=500)
+    parser.add_argument("--num_gallery", type=int, default=2500)
+    parser.add_argument("--num_ids", type=int, default=200)
+    parser.add_argument("--num_cams", type=int, default=6)
+    parser.add_argument("--feat_dim", type=int, default=2048)
+    parser.add_argument(
+        "--noise", type=float, default=0.07, help="feature noise around identity"
+    )
+    parser.add_argument("--memory_limit_mb", type=int, default=1024)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+# the original per-query implementations, kept as reference
+
+
+def _eval_loop(distmat, q_pids, g_pids, q_camids, g_camids, max_rank=50):
+    """Evaluation with market1501 metric
+    Key: for each query identity, its gallery images from the same camera view are discarded.
+    """
+    num_q, num_g = distmat.shape
+
+    if num_g < max_rank:
+        max_rank = num_g
+        print("Note: number of gallery samples is quite small, got {}".format(num_g))
+
+    indices = np.argsort(distmat, axis=1)
+    matches = (g_pids[indices] == q_pids[:, np.newaxis]).astype(np.int32)
+
+    # compute cmc curve for each query
+    all_cmc = []
+    all_AP = []
+    num_valid_q = 0.0  # number of valid query
+
+    for q_idx in range(num_q):
+        # get query pid and camid
+        q_pid = q_pids[q_idx]
+        q_camid = q_camids[q_idx]
+
+        # remove gallery samples that have the same pid and camid with query
+        order = indices[q_idx]
+        remove = (g_pids[order] == q_pid) & (g_camids[order] == q_camid)
+        keep = np.invert(remove)
+
+        # compute cmc curve
+        # binary vector, positions with value 1 are correct matches
+        raw_cmc = matches[q_idx][keep]
+        if not np.any(raw_cmc):
+            # this condition is true when query identity does not appear in gallery
+            continue
+
+        cmc = raw_cmc.cumsum()
+        cmc[cmc > 1] = 1
+
+        all_cmc.append(cmc[:max_rank])
+        num_valid_q += 1.0
+
+        # compute average precision
+        # reference: https://en.wikipedia.org/wiki/Evaluation_measures_(information_retrieval)#Average_precision
+        num_rel = raw_cmc.sum()
+        tmp_cmc = raw_cmc.cumsum()
+        tmp_cmc = [x / (i + 1.0) for i, x in enumerate(tmp_cmc)]
+        tmp_cmc = np.asarray(tmp_cmc) * raw_cmc
+        AP = tmp_cmc.sum() / num_rel
+        all_AP.append(AP)
+
+    assert num_valid_q > 0, "Error: all query identities do not appear in gallery"
+
+    all_cmc = np.asarray(all_cmc).astype(np.float32)
+    all_cmc = all_cmc.sum(0) / num_valid_q
+    mAP = np.mean(all_AP)
+
+    return all_cmc, mAP
+
+
+def re_ranking_loop(q_g_dist, q_q_dist, g_g_dist, k1=20, k2=6, lambda_value=0.3):
+    # The following naming, e.g. gallery_num, is different from outer scope.
+    # Don't care about it.
+
+    original_dist = np.concatenate(
+        [
+            np.concatenate([q_q_dist, q_g_dist], axis=1),
+            np.concatenate([q_g_dist.T, g_g_dist], axis=1),
+        ],
+        axis=0,
+    )
+    original_dist = np.power(original_dist, 2).astype(np.float32)
+    original_dist = np.transpose(1.0 * original_dist / np.max(original_dist, axis=0))
+    V = np.zeros_like(original_dist).astype(np.float32)
+    initial_rank = np.argsort(original_dist).astype(np.int32)
+
+    query_num = q_g_dist.shape[0]
+    gallery_num = q_g_dist.shape[0] + q_g_dist.shape[1]
+    all_num = gallery_num
+
+    for i in range(all_num):
+        # k-reciprocal neighbors
+        forward_k_neigh_index = initial_rank[i, : k1 + 1]
+        backward_k_neigh_index = initial_rank[forward_k_neigh_index, : k1 + 1]
+        fi = np.where(backward_k_neigh_index == i)[0]
+        k_reciprocal_index = forward_k_neigh_index[fi]
+        k_reciprocal_expansion_index = k_reciprocal_index
+        for j in range(len(k_reciprocal_index)):
+            candidate = k_reciprocal_index[j]
+            candidate_forward_k_neigh_index = initial_rank[
+                candidate, : int(np.around(k1 / 2.0)) + 1
+            ]
+            candidate_backward_k_neigh_index = initial_rank[
+                candidate_forward_k_neigh_index, : int(np.around(k1 / 2.0)) + 1
+            ]
+            fi_candidate = np.where(candidate_backward_k_neigh_index == candidate)[0]
+            candidate_k_reciprocal_index = candidate_forward_k_neigh_index[fi_candidate]
+            if len(
+                np.intersect1d(candidate_k_reciprocal_index, k_reciprocal_index)
+            ) > 2.0 / 3 * len(candidate_k_reciprocal_index):
+                k_reciprocal_expansion_index = np.append(
+                    k_reciprocal_expansion_index, candidate_k_reciprocal_index
+                )
+
+        k_reciprocal_expansion_index = np.unique(k_reciprocal_expansion_index)
+        weight = np.exp(-original_dist[i, k_reciprocal_expansion_index])
+        V[i, k_reciprocal_expansion_index] = 1.0 * weight / np.sum(weight)
+    original_dist = original_dist[
+        :query_num,
+    ]
+    if k2 != 1:
+        V_qe = np.zeros_like(V, dtype=np.float32)
+        for i in range(all_num):
+            V_qe[i, :] = np.mean(V[initial_rank[i, :k2], :], axis=0)
+        V = V_qe
+        del V_qe
+    del initial_rank
+    invIndex = []
+    for i in range(gallery_num):
+        invIndex.append(np.where(V[:, i] != 0)[0])
+
+    jaccard_dist = np.zeros_like(original_dist, dtype=np.float32)
+
+    # get jaccard_dist
+    for i in range(query_num):
+        temp_min = np.zeros(shape=[1, gallery_num], dtype=np.float32)
+        indNonZero = np.where(V[i, :] != 0)[0]  # q_i's k-reciprocal index
+        indImages = [invIndex[ind] for ind in indNonZero]  #
+        for j in range(len(indNonZero)):
+            temp_min[0, indImages[j]] = temp_min[0, indImages[j]] + np.minimum(
+                V[i, indNonZero[j]], V[indImages[j], indNonZero[j]]  # V_pigj, V_gigj
+            )
+        jaccard_dist[i] = 1 - temp_min / (2.0 - temp_min)
+
+    final_dist = jaccard_dist * (1 - lambda_value) + original_dist * lambda_value
+    del original_dist
+    del V
+    del jaccard_dist
+    final_dist = final_dist[:query_num, query_num:]
+    return final_dist
+
+
+def _fake_set(rng, num, centers, num_cams, noise):
+    pids = rng.randint(0, len(centers), size=num)
+    camids = rng.randint(0, num_cams, size=num)
+    features = centers[pids] + noise * rng.randn(num, centers.shape[1])
+    # l2 normalized like the usual re-id features, keeps float16 distances finite
+    features /= np.linalg.norm(features, axis=1, keepdims=True)
+    return features.astype(np.float32), pids, camids
+
+
+def _timed(func, *args, **kwargs):
+    start_t = time.time()
+    out = func(*args, **kwargs)
+    return out, time.time() - start_t
+
+
+def main(args):
+    # Fake features clustered by identity, only for speed test purpose
+    rng = np.random.RandomState(args.seed)
+    centers = rng.randn(args.num_ids, args.feat_dim) / np.sqrt(args.feat_dim)
+    qf, q_pids, q_camids = _fake_set(
+        rng, args.num_query, centers, args.num_cams, args.noise
+    )
+    gf, g_pids, g_camids = _fake_set(
+        rng, args.num_gallery, centers, args.num_cams, args.noise
+    )
+    distmat = compute_distance_matrix(qf, gf)
+    distmat_qq = compute_distance_matrix(qf, qf)
+    distmat_gg = compute_distance_matrix(gf, gf)
+
+    (cmc_ref, mAP_ref), eval_loop_time = _timed(
+        _eval_loop, distmat, q_pids, g_pids, q_camids, g_camids
+    )
+    (cmc, mAP), eval_time = _timed(
+        evaluate_rank,
+        distmat,
+        q_pids,
+        g_pids,
+        q_camids,
+        g_camids,
+        memory_limit_mb=args.memory_limit_mb,
+    )
+    assert np.array_equal(cmc, cmc_ref), "cmc mismatch"
+    assert np.isclose(mAP, mAP_ref, rtol=0, atol=1e-9), "mAP mismatch"
+    print(
+        "cmc/mAP: loop %.3fs, vectorized %.3fs, speedup %.1fx, mAP %.6f"
+        % (eval_loop_time, eval_time, eval_loop_time / eval_time, mAP)
+    )
+
+    rerank_ref, rerank_loop_time = _timed(
+        re_ranking_loop, distmat, distmat_qq, distmat_gg
+    )
+    rerank, rerank_time = _timed(
+        re_ranking,
+        distmat,
+        distmat_qq,
+        distmat_gg,
+        memory_limit_mb=args.memory_limit_mb,
+    )
+    max_diff = np.abs(rerank - rerank_ref).max()
+    assert np.allclose(rerank, rerank_ref, rtol=0, atol=1e-5), (
+        "re-ranking mismatch, max abs diff %g" % max_diff
+    )
+    assert np.array_equal(
+        evaluate_rank(rerank, q_pids, g_pids, q_camids, g_camids)[0],
+        evaluate_rank(rerank_ref, q_pids, g_pids, q_camids, g_camids)[0],
+    ), "re-ranked cmc mismatch"
+    print(
+        "re-ranking: loop %.3fs, chunked %.3fs, speedup %.1fx, max abs diff %g"
+        % (rerank_loop_time, rerank_time, rerank_loop_time / rerank_time, max_diff)
+    )
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    main(args)
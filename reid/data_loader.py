@@ -16,10 +16,15 @@ import zipfile
 from collections import defaultdict
 import copy
 import random
+import multiprocessing
+from collections import deque
 import numpy as np
 from PIL import Image, ImageOps
 import math
 
+RGB_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+RGB_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
 
 class Market1501(object):
     """
@@ -402,20 +407,130 @@ class ImageDataset:
         return imgs, pid, camid
 
     def __getbatch__(self, index):
+        imgs = np.empty((len(index), 3, self.height, self.width), dtype=np.float32)
+        pid, camid = self.load_batch(index, imgs)
+        return imgs, pid, camid
+
+    def load_batch(self, index, out):
+        """Decodes the images of ``index`` straight into ``out``, a float32
+        array of shape (len(index), channel, height, width).
+
+        Returns:
+            the person IDs and camera IDs of the images.
+        """
         img_paths, pid, camid = zip(*self.dataset[index])
-        pid = list(map(int, pid))
-        camid = list(map(int, camid))
-        imgs = []
-        if self.flag == "train":
-            for img_path in img_paths:
-                img = read_and_preprocess_image(img_path, self.width, self.height)
-                imgs.append(img)
-        else:
-            for img_path in img_paths:
-                img = read_test_image(img_path, self.width, self.height)
-                imgs.append(img)
-        imgs = np.asarray(imgs).astype(np.float32)
-        return imgs, np.array(pid), np.array(camid)
+        for i, img_path in enumerate(img_paths):
+            if self.flag == "train":
+                out[i] = read_and_preprocess_image(img_path, self.width, self.height)
+            else:
+                out[i] = read_test_image(img_path, self.width, self.height)
+        return np.array(list(map(int, pid))), np.array(list(map(int, camid)))
+
+
+_worker_state = {}
+
+
+def _init_worker(buffer, slot_shape, dataset):
+    _worker_state["images"] = np.frombuffer(buffer, dtype=np.float32).reshape(
+        (-1,) + slot_shape
+    )
+    _worker_state["dataset"] = dataset
+
+
+def _load_batch(slot, index, seed):
+    # forked workers start with the same random state, seed every batch so
+    # that augmentations differ between workers and runs are reproducible
+    random.seed(seed)
+    np.random.seed(seed)
+    images = _worker_state["images"][slot, : len(index)]
+    return _worker_state["dataset"].load_batch(index, images)
+
+
+class PrefetchBatchLoader(object):
+    """Produces the batches of an ``ImageDataset`` in a process pool.
+
+    Up to ``prefetch`` batches are decoded ahead of the one being consumed.
+    Workers write the images straight into a ring of preallocated shared
+    float32 slots, so a batch is handed over without pickling the pixels.
+
+    Args:
+        dataset (ImageDataset): images to load.
+        batch_size (int): batch size.
+        num_workers (int, optional): worker processes, 0 loads the batches in
+            the calling thread. Default is 4.
+        prefetch (int, optional): batches decoded ahead. Default is 4.
+    """
+
+    def __init__(self, dataset, batch_size, num_workers=4, prefetch=4):
+        self.dataset = dataset
+        self.batch_size = batch_size
+        self.num_workers = num_workers
+        self.num_slots = max(prefetch, 0) + 1
+        slot_shape = (batch_size, 3, dataset.height, dataset.width)
+        buffer = multiprocessing.RawArray(
+            "f", self.num_slots * int(np.prod(slot_shape))
+        )
+        self.images = np.frombuffer(buffer, dtype=np.float32).reshape(
+            (self.num_slots,) + slot_shape
+        )
+        self.pool = None
+        if num_workers > 0:
+            self.pool = multiprocessing.Pool(
+                num_workers,
+                initializer=_init_worker,
+                initargs=(buffer, slot_shape, dataset),
+            )
+
+    def __call__(self, indices, drop_last=True):
+        """Yields ``(imgs, pids, camids)`` over ``indices`` in order, e.g. the
+        indices drawn from ``RandomIdentitySampler``.
+
+        ``imgs`` is a contiguous float32 view on a shared slot, it is only
+        valid until the next batch is requested.
+        """
+        indices = np.asarray(indices)
+        stop = len(indices) - self.batch_size + 1 if drop_last else len(indices)
+        batches = iter(
+            [
+                indices[start : start + self.batch_size]
+                for start in range(0, max(stop, 0), self.batch_size)
+            ]
+        )
+        free_slots = deque(range(self.num_slots))
+        pending = deque()
+
+        def submit():
+            index = next(batches, None)
+            if index is None:
+                return False
+            slot = free_slots.popleft()
+            if self.pool is None:
+                pending.append((slot, index, None))
+            else:
+                seed = random.randrange(2 ** 31)
+                result = self.pool.apply_async(_load_batch, (slot, index, seed))
+                pending.append((slot, index, result))
+            return True
+
+        while free_slots and submit():
+            pass
+        while pending:
+            slot, index, result = pending.popleft()
+            images = self.images[slot, : len(index)]
+            if result is None:
+                pid, camid = self.dataset.load_batch(index, images)
+            else:
+                pid, camid = result.get()
+            yield images, pid, camid
+            # the consumer is done with this slot, refill it
+            free_slots.append(slot)
+            submit()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
 
 
 def read_test_image(path, width, height):
@@ -428,8 +543,6 @@ def read_test_image(path, width, height):
         PIL image
     """
     got_img = False
-    rgb_mean = [0.485, 0.456, 0.406]
-    rgb_std = [0.229, 0.224, 0.225]
     if not osp.exists(path):
         raise IOError('"{}" does not exist'.format(path))
     while not got_img:
@@ -437,7 +550,7 @@ def read_test_image(path, width, height):
             img = Image.open(path).convert("RGB")
             img = resize(img, (height, width))
             img = np.array(img).astype(np.float32) / 255.0
-            img = (img - rgb_mean) / rgb_std
+            img = (img - RGB_MEAN) / RGB_STD
             got_img = True
         except IOError:
             print(
@@ -448,19 +561,21 @@ def read_test_image(path, width, height):
     return img.transpose(2, 0, 1).astype(np.float32)
 
 
-def read_and_preprocess_image(path, width, height):
+_random_erasing = RandomErasing()
+
+
+def read_and_preprocess_image(path, width, height, random_erasing=_random_erasing):
     """Reads image from path using ``PIL.Image``.
 
     Args:
         path (str): path to an image.
+        random_erasing (RandomErasing, optional): erasing applied to the image,
+            shared between calls. Default is a ``RandomErasing()``.
 
     Returns:
         PIL image
     """
-    RandErasing = RandomErasing()
     got_img = False
-    rgb_mean = [0.485, 0.456, 0.406]
-    rgb_std = [0.229, 0.224, 0.225]
     if not osp.exists(path):
         raise IOError('"{}" does not exist'.format(path))
     while not got_img:
@@ -471,9 +586,9 @@ def read_and_preprocess_image(path, width, height):
             img = RandomCrop(img, (height, width))
 
             img = np.array(img).astype(np.float32) / 255.0
-            img = (img - rgb_mean) / rgb_std
+            img = (img - RGB_MEAN) / RGB_STD
             img = img.transpose(2, 0, 1)
-            img = RandErasing(img)
+            img = random_erasing(img)
             got_img = True
         except IOError:
             print(
@@ -6,6 +6,18 @@ import oneflow as flow
 import numpy as np
 
 
+def _pairwise_mask(labels):
+    """(n, n) float mask, 1 where labels[i] == labels[j]."""
+    n = labels.size(0)
+    mask = labels.expand(n, n).eq(flow.transpose(labels.expand(n, n), dim0=1, dim1=0))
+    return mask.to(dtype=flow.float32)
+
+
+def _softplus(x):
+    # log(1 + exp(x)) without overflow for large x
+    return flow.relu(x) + flow.log(1 + flow.exp(-flow.abs(x)))
+
+
 class TripletLoss(flow.nn.Module):
     """Triplet loss with hard positive/negative mining.
 
@@ -14,13 +26,29 @@ class TripletLoss(flow.nn.Module):
 
     Imported from `<https://github.com/Cysu/open-reid/blob/master/reid/loss/triplet.py>`_.
 
+    All anchors are mined at once with masked max/min reductions over the
+    pairwise distance matrix, so the loss runs on whatever device the features
+    live on.
+
     Args:
         margin (float, optional): margin for triplet. Default is 0.3.
+        mining (str, optional): "batch_hard" keeps the hardest positive and negative
+            of every anchor, "batch_all" averages over all triplets violating the
+            margin. Default is "batch_hard".
+        soft_margin (bool, optional): replace the hinge by log(1 + exp(d_ap - d_an)),
+            ``margin`` is then unused. Default is False.
     """
 
-    def __init__(self, margin=0.3):
+    def __init__(self, margin=0.3, mining="batch_hard", soft_margin=False):
         super(TripletLoss, self).__init__()
+        if mining not in ("batch_hard", "batch_all"):
+            raise ValueError(
+                "Unknown mining: {}. "
+                'Please choose either "batch_hard" or "batch_all"'.format(mining)
+            )
         self.margin = margin
+        self.mining = mining
+        self.soft_margin = soft_margin
         self.ranking_loss = flow.nn.MarginRankingLoss(margin=margin)
 
     def forward(self, inputs, targets):
@@ -37,27 +65,41 @@ class TripletLoss(flow.nn.Module):
         temp1 = -2 * flow.matmul(inputs, flow.transpose(inputs, dim0=1, dim1=0))
         dist = flow.add(dist, temp1)
         dist = flow.sqrt(flow.clamp(dist, min=1e-12))
-        # For each anchor, find the hardest positive and negative
-        mask = targets.expand(n, n).eq(
-            flow.transpose(targets.expand(n, n), dim0=1, dim1=0)
-        )
-        dist_ap, dist_an = [], []
-        y1 = flow.zeros((1, n), dtype=flow.float32).to("cuda")
-        y2 = flow.Tensor(np.exp(100 * np.ones((1, n)))).to("cuda")
-
-        for i in range(n):
-            temp_dist = flow.slice(dist, [(i, i + 1, 1)])
-            temp_mask = flow.slice(mask, [(i, i + 1, 1)])
-            temp_mask_rev = flow.slice(1 - mask, [(i, i + 1, 1)])
-            dist_ap.append(temp_mask.where(temp_dist, y1).max().unsqueeze(0))
-            dist_an.append(temp_mask_rev.where(temp_dist, y2).min().unsqueeze(0))
-        dist_ap = flow.cat(dist_ap)
-        dist_an = flow.cat(dist_an)
 
+        pos_mask = _pairwise_mask(targets)
+        neg_mask = 1 - pos_mask
+        if self.mining == "batch_all":
+            return self._batch_all(dist, pos_mask, neg_mask)
+
+        # For each anchor, find the hardest positive and negative. Distances are
+        # non negative, so masking negatives to 0 leaves the hardest positive as
+        # the row max, and lifting positives above the largest distance leaves
+        # the hardest negative as the row min.
+        dist_ap = flow.max(dist * pos_mask, dim=1)
+        dist_an = flow.min(dist + pos_mask * (flow.max(dist).detach() + 1), dim=1)
+
+        if self.soft_margin:
+            return _softplus(dist_ap - dist_an).mean()
         # Compute ranking hinge loss
         y = flow.ones_like(dist_an)
         return self.ranking_loss(dist_an, dist_ap, y)
 
+    def _batch_all(self, dist, pos_mask, neg_mask):
+        n = dist.size(0)
+        index = flow.arange(n).to(dist.device)
+        # anchor-positive pairs exclude the anchor itself
+        pos_mask = pos_mask * (1 - _pairwise_mask(index))
+        # loss[a, p, k] of the triplet (anchor a, positive p, negative k)
+        loss = dist.unsqueeze(2) - dist.unsqueeze(1)
+        valid = pos_mask.unsqueeze(2) * neg_mask.unsqueeze(1)
+        if self.soft_margin:
+            loss = _softplus(loss) * valid
+            return loss.sum() / flow.clamp(valid.sum(), min=1)
+        loss = flow.relu(loss + self.margin) * valid
+        # average over the triplets that still violate the margin
+        num_active = flow.gt(loss, 1e-16).to(dtype=flow.float32).sum()
+        return loss.sum() / flow.clamp(num_active, min=1)
+
 
 class CrossEntropyLossLS(flow.nn.Module):
     r"""Cross entropy loss with label smoothing regularizer.
@@ -100,7 +142,7 @@ class CrossEntropyLossLS(flow.nn.Module):
         targets = flow.tensor(
             np.eye(self.num_classes)[targets.numpy()], dtype=flow.float32
         )
-        targets = targets.to("cuda")
+        targets = targets.to(inputs.device)
         targets = (1 - self.epsilon) * targets + self.epsilon / self.num_classes
         loss = (-targets * log_probs).mean(0).sum()
         return loss
@@ -2,14 +2,22 @@
 
 import sys
 import argparse
-from data_loader import Market1501, RandomIdentitySampler, ImageDataset
+from data_loader import (
+    Market1501,
+    RandomIdentitySampler,
+    ImageDataset,
+    PrefetchBatchLoader,
+)
 import oneflow as flow
 from bisect import bisect_right
+import hashlib
 import os
 import os.path as osp
 import numpy as np
 from utils.loggers import Logger
 from utils.distance import compute_distance_matrix
+from utils.rank import evaluate_rank, re_ranking
+from utils.gallery_index import GalleryIndex
 from loss import TripletLoss, CrossEntropyLossLS
 from model import ResReid
 from lr_scheduler import WarmupMultiStepLR
@@ -28,6 +36,19 @@ def _parse_args():
     parser.add_argument("--step-size", type=list, default=[40, 70], required=False)
     parser.add_argument("--weight_t", type=float, default=0.5, required=False)
     parser.add_argument("--margin", type=float, default=0.3, required=False)
+    parser.add_argument(
+        "--triplet_mining",
+        type=str,
+        choices=["batch_hard", "batch_all"],
+        default="batch_hard",
+        help="triplet mining strategy",
+    )
+    parser.add_argument(
+        "--soft_margin",
+        action="store_true",
+        default=False,
+        help="soft-margin triplet loss instead of the hinge",
+    )
     parser.add_argument("--weight_decay", type=float, default=5e-4, required=False)
     parser.add_argument("--adam_beta1", type=float, default=0.9, required=False)
     parser.add_argument("--adam_beta2", type=float, default=0.999, required=False)
@@ -65,6 +86,18 @@ def _parse_args():
         help="euclidean or cosine",
     )
     parser.add_argument("--rerank", type=bool, default=False)
+    parser.add_argument(
+        "--gallery_index",
+        type=str,
+        default="",
+        help="directory of a persistent gallery index, reused by --evaluate runs",
+    )
+    parser.add_argument(
+        "--eval_memory_mb",
+        type=int,
+        default=1024,
+        help="rough memory cap of the re-ranking and cmc/mAP temporaries",
+    )
     parser.add_argument(
         "--load_weights",
         type=str,
@@ -86,6 +119,15 @@ def _parse_args():
         help="log info save directory",
     )
     parser.add_argument("--num_instances", type=int, default=4)
+    parser.add_argument(
+        "--num_workers",
+        type=int,
+        default=4,
+        help="processes decoding training images, 0 decodes in the training loop",
+    )
+    parser.add_argument(
+        "--prefetch", type=int, default=4, help="training batches decoded ahead"
+    )
     parser.add_argument(
         "opts",
         default=None,
@@ -154,7 +196,9 @@ def train(model, dataset, num_classes, optimizer, scheduler):
     print("=> Start training")
 
     # loss
-    criterion_t = TripletLoss(margin=args.margin).to("cuda")
+    criterion_t = TripletLoss(
+        margin=args.margin, mining=args.triplet_mining, soft_margin=args.soft_margin
+    ).to("cuda")
     criterion_x = CrossEntropyLossLS(num_classes=num_classes, epsilon=args.epsilon).to(
         "cuda"
     )
@@ -165,6 +209,9 @@ def train(model, dataset, num_classes, optimizer, scheduler):
     train_dataset = ImageDataset(
         dataset.train, flag="train", process_size=(args.image_height, args.image_width)
     )
+    train_loader = PrefetchBatchLoader(
+        train_dataset, batch_size, num_workers=args.num_workers, prefetch=args.prefetch
+    )
     # *****training*******#
     for epoch in range(0, args.max_epoch):
         # shift to train
@@ -172,16 +219,10 @@ def train(model, dataset, num_classes, optimizer, scheduler):
         indicies = [
             x for x in RandomIdentitySampler(train_id, batch_size, args.num_instances)
         ]
-        for i in range(len(indicies) // batch_size):
-            try:
-                # train_batch[0,1,2] are [imgs, pid, cam_id]
-                imgs, pids, _ = train_dataset.__getbatch__(
-                    indicies[i * batch_size : (i + 1) * batch_size]
-                )
-            except:
-                imgs, pids, _ = train_dataset.__getbatch__(indicies[-batch_size:])
-            imgs = flow.Tensor(np.array(imgs)).to("cuda")
-            pids = flow.Tensor(np.array(pids), dtype=flow.int32).to("cuda")
+        # train_batch[0,1,2] are [imgs, pid, cam_id]
+        for imgs, pids, _ in train_loader(indicies):
+            imgs = flow.Tensor(imgs).to("cuda")
+            pids = flow.Tensor(pids, dtype=flow.int32).to("cuda")
             outputs, features = model(imgs)
             loss_t = compute_loss(criterion_t, features, pids)
             loss_x = compute_loss(criterion_x, outputs, pids)
@@ -214,6 +255,7 @@ def train(model, dataset, num_classes, optimizer, scheduler):
                 is_best = False
             if is_best:
                 flow.save(model.state_dict(), args.flow_weight + "_" + str(epoch))
+    train_loader.close()
     print("=> End training")
 
     print("=> Final test")
@@ -246,6 +288,46 @@ def DeepSupervision(criterion, xs, y):
     return loss
 
 
+def extract_features(model, image_dataset, batch_size):
+    """Features, person IDs and camera IDs of every image of the dataset."""
+    loader = PrefetchBatchLoader(
+        image_dataset, batch_size, num_workers=args.num_workers, prefetch=args.prefetch
+    )
+    features, pids, camids = [], [], []
+    for imgs, batch_pids, batch_camids in loader(
+        np.arange(len(image_dataset)), drop_last=False
+    ):
+        imgs = flow.Tensor(imgs).to("cuda")
+        with flow.no_grad():
+            batch_features = model(imgs)
+        features.append(batch_features.numpy())
+        pids.append(batch_pids)
+        camids.append(batch_camids)
+    loader.close()
+    return np.concatenate(features, 0), np.concatenate(pids), np.concatenate(camids)
+
+
+def _weights_source(weights_path):
+    """Path and sha1 of the content of a weights file or directory, what the
+    features of a gallery index were extracted with."""
+    if not weights_path:
+        return None
+    sha1 = hashlib.sha1()
+    if osp.isdir(weights_path):
+        files = []
+        for root, _, names in os.walk(weights_path):
+            files += [osp.join(root, name) for name in names]
+        files.sort()
+    else:
+        files = [weights_path]
+    for path in files:
+        sha1.update(osp.relpath(path, weights_path).encode())
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                sha1.update(chunk)
+    return {"weights": osp.abspath(weights_path), "sha1": sha1.hexdigest()}
+
+
 def evaluate(model, dataset):
     query_dataset = ImageDataset(
         dataset.query, flag="test", process_size=(args.image_height, args.image_width)
@@ -261,46 +343,30 @@ def evaluate(model, dataset):
     save_dir = args.log_dir
     print("Extracting features from query set ...")
     # query features, query person IDs and query camera IDs
-    qf, q_pids, q_camids = [], [], []
-    q_ind = list(range(len(query_dataset)))
-    for i in range((len(query_dataset) // eval_batch)):
-        imgs, pids, camids = query_dataset.__getbatch__(
-            q_ind[i * eval_batch : (i + 1) * eval_batch]
-        )
-
-        imgs = flow.Tensor(np.array(imgs)).to("cuda")
-        with flow.no_grad():
-            features = model(imgs)
-
-        qf.append(features.numpy())
-        q_pids.extend(pids)
-        q_camids.extend(camids)
-
-    qf = np.concatenate(qf, 0)
-    q_pids = np.asarray(q_pids)
-    q_camids = np.asarray(q_camids)
+    qf, q_pids, q_camids = extract_features(model, query_dataset, eval_batch)
     print("Done, obtained {}-by-{} matrix".format(qf.shape[0], qf.shape[1]))
 
-    print("Extracting features from gallery set ...")
     # gallery features, gallery person IDs and gallery camera IDs
-    gf, g_pids, g_camids = [], [], []
-    g_ind = list(range(len(gallery_dataset)))
-    for i in range((len(gallery_dataset) // eval_batch)):
-        imgs, pids, camids = gallery_dataset.__getbatch__(
-            g_ind[i * eval_batch : (i + 1) * eval_batch]
+    gallery_index = None
+    if args.gallery_index and args.evaluate:
+        # the features only stay valid for a fixed model, never cache them
+        # while training; an index of other weights or preprocessing is
+        # emptied and extracted again
+        source = _weights_source(args.load_weights) or {}
+        source["image_size"] = [args.image_height, args.image_width]
+        gallery_index = GalleryIndex(
+            args.gallery_index, feat_dim=qf.shape[1], metric=dist_metric, source=source,
         )
-
-        imgs = flow.Tensor(np.array(imgs)).to("cuda")
-
-        with flow.no_grad():
-            features = model(imgs)
-        gf.append(features.numpy())
-        g_pids.extend(pids)
-        g_camids.extend(camids)
-
-    gf = np.concatenate(gf, 0)
-    g_pids = np.asarray(g_pids)
-    g_camids = np.asarray(g_camids)
+    if gallery_index is not None and len(gallery_index) > 0:
+        print("Loading gallery features from {} ...".format(args.gallery_index))
+        gf = np.asarray(gallery_index.features)
+        g_pids = np.asarray(gallery_index.pids)
+        g_camids = np.asarray(gallery_index.camids)
+    else:
+        print("Extracting features from gallery set ...")
+        gf, g_pids, g_camids = extract_features(model, gallery_dataset, eval_batch)
+        if gallery_index is not None:
+            gallery_index.add(gf, g_pids, g_camids)
     print("Done, obtained {}-by-{} matrix".format(gf.shape[0], gf.shape[1]))
 
     print("Computing distance matrix with metric={} ...".format(dist_metric))
@@ -310,10 +376,19 @@ def evaluate(model, dataset):
         print("Applying person re-ranking ...")
         distmat_qq = compute_distance_matrix(qf, qf, dist_metric)
         distmat_gg = compute_distance_matrix(gf, gf, dist_metric)
-        distmat = re_ranking(distmat, distmat_qq, distmat_gg)
+        distmat = re_ranking(
+            distmat, distmat_qq, distmat_gg, memory_limit_mb=args.eval_memory_mb
+        )
 
     print("Computing CMC and mAP ...")
-    cmc, mAP = _eval(distmat, q_pids, g_pids, q_camids, g_camids)
+    cmc, mAP = evaluate_rank(
+        distmat,
+        q_pids,
+        g_pids,
+        q_camids,
+        g_camids,
+        memory_limit_mb=args.eval_memory_mb,
+    )
 
     print("=".ljust(30, "=") + " Result " + "=".ljust(30, "="))
     print("mAP: {:.1%}".format(mAP))
@@ -325,147 +400,6 @@ def evaluate(model, dataset):
     return cmc[0], mAP
 
 
-def _eval(distmat, q_pids, g_pids, q_camids, g_camids, max_rank=50):
-    """Evaluation with market1501 metric
-    Key: for each query identity, its gallery images from the same camera view are discarded.
-    """
-    num_q, num_g = distmat.shape
-
-    if num_g < max_rank:
-        max_rank = num_g
-        print("Note: number of gallery samples is quite small, got {}".format(num_g))
-
-    indices = np.argsort(distmat, axis=1)
-    matches = (g_pids[indices] == q_pids[:, np.newaxis]).astype(np.int32)
-
-    # compute cmc curve for each query
-    all_cmc = []
-    all_AP = []
-    num_valid_q = 0.0  # number of valid query
-
-    for q_idx in range(num_q):
-        # get query pid and camid
-        q_pid = q_pids[q_idx]
-        q_camid = q_camids[q_idx]
-
-        # remove gallery samples that have the same pid and camid with query
-        order = indices[q_idx]
-        remove = (g_pids[order] == q_pid) & (g_camids[order] == q_camid)
-        keep = np.invert(remove)
-
-        # compute cmc curve
-        # binary vector, positions with value 1 are correct matches
-        raw_cmc = matches[q_idx][keep]
-        if not np.any(raw_cmc):
-            # this condition is true when query identity does not appear in gallery
-            continue
-
-        cmc = raw_cmc.cumsum()
-        cmc[cmc > 1] = 1
-
-        all_cmc.append(cmc[:max_rank])
-        num_valid_q += 1.0
-
-        # compute average precision
-        # reference: https://en.wikipedia.org/wiki/Evaluation_measures_(information_retrieval)#Average_precision
-        num_rel = raw_cmc.sum()
-        tmp_cmc = raw_cmc.cumsum()
-        tmp_cmc = [x / (i + 1.0) for i, x in enumerate(tmp_cmc)]
-        tmp_cmc = np.asarray(tmp_cmc) * raw_cmc
-        AP = tmp_cmc.sum() / num_rel
-        all_AP.append(AP)
-
-    assert num_valid_q > 0, "Error: all query identities do not appear in gallery"
-
-    all_cmc = np.asarray(all_cmc).astype(np.float32)
-    all_cmc = all_cmc.sum(0) / num_valid_q
-    mAP = np.mean(all_AP)
-
-    return all_cmc, mAP
-
-
-def re_ranking(q_g_dist, q_q_dist, g_g_dist, k1=20, k2=6, lambda_value=0.3):
-    # The following naming, e.g. gallery_num, is different from outer scope.
-    # Don't care about it.
-
-    original_dist = np.concatenate(
-        [
-            np.concatenate([q_q_dist, q_g_dist], axis=1),
-            np.concatenate([q_g_dist.T, g_g_dist], axis=1),
-        ],
-        axis=0,
-    )
-    original_dist = np.power(original_dist, 2).astype(np.float32)
-    original_dist = np.transpose(1.0 * original_dist / np.max(original_dist, axis=0))
-    V = np.zeros_like(original_dist).astype(np.float32)
-    initial_rank = np.argsort(original_dist).astype(np.int32)
-
-    query_num = q_g_dist.shape[0]
-    gallery_num = q_g_dist.shape[0] + q_g_dist.shape[1]
-    all_num = gallery_num
-
-    for i in range(all_num):
-        # k-reciprocal neighbors
-        forward_k_neigh_index = initial_rank[i, : k1 + 1]
-        backward_k_neigh_index = initial_rank[forward_k_neigh_index, : k1 + 1]
-        fi = np.where(backward_k_neigh_index == i)[0]
-        k_reciprocal_index = forward_k_neigh_index[fi]
-        k_reciprocal_expansion_index = k_reciprocal_index
-        for j in range(len(k_reciprocal_index)):
-            candidate = k_reciprocal_index[j]
-            candidate_forward_k_neigh_index = initial_rank[
-                candidate, : int(np.around(k1 / 2.0)) + 1
-            ]
-            candidate_backward_k_neigh_index = initial_rank[
-                candidate_forward_k_neigh_index, : int(np.around(k1 / 2.0)) + 1
-            ]
-            fi_candidate = np.where(candidate_backward_k_neigh_index == candidate)[0]
-            candidate_k_reciprocal_index = candidate_forward_k_neigh_index[fi_candidate]
-            if len(
-                np.intersect1d(candidate_k_reciprocal_index, k_reciprocal_index)
-            ) > 2.0 / 3 * len(candidate_k_reciprocal_index):
-                k_reciprocal_expansion_index = np.append(
-                    k_reciprocal_expansion_index, candidate_k_reciprocal_index
-                )
-
-        k_reciprocal_expansion_index = np.unique(k_reciprocal_expansion_index)
-        weight = np.exp(-original_dist[i, k_reciprocal_expansion_index])
-        V[i, k_reciprocal_expansion_index] = 1.0 * weight / np.sum(weight)
-    original_dist = original_dist[
-        :query_num,
-    ]
-    if k2 != 1:
-        V_qe = np.zeros_like(V, dtype=np.float32)
-        for i in range(all_num):
-            V_qe[i, :] = np.mean(V[initial_rank[i, :k2], :], axis=0)
-        V = V_qe
-        del V_qe
-    del initial_rank
-    invIndex = []
-    for i in range(gallery_num):
-        invIndex.append(np.where(V[:, i] != 0)[0])
-
-    jaccard_dist = np.zeros_like(original_dist, dtype=np.float32)
-
-    # get jaccard_dist
-    for i in range(query_num):
-        temp_min = np.zeros(shape=[1, gallery_num], dtype=np.float32)
-        indNonZero = np.where(V[i, :] != 0)[0]  # q_i's k-reciprocal index
-        indImages = [invIndex[ind] for ind in indNonZero]  #
-        for j in range(len(indNonZero)):
-            temp_min[0, indImages[j]] = temp_min[0, indImages[j]] + np.minimum(
-                V[i, indNonZero[j]], V[indImages[j], indNonZero[j]]  # V_pigj, V_gigj
-            )
-        jaccard_dist[i] = 1 - temp_min / (2.0 - temp_min)
-
-    final_dist = jaccard_dist * (1 - lambda_value) + original_dist * lambda_value
-    del original_dist
-    del V
-    del jaccard_dist
-    final_dist = final_dist[:query_num, query_num:]
-    return final_dist
-
-
 if __name__ == "__main__":
     args = _parse_args()
     main(args)
@@ -42,3 +42,40 @@ def cosine_distance(input1, input2):
     dist = cdist(input1, input2, metric="cosine").astype(np.float16)
     distmat = np.power(dist, 2).astype(np.float16)
     return distmat
+
+
+def distance_block(input1, input2, metric="euclidean"):
+    """Same distances as ``compute_distance_matrix`` for one block of
+    features, in float32 and with a single matrix product.
+
+    Args:
+        input1 (numpy.ndarray): 2-D feature matrix.
+        input2 (numpy.ndarray): 2-D feature matrix.
+        metric (str, optional): "euclidean" or "cosine".
+            Default is "euclidean".
+
+    Returns:
+        numpy.ndarray: float32 distance matrix.
+    """
+    input1 = np.asarray(input1, dtype=np.float32)
+    input2 = np.asarray(input2, dtype=np.float32)
+    assert input1.shape[1] == input2.shape[1]
+
+    if metric == "euclidean":
+        distmat = np.matmul(input1, input2.T)
+        distmat *= -2
+        distmat += np.square(input1).sum(axis=1, keepdims=True)
+        distmat += np.square(input2).sum(axis=1)
+        return np.maximum(distmat, 0, out=distmat)
+    elif metric == "cosine":
+        norm1 = np.linalg.norm(input1, axis=1, keepdims=True)
+        norm2 = np.linalg.norm(input2, axis=1, keepdims=True)
+        distmat = 1 - np.matmul(
+            input1 / np.maximum(norm1, 1e-12), (input2 / np.maximum(norm2, 1e-12)).T
+        )
+        return np.square(distmat, out=distmat)
+    else:
+        raise ValueError(
+            "Unknown distance metric: {}. "
+            'Please choose either "euclidean" or "cosine"'.format(metric)
+        )
@@ -0,0 +1,397 @@
+# -*- coding:utf-8 -*-
+import json
+import os
+
+import numpy as np
+
+from utils.distance import distance_block
+
+
+def _kmeans(data, num_clusters, num_iters=20, seed=0, chunk_size=65536):
+    """Plain Lloyd k-means, the assignment step runs in chunks."""
+    rng = np.random.RandomState(seed)
+    num_clusters = min(num_clusters, len(data))
+    centroids = data[rng.choice(len(data), num_clusters, replace=False)].copy()
+    for _ in range(num_iters):
+        assign = _assign(data, centroids, chunk_size)
+        sums = np.zeros_like(centroids, dtype=np.float64)
+        np.add.at(sums, assign, data)
+        counts = np.bincount(assign, minlength=num_clusters)
+        empty = counts == 0
+        # empty clusters restart from random points
+        sums[empty] = data[rng.choice(len(data), empty.sum())]
+        counts[empty] = 1
+        centroids = (sums / counts[:, np.newaxis]).astype(np.float32)
+    return centroids
+
+
+def _assign(data, centroids, chunk_size=65536):
+    assign = np.empty(len(data), dtype=np.int64)
+    for start in range(0, len(data), chunk_size):
+        block = distance_block(data[start : start + chunk_size], centroids)
+        assign[start : start + chunk_size] = np.argmin(block, axis=1)
+    return assign
+
+
+def _merge_topk(best_dist, best_idx, dist, idx, k):
+    """Keeps the k smallest of the running and the new candidates, unsorted."""
+    dist = np.concatenate([best_dist, dist], axis=1)
+    idx = np.concatenate([best_idx, idx], axis=1)
+    if dist.shape[1] > k:
+        part = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        dist = np.take_along_axis(dist, part, axis=1)
+        idx = np.take_along_axis(idx, part, axis=1)
+    return dist, idx
+
+
+def _sort_topk(dist, idx, k):
+    order = np.argsort(dist, axis=1, kind="stable")
+    dist = np.take_along_axis(dist, order, axis=1)
+    idx = np.take_along_axis(idx, order, axis=1)
+    if dist.shape[1] < k:
+        # fewer candidates than k, pad with empty results
+        pad = k - dist.shape[1]
+        dist = np.pad(dist, ((0, 0), (0, pad)), constant_values=np.inf)
+        idx = np.pad(idx, ((0, 0), (0, pad)), constant_values=-1)
+    return dist, idx
+
+
+class GalleryIndex(object):
+    """Persistent gallery of re-id features for query-by-image retrieval.
+
+    The features, person IDs and camera IDs are stored as raw files in
+    ``index_dir`` and memory-mapped, so the gallery can be much larger than
+    the memory and grows by appending new images. ``meta.json`` is written
+    after the data, an interrupted append is never visible.
+
+    ``search`` is exact by default and processes the gallery in chunks, the
+    memory it needs does not depend on the number of gallery images. After
+    ``train_ivf`` an inverted file (optionally with product quantization of
+    the residuals) answers approximate searches over ``nprobe`` lists.
+
+    Args:
+        index_dir (str): directory of the index, created if missing.
+        feat_dim (int, optional): feature dimension, needed for a new index.
+        metric (str, optional): "euclidean" or "cosine", same distances as
+            ``compute_distance_matrix``. "euclidean" for a new index by
+            default.
+        source (dict, optional): json description of what extracted the
+            features, e.g. the weights file and its hash. An existing index of
+            another source holds stale features and is emptied.
+
+    An existing index of another ``feat_dim`` or ``metric`` raises a
+    ValueError.
+    """
+
+    META_FILE = "meta.json"
+
+    def __init__(self, index_dir, feat_dim=None, metric=None, source=None):
+        self.index_dir = index_dir
+        os.makedirs(index_dir, exist_ok=True)
+        meta_file = os.path.join(index_dir, self.META_FILE)
+        if os.path.exists(meta_file):
+            with open(meta_file) as f:
+                self.meta = json.load(f)
+            if feat_dim is not None and feat_dim != self.meta["feat_dim"]:
+                raise ValueError(
+                    "index has feat_dim {}, got {}".format(
+                        self.meta["feat_dim"], feat_dim
+                    )
+                )
+            if metric is not None and metric != self.meta["metric"]:
+                raise ValueError(
+                    "index has metric {}, got {}".format(self.meta["metric"], metric)
+                )
+            if source is not None and source != self.meta.get("source"):
+                print(
+                    "WARNING: index {} was built from {}, not {}, emptying "
+                    "it".format(index_dir, self.meta.get("source"), source)
+                )
+                self.clear(source)
+        else:
+            if feat_dim is None:
+                raise ValueError("feat_dim is needed to create a new index")
+            if metric is None:
+                metric = "euclidean"
+            if metric not in ("euclidean", "cosine"):
+                raise ValueError(
+                    "Unknown distance metric: {}. "
+                    'Please choose either "euclidean" or "cosine"'.format(metric)
+                )
+            self.meta = {
+                "feat_dim": feat_dim,
+                "metric": metric,
+                "source": source,
+                "size": 0,
+                "ivf": None,
+            }
+            self._write_meta()
+        self._load()
+
+    @property
+    def feat_dim(self):
+        return self.meta["feat_dim"]
+
+    @property
+    def metric(self):
+        return self.meta["metric"]
+
+    @property
+    def source(self):
+        return self.meta.get("source")
+
+    def __len__(self):
+        return self.meta["size"]
+
+    def clear(self, source=None):
+        """Drops every image and the inverted file, the next ``add`` starts
+        the files over."""
+        self.meta.update(source=source, size=0, ivf=None)
+        self._write_meta()
+        self._load()
+
+    def _path(self, name):
+        return os.path.join(self.index_dir, name)
+
+    def _write_meta(self):
+        meta_file = self._path(self.META_FILE)
+        with open(meta_file + ".tmp", "w") as f:
+            json.dump(self.meta, f)
+        os.replace(meta_file + ".tmp", meta_file)
+
+    def _columns(self):
+        """name -> (dtype, row shape) of every per-image file."""
+        columns = {
+            "features.bin": (np.float32, (self.feat_dim,)),
+            "pids.bin": (np.int64, ()),
+            "camids.bin": (np.int64, ()),
+        }
+        ivf = self.meta["ivf"]
+        if ivf is not None:
+            columns["ivf_lists.bin"] = (np.int64, ())
+            if ivf["num_subquantizers"]:
+                columns["pq_codes.bin"] = (np.uint8, (ivf["num_subquantizers"],))
+        return columns
+
+    def _map(self, name):
+        dtype, row_shape = self._columns()[name]
+        shape = (len(self),) + row_shape
+        if len(self) == 0:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(self._path(name), dtype=dtype, mode="r", shape=shape)
+
+    def _load(self):
+        self.features = self._map("features.bin")
+        self.pids = self._map("pids.bin")
+        self.camids = self._map("camids.bin")
+        ivf = self.meta["ivf"]
+        if ivf is None:
+            return
+        self.centroids = np.load(self._path("ivf_centroids.npy"))
+        self.ivf_lists = self._map("ivf_lists.bin")
+        # gallery rows grouped by list
+        self.list_order = np.argsort(self.ivf_lists, kind="stable")
+        self.list_offsets = np.concatenate(
+            [[0], np.cumsum(np.bincount(self.ivf_lists, minlength=len(self.centroids)))]
+        )
+        if ivf["num_subquantizers"]:
+            self.codebooks = np.load(self._path("pq_codebooks.npy"))
+            self.pq_codes = self._map("pq_codes.bin")
+
+    def _append(self, name, values, start=None):
+        """Writes ``values`` as the rows from ``start`` on, the current size
+        by default."""
+        if start is None:
+            start = len(self)
+        dtype, row_shape = self._columns()[name]
+        values = np.ascontiguousarray(values, dtype=dtype)
+        row_bytes = int(np.prod(row_shape, dtype=np.int64)) * np.dtype(dtype).itemsize
+        path = self._path(name)
+        with open(path, "ab") as f:
+            # drop the rows of an append that did not reach meta.json
+            f.truncate(start * row_bytes)
+            f.write(values.tobytes())
+
+    def _prepare(self, features):
+        """Vectors the inverted file works on, unit length for cosine so that
+        squared euclidean distances order them like the cosine distance."""
+        features = np.asarray(features, dtype=np.float32)
+        if self.metric == "cosine":
+            norm = np.linalg.norm(features, axis=1, keepdims=True)
+            features = features / np.maximum(norm, 1e-12)
+        return features
+
+    def _from_ivf_distance(self, dist):
+        if self.metric == "cosine":
+            # |a - b|^2 = 2 (1 - cos) for unit vectors
+            return np.square(dist / 2)
+        return dist
+
+    def _encode(self, features):
+        """Inverted list and product quantization codes of new features."""
+        features = self._prepare(features)
+        lists = _assign(features, self.centroids)
+        codes = None
+        if self.meta["ivf"]["num_subquantizers"]:
+            residuals = features - self.centroids[lists]
+            codes = np.empty((len(features), len(self.codebooks)), dtype=np.uint8)
+            for j, sub in enumerate(np.split(residuals, len(self.codebooks), axis=1)):
+                codes[:, j] = _assign(sub, self.codebooks[j])
+        return lists, codes
+
+    def add(self, features, pids, camids):
+        """Appends gallery images, encoded right away if an inverted file is
+        trained.
+
+        Args:
+            features (numpy.ndarray): features with shape (n, feat_dim).
+            pids (numpy.ndarray): person IDs with shape (n,).
+            camids (numpy.ndarray): camera IDs with shape (n,).
+        """
+        features = np.asarray(features, dtype=np.float32)
+        if features.ndim != 2 or features.shape[1] != self.feat_dim:
+            raise ValueError(
+                "expected features of shape (n, {}), got {}".format(
+                    self.feat_dim, features.shape
+                )
+            )
+        if not (len(features) == len(pids) == len(camids)):
+            raise ValueError("features, pids and camids differ in length")
+        if len(features) == 0:
+            return
+        self._append("features.bin", features)
+        self._append("pids.bin", pids)
+        self._append("camids.bin", camids)
+        if self.meta["ivf"] is not None:
+            lists, codes = self._encode(features)
+            self._append("ivf_lists.bin", lists)
+            if codes is not None:
+                self._append("pq_codes.bin", codes)
+        self.meta["size"] += len(features)
+        self._write_meta()
+        self._load()
+
+    def train_ivf(self, num_lists=256, num_subquantizers=0, num_iters=20, seed=0):
+        """Trains the inverted file on the current gallery and encodes it.
+
+        Args:
+            num_lists (int, optional): coarse clusters. Default is 256.
+            num_subquantizers (int, optional): bytes per image of product
+                quantization codes for the residuals, 0 keeps exact distances
+                within the probed lists. Must divide feat_dim. Default is 0.
+            num_iters (int, optional): k-means iterations. Default is 20.
+            seed (int, optional): k-means seed. Default is 0.
+        """
+        if len(self) == 0:
+            raise ValueError("cannot train an inverted file on an empty index")
+        if num_subquantizers and self.feat_dim % num_subquantizers:
+            raise ValueError(
+                "num_subquantizers={} must divide feat_dim={}".format(
+                    num_subquantizers, self.feat_dim
+                )
+            )
+        features = self._prepare(self.features)
+        self.centroids = _kmeans(features, num_lists, num_iters, seed)
+        np.save(self._path("ivf_centroids.npy"), self.centroids)
+        self.meta["ivf"] = {"num_subquantizers": num_subquantizers}
+        if num_subquantizers:
+            residuals = features - self.centroids[_assign(features, self.centroids)]
+            self.codebooks = np.stack(
+                [
+                    _kmeans(sub, 256, num_iters, seed)
+                    for sub in np.split(residuals, num_subquantizers, axis=1)
+                ]
+            )
+            np.save(self._path("pq_codebooks.npy"), self.codebooks)
+        lists, codes = self._encode(self.features)
+        self._append("ivf_lists.bin", lists, start=0)
+        if codes is not None:
+            self._append("pq_codes.bin", codes, start=0)
+        self._write_meta()
+        self._load()
+
+    def search(self, queries, k=50, nprobe=None, memory_limit_mb=256):
+        """k nearest gallery images of every query.
+
+        Args:
+            queries (numpy.ndarray): query features with shape (q, feat_dim).
+            k (int, optional): neighbors per query. Default is 50.
+            nprobe (int, optional): inverted lists visited per query, None runs
+                the exact search. Default is None.
+            memory_limit_mb (int, optional): rough cap of the distance blocks.
+                Default is 256.
+
+        Returns:
+            (numpy.ndarray, numpy.ndarray): distances and gallery row indices,
+            both (q, k) sorted by distance. Missing neighbors have index -1.
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        if nprobe is None:
+            return self._search_exact(queries, k, memory_limit_mb)
+        if self.meta["ivf"] is None:
+            raise ValueError("nprobe needs an inverted file, call train_ivf first")
+        return self._search_ivf(queries, k, nprobe)
+
+    def _search_exact(self, queries, k, memory_limit_mb):
+        # about 16 bytes per distance: block, partition indices and merge
+        elements = max(int(memory_limit_mb * 1024 ** 2 // 16), 1)
+        query_chunk = min(len(queries), 1024) or 1
+        gallery_chunk = max(elements // query_chunk, k, 1)
+        all_dist, all_idx = [], []
+        for q_start in range(0, len(queries), query_chunk):
+            block_queries = queries[q_start : q_start + query_chunk]
+            best_dist = np.empty((len(block_queries), 0), dtype=np.float32)
+            best_idx = np.empty((len(block_queries), 0), dtype=np.int64)
+            for g_start in range(0, len(self), gallery_chunk):
+                gallery = self.features[g_start : g_start + gallery_chunk]
+                dist = distance_block(block_queries, gallery, self.metric)
+                idx = np.broadcast_to(
+                    np.arange(g_start, g_start + len(gallery)), dist.shape
+                )
+                best_dist, best_idx = _merge_topk(best_dist, best_idx, dist, idx, k)
+            best_dist, best_idx = _sort_topk(best_dist, best_idx, k)
+            all_dist.append(best_dist)
+            all_idx.append(best_idx)
+        return np.concatenate(all_dist), np.concatenate(all_idx)
+
+    def _search_ivf(self, queries, k, nprobe):
+        prepared = self._prepare(queries)
+        nprobe = min(nprobe, len(self.centroids))
+        coarse = distance_block(prepared, self.centroids)
+        probes = np.argpartition(coarse, nprobe - 1, axis=1)[:, :nprobe]
+        use_pq = self.meta["ivf"]["num_subquantizers"] > 0
+        all_dist = np.empty((len(queries), k), dtype=np.float32)
+        all_idx = np.empty((len(queries), k), dtype=np.int64)
+        for q, query in enumerate(prepared):
+            rows, dist = [], []
+            for l in probes[q]:
+                # rows of a list are in ascending order, memmap reads stay sequential
+                members = self.list_order[
+                    self.list_offsets[l] : self.list_offsets[l + 1]
+                ]
+                if use_pq:
+                    # asymmetric distance, summed lookups of the residual
+                    # distances to every sub-codebook
+                    residual = np.split(query - self.centroids[l], len(self.codebooks))
+                    table = np.stack(
+                        [
+                            np.square(codebook - sub).sum(axis=1)
+                            for codebook, sub in zip(self.codebooks, residual)
+                        ]
+                    )
+                    codes = self.pq_codes[members]
+                    d = table[np.arange(len(table)), codes].sum(axis=1)
+                else:
+                    gallery = self._prepare(self.features[members])
+                    d = distance_block(query[np.newaxis], gallery)[0]
+                rows.append(members)
+                dist.append(d)
+            rows = np.concatenate(rows)[np.newaxis]
+            dist = self._from_ivf_distance(np.concatenate(dist))[np.newaxis]
+            if rows.shape[1] > k:
+                part = np.argpartition(dist, k - 1, axis=1)[:, :k]
+                dist = np.take_along_axis(dist, part, axis=1)
+                rows = np.take_along_axis(rows, part, axis=1)
+            dist, rows = _sort_topk(dist, rows, k)
+            all_dist[q], all_idx[q] = dist[0], rows[0]
+        return all_dist, all_idx
@@ -0,0 +1,289 @@
+# -*- coding:utf-8 -*-
+import numpy as np
+from scipy import sparse
+
+
+def _rows_per_chunk(row_bytes, memory_limit_mb):
+    return max(1, int(memory_limit_mb * 1024 ** 2 // max(row_bytes, 1)))
+
+
+def evaluate_rank(
+    distmat, q_pids, g_pids, q_camids, g_camids, max_rank=50, memory_limit_mb=1024
+):
+    """Evaluation with market1501 metric
+    Key: for each query identity, its gallery images from the same camera view are discarded.
+
+    Queries are ranked in chunks so that the temporaries stay below
+    ``memory_limit_mb``, every chunk is evaluated without a per-query loop.
+
+    Args:
+        distmat (numpy.ndarray): query-gallery distance matrix.
+        q_pids, g_pids, q_camids, g_camids (numpy.ndarray): person and camera ids.
+        max_rank (int, optional): length of the returned cmc curve. Default is 50.
+        memory_limit_mb (int, optional): rough cap of the temporaries. Default is 1024.
+
+    Returns:
+        (numpy.ndarray, float): cmc curve and mAP.
+    """
+    num_q, num_g = distmat.shape
+
+    if num_g < max_rank:
+        max_rank = num_g
+        print("Note: number of gallery samples is quite small, got {}".format(num_g))
+
+    q_pids = np.asarray(q_pids)
+    g_pids = np.asarray(g_pids)
+    q_camids = np.asarray(q_camids)
+    g_camids = np.asarray(g_camids)
+
+    # argsort, gathered ids, masks and float64 cumsums per gallery entry
+    chunk = _rows_per_chunk(48 * num_g, memory_limit_mb)
+    cmc_counts = np.zeros(max_rank, dtype=np.int64)
+    all_AP = []
+    num_valid_q = 0
+
+    for start in range(0, num_q, chunk):
+        stop = min(start + chunk, num_q)
+        indices = np.argsort(distmat[start:stop], axis=1)
+        matches = g_pids[indices] == q_pids[start:stop, np.newaxis]
+        # remove gallery samples that have the same pid and camid with query
+        keep = ~(matches & (g_camids[indices] == q_camids[start:stop, np.newaxis]))
+        # binary matrix, positions with value True are correct matches
+        raw_cmc = matches & keep
+        num_rel = raw_cmc.sum(axis=1)
+        # queries whose identity does not appear in gallery are skipped
+        valid = num_rel > 0
+        if not np.any(valid):
+            continue
+        raw_cmc = raw_cmc[valid]
+        num_rel = num_rel[valid]
+        # rank of every entry once the removed samples are dropped
+        kept_rank = np.cumsum(keep[valid], axis=1) - 1
+
+        # the cmc curve of a query is 1 from its first correct match on
+        first = kept_rank[np.arange(len(raw_cmc)), np.argmax(raw_cmc, axis=1)]
+        cmc_counts += np.bincount(first[first < max_rank], minlength=max_rank)
+        num_valid_q += len(raw_cmc)
+
+        # compute average precision
+        # reference: https://en.wikipedia.org/wiki/Evaluation_measures_(information_retrieval)#Average_precision
+        # removed samples in front of the first kept one have rank -1, they
+        # never count as matches
+        precision = np.cumsum(raw_cmc, axis=1) / np.maximum(kept_rank + 1.0, 1.0)
+        all_AP.append((precision * raw_cmc).sum(axis=1) / num_rel)
+
+    assert num_valid_q > 0, "Error: all query identities do not appear in gallery"
+
+    all_cmc = np.cumsum(cmc_counts).astype(np.float32) / float(num_valid_q)
+    mAP = np.mean(np.concatenate(all_AP))
+
+    return all_cmc, mAP
+
+
+def _original_dist_rows(q_g_dist, q_q_dist, g_g_dist, start, stop):
+    """Rows start:stop of the normalized distance matrix of re-ranking,
+    i.e. the columns of [[q_q, q_g], [q_g.T, g_g]] squared and divided by
+    their maximum, without building the full matrix. Also returns the
+    maxima."""
+    num_q = q_g_dist.shape[0]
+    g_start, g_stop = max(start - num_q, 0), max(stop - num_q, 0)
+    columns = np.concatenate(
+        [
+            np.concatenate(
+                [q_q_dist[:, start:stop], q_g_dist[:, g_start:g_stop]], axis=1
+            ),
+            np.concatenate(
+                [q_g_dist.T[:, start:stop], g_g_dist[:, g_start:g_stop]], axis=1
+            ),
+        ],
+        axis=0,
+    )
+    dist = np.power(columns, 2).astype(np.float32).T
+    row_max = np.max(dist, axis=1)
+    return 1.0 * dist / row_max[:, np.newaxis], row_max
+
+
+def _original_dist_at(q_g_dist, q_q_dist, g_g_dist, row_max, rows, cols):
+    """Entries (rows, cols) of the normalized distance matrix of re-ranking."""
+    num_q = q_g_dist.shape[0]
+    # the normalized matrix is transposed, entry (i, j) comes from (j, i)
+    src_rows, src_cols = cols, rows
+    dist = np.empty(len(rows), dtype=np.result_type(q_g_dist, q_q_dist, g_g_dist))
+    rq = src_rows < num_q
+    cq = src_cols < num_q
+    m = rq & cq
+    dist[m] = q_q_dist[src_rows[m], src_cols[m]]
+    m = rq & ~cq
+    dist[m] = q_g_dist[src_rows[m], src_cols[m] - num_q]
+    m = ~rq & cq
+    dist[m] = q_g_dist[src_cols[m], src_rows[m] - num_q]
+    m = ~rq & ~cq
+    dist[m] = g_g_dist[src_rows[m] - num_q, src_cols[m] - num_q]
+    return 1.0 * np.power(dist, 2).astype(np.float32) / row_max[rows]
+
+
+def _reciprocal_mask(initial_rank, rows, k):
+    """mask[r, a] tells whether rows[r] is among the k + 1 nearest neighbors
+    of its a-th nearest neighbor."""
+    forward = initial_rank[rows, : k + 1]
+    backward = initial_rank[forward, : k + 1]
+    return (backward == rows[:, np.newaxis, np.newaxis]).any(axis=2)
+
+
+def _k_reciprocal_expansion(initial_rank, half_mask, rows, k1):
+    """(row, column) pairs of the k-reciprocal expansion set of every row."""
+    num_half = half_mask.shape[1]
+    forward = initial_rank[rows, : k1 + 1]
+    reciprocal = _reciprocal_mask(initial_rank, rows, k1)
+
+    # half-k1 reciprocal neighbors of every k-reciprocal candidate
+    candidates = initial_rank[forward, :num_half]
+    candidate_mask = half_mask[forward] & reciprocal[:, :, np.newaxis]
+    shared = (
+        (candidates[:, :, :, np.newaxis] == forward[:, np.newaxis, np.newaxis, :])
+        & reciprocal[:, np.newaxis, np.newaxis, :]
+    ).any(axis=3)
+    overlap = (shared & candidate_mask).sum(axis=2)
+    expand = overlap > 2.0 / 3 * candidate_mask.sum(axis=2)
+    candidate_mask &= expand[:, :, np.newaxis]
+
+    local = np.arange(len(rows))
+    pair_rows = np.concatenate(
+        [
+            np.broadcast_to(local[:, np.newaxis], forward.shape)[reciprocal],
+            np.broadcast_to(local[:, np.newaxis, np.newaxis], candidates.shape)[
+                candidate_mask
+            ],
+        ]
+    )
+    pair_cols = np.concatenate([forward[reciprocal], candidates[candidate_mask]])
+    num_all = initial_rank.shape[0]
+    keys = np.unique(pair_rows.astype(np.int64) * num_all + pair_cols)
+    return rows[keys // num_all], keys % num_all
+
+
+def _jaccard_dist(V, query_num, memory_limit_mb):
+    """1 - |V_q ∩ V_g| / |V_q ∪ V_g| between the query rows and the gallery
+    rows of V, only visiting the columns both of them share."""
+    V_q = V[:query_num].tocsr()
+    V_g = V[query_num:].tocsc()
+    gallery_num = V_g.shape[0]
+    col_counts = np.diff(V_g.indptr)
+
+    # gallery entries met by every nonzero query entry, summed per query
+    q_rows = np.repeat(np.arange(query_num), np.diff(V_q.indptr))
+    pair_counts = col_counts[V_q.indices]
+    pairs_per_query = np.bincount(q_rows, weights=pair_counts, minlength=query_num)
+    pairs_cumsum = np.cumsum(pairs_per_query)
+
+    # about 48 bytes per joined pair, 16 per dense output entry
+    budget = memory_limit_mb * 1024 ** 2
+    max_rows = _rows_per_chunk(16 * gallery_num, memory_limit_mb)
+    jaccard_dist = np.empty((query_num, gallery_num), dtype=np.float32)
+    start = 0
+    while start < query_num:
+        done = pairs_cumsum[start - 1] if start > 0 else 0
+        stop = np.searchsorted(pairs_cumsum, done + budget / 48.0, side="right")
+        stop = min(max(stop, start + 1), start + max_rows, query_num)
+
+        lo, hi = V_q.indptr[start], V_q.indptr[stop]
+        cols = V_q.indices[lo:hi]
+        counts = col_counts[cols]
+        total = counts.sum()
+        offsets = np.repeat(V_g.indptr[cols] - (np.cumsum(counts) - counts), counts)
+        positions = offsets + np.arange(total)
+        values = np.minimum(np.repeat(V_q.data[lo:hi], counts), V_g.data[positions])
+        keys = np.repeat(q_rows[lo:hi] - start, counts) * gallery_num
+        keys += V_g.indices[positions]
+        temp_min = np.bincount(
+            keys, weights=values, minlength=(stop - start) * gallery_num
+        ).reshape(stop - start, gallery_num)
+        jaccard_dist[start:stop] = 1 - temp_min / (2.0 - temp_min)
+        start = stop
+    return jaccard_dist
+
+
+def re_ranking(
+    q_g_dist, q_q_dist, g_g_dist, k1=20, k2=6, lambda_value=0.3, memory_limit_mb=1024
+):
+    """k-reciprocal re-ranking.
+
+    Reference:
+        Zhong et al. Re-ranking Person Re-identification with k-reciprocal Encoding. CVPR 2017.
+
+    Same results as the reference implementation, but the (N, N) matrices of
+    all samples are never materialized: the neighbor ranking is computed in
+    row chunks, the k-reciprocal encodings are kept as a sparse matrix and the
+    Jaccard distance only joins the nonzero entries.
+
+    Args:
+        q_g_dist, q_q_dist, g_g_dist (numpy.ndarray): query-gallery,
+            query-query and gallery-gallery distance matrices.
+        k1, k2 (int, optional): neighborhood sizes. Default is 20 and 6.
+        lambda_value (float, optional): weight of the original distance. Default is 0.3.
+        memory_limit_mb (int, optional): rough cap of the temporaries. Default is 1024.
+
+    Returns:
+        numpy.ndarray: re-ranked query-gallery distance matrix.
+    """
+    query_num = q_g_dist.shape[0]
+    all_num = query_num + q_g_dist.shape[1]
+    num_rank = max(k1 + 1, k2)
+
+    # nearest neighbors of every sample, a full argsort on each row chunk
+    initial_rank = np.empty((all_num, num_rank), dtype=np.int64)
+    row_max = np.empty(all_num, dtype=np.float32)
+    original_dist = np.empty((query_num, all_num - query_num), dtype=np.float32)
+    chunk = _rows_per_chunk(16 * all_num, memory_limit_mb)
+    for start in range(0, all_num, chunk):
+        stop = min(start + chunk, all_num)
+        dist, row_max[start:stop] = _original_dist_rows(
+            q_g_dist, q_q_dist, g_g_dist, start, stop
+        )
+        initial_rank[start:stop] = np.argsort(dist)[:, :num_rank]
+        if start < query_num:
+            original_dist[start : min(stop, query_num)] = dist[
+                : min(stop, query_num) - start, query_num:
+            ]
+    del dist
+
+    # k-reciprocal encodings, exp(-dist) over the expansion set of every sample
+    num_half = int(np.around(k1 / 2.0))
+    half_mask = np.empty((all_num, num_half + 1), dtype=bool)
+    chunk = _rows_per_chunk(2 * (k1 + 1) ** 2 * (num_half + 1), memory_limit_mb)
+    for start in range(0, all_num, chunk):
+        rows = np.arange(start, min(start + chunk, all_num))
+        half_mask[rows] = _reciprocal_mask(initial_rank, rows, num_half)
+
+    V_rows, V_cols, V_data = [], [], []
+    for start in range(0, all_num, chunk):
+        rows = np.arange(start, min(start + chunk, all_num))
+        rows, cols = _k_reciprocal_expansion(initial_rank, half_mask, rows, k1)
+        weight = np.exp(
+            -_original_dist_at(q_g_dist, q_q_dist, g_g_dist, row_max, rows, cols)
+        )
+        weight_sum = np.bincount(rows - start, weights=weight)
+        V_rows.append(rows)
+        V_cols.append(cols)
+        V_data.append(1.0 * weight / weight_sum[rows - start].astype(np.float32))
+    V = sparse.csr_matrix(
+        (np.concatenate(V_data), (np.concatenate(V_rows), np.concatenate(V_cols))),
+        shape=(all_num, all_num),
+        dtype=np.float32,
+    )
+
+    # local query expansion, mean of the encodings of the k2 nearest neighbors
+    if k2 != 1:
+        expansion = sparse.csr_matrix(
+            (
+                np.full(all_num * k2, 1.0 / k2, dtype=np.float32),
+                (np.repeat(np.arange(all_num), k2), initial_rank[:, :k2].reshape(-1)),
+            ),
+            shape=(all_num, all_num),
+        )
+        V = expansion.dot(V)
+    del initial_rank
+
+    jaccard_dist = _jaccard_dist(V, query_num, memory_limit_mb)
+    final_dist = jaccard_dist * (1 - lambda_value) + original_dist * lambda_value
+    return final_dist
@@ -0,0 +1,92 @@
+import oneflow as flow
+
+import argparse
+import numpy as np
+import time
+
+from models.repvgg import get_RepVGG_func_by_name, repvgg_model_convert
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        "flags for compare train-form and deploy-form RepVGG outputs and speed"
+    )
+    parser.add_argument(
+        "--arch", type=str, default="RepVGG-A0", help="architecture, e.g. RepVGG-A0"
+    )
+    parser.add_argument(
+        "--model_path",
+        type=str,
+        default="",
+        help="training checkpoint, random weights and bn statistics if empty",
+    )
+    parser.add_argument("--batch_size", type=int, default=32, help="batch size")
+    parser.add_argument("--image_size", type=int, default=224, help="image size")
+    parser.add_argument("--iters", type=int, default=50, help="timed iterations")
+    parser.add_argument("--device", type=str, default="cuda", help="cuda or cpu")
+    return parser.parse_args()
+
+
+def _randomize_bn(model):
+    # fresh bn layers are identities, random statistics make the check meaningful
+    state_dict = model.state_dict()
+    new_state_dict = dict()
+    for key, value in state_dict.items():
+        value = value.numpy()
+        if key.endswith("running_mean") or key.endswith("bias"):
+            value = np.random.uniform(-0.1, 0.1, value.shape)
+        elif key.endswith("running_var"):
+            value = np.random.uniform(0.5, 1.5, value.shape)
+        elif key.endswith("bn.weight") or "rbr_identity" in key:
+            value = np.random.uniform(0.5, 1.5, value.shape)
+        new_state_dict[key] = value.astype(np.float32)
+    model.load_state_dict(new_state_dict)
+
+
+def _benchmark(model, image, iters):
+    with flow.no_grad():
+        for _ in range(5):
+            model(image).numpy()
+        start_t = time.time()
+        for _ in range(iters):
+            output = model(image)
+        output = output.numpy()
+    return output, (time.time() - start_t) / iters * 1000
+
+
+def main(args):
+    model = get_RepVGG_func_by_name(args.arch)(deploy=False)
+    if args.model_path:
+        model.load_state_dict(flow.load(args.model_path))
+    else:
+        _randomize_bn(model)
+    model.eval()
+    model.to(args.device)
+
+    image = flow.Tensor(
+        np.random.randn(args.batch_size, 3, args.image_size, args.image_size),
+        device=flow.device(args.device),
+    )
+    train_out, train_time = _benchmark(model, image, args.iters)
+
+    repvgg_model_convert(model)
+    deploy_out, deploy_time = _benchmark(model, image, args.iters)
+
+    max_diff = np.abs(train_out - deploy_out).max()
+    print("max abs diff of the outputs: %e" % max_diff)
+    assert np.allclose(train_out, deploy_out, rtol=1e-3, atol=1e-3), "outputs differ"
+    print(
+        "%s batch %d: train-form %.2f ms, deploy-form %.2f ms, speedup %.2fx"
+        % (
+            args.arch,
+            args.batch_size,
+            train_time,
+            deploy_time,
+            train_time / deploy_time,
+        )
+    )
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    main(args)
@@ -0,0 +1,40 @@
+import oneflow as flow
+
+import argparse
+
+from models.repvgg import get_RepVGG_func_by_name, repvgg_model_convert
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        "flags for convert a training RepVGG checkpoint into a deploy checkpoint"
+    )
+    parser.add_argument(
+        "--arch", type=str, default="RepVGG-A0", help="architecture, e.g. RepVGG-A0"
+    )
+    parser.add_argument(
+        "--load_path",
+        type=str,
+        default="./repvggA0_oneflow_model",
+        help="training checkpoint",
+    )
+    parser.add_argument(
+        "--save_path",
+        type=str,
+        default="./repvggA0_deploy_oneflow_model",
+        help="deploy checkpoint",
+    )
+    return parser.parse_args()
+
+
+def main(args):
+    repvgg_build_func = get_RepVGG_func_by_name(args.arch)
+    train_model = repvgg_build_func(deploy=False)
+    train_model.load_state_dict(flow.load(args.load_path))
+    repvgg_model_convert(train_model, save_path=args.save_path)
+    print("deploy checkpoint saved to {}".format(args.save_path))
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    main(args)
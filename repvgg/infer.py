@@ -3,10 +3,12 @@ import oneflow as flow
 import argparse
 import numpy as np
 import time
+import sys
 
-from models.repvgg import create_RepVGG_A0
-from utils.imagenet1000_clsidx_to_labels import clsidx_2_labels
-from utils.numpy_data_utils import load_image
+from models.repvgg import create_RepVGG_A0, repvgg_model_convert
+
+sys.path.append("../")
+from image_data import clsidx_2_labels, load_image
 
 
 def _parse_args():
@@ -15,6 +17,11 @@ def _parse_args():
         "--model_path", type=str, default="./RepVGG-A0-train", help="model path"
     )
     parser.add_argument("--image_path", type=str, default="", help="input image path")
+    parser.add_argument(
+        "--deploy",
+        action="store_true",
+        help="fuse the branches of every block before inference",
+    )
     return parser.parse_args()
 
 
@@ -33,6 +40,8 @@ def main(args):
 
     repVGGA0.eval()
     repVGGA0.to("cuda")
+    if args.deploy:
+        repvgg_model_convert(repVGGA0)
 
     start_t = time.time()
     image = load_image(args.image_path)
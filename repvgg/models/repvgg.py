@@ -1,3 +1,4 @@
+import numpy as np
 import oneflow as flow
 from oneflow import nn, Tensor
 
@@ -16,6 +17,8 @@ __all__ = [
     "create_RepVGG_B3g2",
     "create_RepVGG_B3g4",
     "create_RepVGG_D2se",
+    "get_RepVGG_func_by_name",
+    "repvgg_model_convert",
 ]
 
 
@@ -134,7 +137,7 @@ class RepVGGBlock(nn.Module):
 
     def forward(self, inputs):
         if hasattr(self, "rbr_reparam"):
-            return self.non_linearity(self.se(self.rbr_reparam(inputs)))
+            return self.nonlinearity(self.se(self.rbr_reparam(inputs)))
 
         if self.rbr_identity is None:
             id_out = 0
@@ -145,6 +148,67 @@ class RepVGGBlock(nn.Module):
             self.se(self.rbr_dense(inputs) + self.rbr_1x1(inputs) + id_out)
         )
 
+    #   Fuses the 3x3 conv-bn, the 1x1 conv-bn and the identity bn into the
+    #   kernel and bias of a single 3x3 conv, computed on the host.
+    def get_equivalent_kernel_bias(self):
+        kernel3x3, bias3x3 = self._fuse_bn_tensor(self.rbr_dense)
+        kernel1x1, bias1x1 = self._fuse_bn_tensor(self.rbr_1x1)
+        kernelid, biasid = self._fuse_bn_tensor(self.rbr_identity)
+        return (
+            kernel3x3 + self._pad_1x1_to_3x3_tensor(kernel1x1) + kernelid,
+            bias3x3 + bias1x1 + biasid,
+        )
+
+    def _pad_1x1_to_3x3_tensor(self, kernel1x1):
+        if isinstance(kernel1x1, int):
+            return 0
+        return np.pad(kernel1x1, ((0, 0), (0, 0), (1, 1), (1, 1)))
+
+    def _fuse_bn_tensor(self, branch):
+        if branch is None:
+            return 0, 0
+        if isinstance(branch, nn.Sequential):
+            kernel = branch.conv.weight.numpy()
+            bn = branch.bn
+        else:
+            assert isinstance(branch, nn.BatchNorm2d)
+            # the identity is a 3x3 conv with a single 1 per output channel
+            input_dim = self.in_channels // self.groups
+            kernel = np.zeros((self.in_channels, input_dim, 3, 3), dtype=np.float32)
+            for i in range(self.in_channels):
+                kernel[i, i % input_dim, 1, 1] = 1
+            bn = branch
+        std = np.sqrt(bn.running_var.numpy() + bn.eps)
+        t = bn.weight.numpy() / std
+        return (
+            kernel * t.reshape(-1, 1, 1, 1),
+            bn.bias.numpy() - bn.running_mean.numpy() * t,
+        )
+
+    def switch_to_deploy(self):
+        if hasattr(self, "rbr_reparam"):
+            return
+        kernel, bias = self.get_equivalent_kernel_bias()
+        conv = self.rbr_dense.conv
+        self.rbr_reparam = nn.Conv2d(
+            in_channels=self.in_channels,
+            out_channels=conv.out_channels,
+            kernel_size=conv.kernel_size,
+            stride=conv.stride,
+            padding=conv.padding,
+            dilation=conv.dilation,
+            groups=conv.groups,
+            bias=True,
+        )
+        self.rbr_reparam.load_state_dict(
+            {"weight": kernel.astype(np.float32), "bias": bias.astype(np.float32)}
+        )
+        self.rbr_reparam.to(conv.weight.device)
+        del self.rbr_dense
+        del self.rbr_1x1
+        del self.rbr_identity
+        self.deploy = True
+
 
 class RepVGG(nn.Module):
     def __init__(
@@ -370,3 +434,49 @@ def create_RepVGG_D2se(deploy=False):
         deploy=deploy,
         use_se=True,
     )
+
+
+func_dict = {
+    "RepVGG-A0": create_RepVGG_A0,
+    "RepVGG-A1": create_RepVGG_A1,
+    "RepVGG-A2": create_RepVGG_A2,
+    "RepVGG-B0": create_RepVGG_B0,
+    "RepVGG-B1": create_RepVGG_B1,
+    "RepVGG-B1g2": create_RepVGG_B1g2,
+    "RepVGG-B1g4": create_RepVGG_B1g4,
+    "RepVGG-B2": create_RepVGG_B2,
+    "RepVGG-B2g2": create_RepVGG_B2g2,
+    "RepVGG-B2g4": create_RepVGG_B2g4,
+    "RepVGG-B3": create_RepVGG_B3,
+    "RepVGG-B3g2": create_RepVGG_B3g2,
+    "RepVGG-B3g4": create_RepVGG_B3g4,
+    "RepVGG-D2se": create_RepVGG_D2se,
+}
+
+
+def get_RepVGG_func_by_name(name):
+    if name not in func_dict:
+        raise ValueError(
+            "Unknown RepVGG: {}, choose one of {}".format(name, list(func_dict))
+        )
+    return func_dict[name]
+
+
+def repvgg_model_convert(model, save_path=None):
+    """Converts a trained RepVGG into its deploy form in place.
+
+    Every block is fused into a single 3x3 conv, the result loads into the
+    same architecture created with ``deploy=True``.
+
+    Args:
+        model (RepVGG): trained model, left in eval mode.
+        save_path (str, optional): saves the deploy state dict there.
+    """
+    model.eval()
+    for module in list(model.modules()):
+        if hasattr(module, "switch_to_deploy"):
+            module.switch_to_deploy()
+    model.deploy = True
+    if save_path is not None:
+        flow.save(model.state_dict(), save_path)
+    return model
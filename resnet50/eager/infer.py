@@ -8,8 +8,9 @@ import sys
 
 sys.path.append(".")
 from models.resnet50 import resnet50
-from utils.imagenet1000_clsidx_to_labels import clsidx_2_labels
-from utils.numpy_data_utils import load_image
+
+sys.path.append("../")
+from image_data import clsidx_2_labels, load_image
 
 
 def _parse_args():
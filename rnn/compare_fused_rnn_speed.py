@@ -0,0 +1,243 @@
+import oneflow as flow
+
+import argparse
+import math
+import sys
+import time
+
+import numpy as np
+
+sys.path.append("../")
+from fused_rnn import LSTM, GRU, lengths_to_mask
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        "flags for compare per-step cells and fused rnn layers speed"
+    )
+    parser.add_argument("--seq_len", type=int, default=64, help="sequence length")
+    parser.add_argument("--batch_size", type=int, default=32, help="batch size")
+    parser.add_argument("--input_size", type=int, default=128, help="input size")
+    parser.add_argument("--hidden_size", type=int, default=256, help="hidden size")
+    parser.add_argument(
+        "--min_seq_len",
+        type=int,
+        default=None,
+        help="shortest sequence of the padded batches, seq_len // 4 by default",
+    )
+    parser.add_argument("--iters", type=int, default=50, help="timed iterations")
+    return parser.parse_args()
+
+
+class PerStepLSTM(flow.nn.Module):
+    """The hand written LSTM the rnn example used before, (seq, batch, input),
+    input projection inside the time loop."""
+
+    def __init__(self, input_sz, hidden_sz):
+        super().__init__()
+        self.hidden_size = hidden_sz
+        self.W = flow.nn.Parameter(flow.Tensor(input_sz, hidden_sz * 4))
+        self.U = flow.nn.Parameter(flow.Tensor(hidden_sz, hidden_sz * 4))
+        self.bias = flow.nn.Parameter(flow.Tensor(hidden_sz * 4))
+        stdv = 1.0 / math.sqrt(self.hidden_size)
+        for weight in self.parameters():
+            weight.data.uniform_(-stdv, stdv)
+
+    def forward(self, x):
+        seq_sz, bs, _ = x.size()
+        hidden_seq = []
+        h_t = flow.zeros((bs, self.hidden_size)).to(x.device)
+        c_t = flow.zeros((bs, self.hidden_size)).to(x.device)
+        HS = self.hidden_size
+        for t in range(seq_sz):
+            x_t = x[t, :, :].reshape(x.shape[1], x.shape[2])
+            gates = flow.matmul(x_t, self.W) + flow.matmul(h_t, self.U) + self.bias
+            i_t, f_t, g_t, o_t = (
+                flow.sigmoid(gates[:, :HS]),
+                flow.sigmoid(gates[:, HS : HS * 2]),
+                flow.tanh(gates[:, HS * 2 : HS * 3]),
+                flow.sigmoid(gates[:, HS * 3 :]),
+            )
+            c_t = f_t * c_t + i_t * g_t
+            h_t = o_t * flow.tanh(c_t)
+            hidden_seq.append(h_t.unsqueeze(0))
+        return flow.cat(hidden_seq, dim=0), (h_t, c_t)
+
+
+class PerStepGRU(flow.nn.Module):
+    """The hand written GRU the seq2seq example used before, (batch, seq,
+    input), input projection inside the time loop."""
+
+    def __init__(self, input_size, hidden_size):
+        super().__init__()
+        self.hidden_size = hidden_size
+        self.inp_W = flow.nn.Parameter(flow.Tensor(input_size, hidden_size * 3))
+        self.hid_W = flow.nn.Parameter(flow.Tensor(hidden_size, hidden_size * 3))
+        self.inp_b = flow.nn.Parameter(flow.Tensor(hidden_size * 3))
+        self.hid_b = flow.nn.Parameter(flow.Tensor(hidden_size * 3))
+        stdv = 1.0 / math.sqrt(self.hidden_size)
+        for weight in self.parameters():
+            weight.data.uniform_(-stdv, stdv)
+
+    def forward(self, x, mask=None):
+        """mask: (batch, seq) float of the valid steps of a padded batch."""
+        batch_size, seq_len, _ = x.size()
+        H_S = self.hidden_size
+        hidden_seq = []
+        h_t = flow.zeros((batch_size, self.hidden_size)).to(x.device)
+        for t in range(seq_len):
+            x_t = x[:, t, :]
+            gates_1 = flow.matmul(x_t, self.inp_W) + self.inp_b
+            gates_2 = flow.matmul(h_t, self.hid_W) + self.hid_b
+            r_gate = flow.sigmoid(gates_1[:, :H_S] + gates_2[:, :H_S])
+            z_gate = flow.sigmoid(gates_1[:, H_S : H_S * 2] + gates_2[:, H_S : H_S * 2])
+            h_t_ = flow.tanh(
+                gates_1[:, H_S * 2 : H_S * 3] + r_gate * gates_2[:, H_S * 2 : H_S * 3]
+            )
+            h_next = (1 - z_gate) * h_t_ + z_gate * h_t
+            if mask is None:
+                h_t = h_next
+                hidden_seq.append(h_t.unsqueeze(1))
+            else:
+                m_t = mask[:, t].unsqueeze(1)
+                h_t = h_t + m_t * (h_next - h_t)
+                hidden_seq.append((m_t * h_t).unsqueeze(1))
+        return flow.cat(hidden_seq, dim=1), h_t
+
+
+def _first(output):
+    return output[0] if isinstance(output, tuple) else output
+
+
+def _benchmark(name, module, inputs, iters):
+    module.to("cuda")
+    of_sgd = flow.optim.SGD(module.parameters(), lr=0.001)
+
+    for_time = 0.0
+    bp_time = 0.0
+    update_time = 0.0
+    for i in range(iters + 5):
+        if i == 5:
+            for_time = bp_time = update_time = 0.0
+            start_t = time.time()
+        s_t = time.time()
+        loss = _first(module(*inputs)).sum()
+        for_time += time.time() - s_t
+
+        s_t = time.time()
+        loss.backward()
+        bp_time += time.time() - s_t
+
+        s_t = time.time()
+        of_sgd.step()
+        of_sgd.zero_grad()
+        update_time += time.time() - s_t
+    loss.numpy()
+    end_t = time.time()
+
+    print(
+        "{:<40} loop {:.2f} ms, forward {:.2f} ms, backward {:.2f} ms, update {:.2f} ms".format(
+            name,
+            (end_t - start_t) / iters * 1000,
+            for_time / iters * 1000,
+            bp_time / iters * 1000,
+            update_time / iters * 1000,
+        )
+    )
+
+
+def main(args):
+    # Fake data, only for speed test purpose
+    time_major = flow.Tensor(
+        np.random.randn(args.seq_len, args.batch_size, args.input_size)
+    ).to("cuda")
+    batch_major = flow.Tensor(
+        np.random.randn(args.batch_size, args.seq_len, args.input_size)
+    ).to("cuda")
+
+    print("start lstm training loops....")
+    _benchmark(
+        "per-step LSTM",
+        PerStepLSTM(args.input_size, args.hidden_size),
+        (time_major,),
+        args.iters,
+    )
+    _benchmark(
+        "fused_rnn.LSTM",
+        LSTM(args.input_size, args.hidden_size),
+        (time_major,),
+        args.iters,
+    )
+    _benchmark(
+        "fused_rnn.LSTM bidirectional",
+        LSTM(args.input_size, args.hidden_size, bidirectional=True),
+        (time_major,),
+        args.iters,
+    )
+    if hasattr(flow.nn, "LSTM"):
+        _benchmark(
+            "flow.nn.LSTM",
+            flow.nn.LSTM(args.input_size, args.hidden_size),
+            (time_major,),
+            args.iters,
+        )
+    else:
+        print("flow.nn.LSTM is not available in this oneflow version")
+
+    print("start gru training loops....")
+    _benchmark(
+        "per-step GRU",
+        PerStepGRU(args.input_size, args.hidden_size),
+        (batch_major,),
+        args.iters,
+    )
+    _benchmark(
+        "fused_rnn.GRU",
+        GRU(args.input_size, args.hidden_size, batch_first=True),
+        (batch_major,),
+        args.iters,
+    )
+
+    # padded batches of random lengths, the sequences end at their own length
+    min_seq_len = args.min_seq_len or max(args.seq_len // 4, 1)
+    lengths = np.random.randint(min_seq_len, args.seq_len + 1, size=args.batch_size)
+    lengths[0] = args.seq_len
+    print(
+        "start padded batch training loops, lengths {}-{}, {:.0f}% padding....".format(
+            lengths.min(),
+            lengths.max(),
+            100 - lengths.sum() * 100.0 / (args.seq_len * args.batch_size),
+        )
+    )
+    # (seq, batch, 1) -> (batch, seq)
+    batch_mask = lengths_to_mask(lengths, args.seq_len, "cuda").squeeze(2)
+    batch_mask = batch_mask.transpose(0, 1)
+    _benchmark(
+        "per-step GRU, masked",
+        PerStepGRU(args.input_size, args.hidden_size),
+        (batch_major, batch_mask),
+        args.iters,
+    )
+    _benchmark(
+        "fused_rnn.GRU, lengths",
+        GRU(args.input_size, args.hidden_size, batch_first=True),
+        (batch_major, None, lengths),
+        args.iters,
+    )
+    _benchmark(
+        "fused_rnn.LSTM, lengths",
+        LSTM(args.input_size, args.hidden_size),
+        (time_major, None, lengths),
+        args.iters,
+    )
+    _benchmark(
+        "fused_rnn.LSTM bidirectional, lengths",
+        LSTM(args.input_size, args.hidden_size, bidirectional=True),
+        (time_major, None, lengths),
+        args.iters,
+    )
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    main(args)
@@ -1,6 +1,8 @@
-import oneflow as flow
 import oneflow.nn as nn
-import math
+import sys
+
+sys.path.append("../")
+from fused_rnn import LSTM as FusedLSTM, upgrade_cell_state_dict
 
 # Reference: https://github.com/piEsposito/pytorch-lstm-by-hand
 class LSTM(nn.Module):
@@ -12,11 +14,18 @@ class LSTM(nn.Module):
         self.num_layers = num_layers
 
         # Define the LSTM layer
-        self.lstm = CustomLSTM(self.input_dim, self.hidden_dim)
+        self.lstm = FusedLSTM(self.input_dim, self.hidden_dim)
 
         # Define the output layer
         self.linear = nn.Linear(self.hidden_dim, output_dim)
 
+    def _load_from_state_dict(self, state_dict, prefix, *args, **kwargs):
+        # checkpoints of the former per-step CustomLSTM
+        upgrade_cell_state_dict(
+            state_dict, prefix + "lstm.", [prefix + "lstm."], ("W", "bias", "U", None)
+        )
+        super()._load_from_state_dict(state_dict, prefix, *args, **kwargs)
+
     def forward(self, input):
         # Forward pass through LSTM layer
         # shape of lstm_out: [input_size, batch_size, hidden_dim]
@@ -30,49 +39,3 @@ class LSTM(nn.Module):
         output = lstm_out[lstm_out.shape[0] - 1].reshape(self.batch_size, -1)
         y_pred = self.linear(output)
         return y_pred
-
-
-class CustomLSTM(nn.Module):
-    def __init__(self, input_sz, hidden_sz):
-        super().__init__()
-        self.input_sz = input_sz
-        self.hidden_size = hidden_sz
-        self.W = nn.Parameter(flow.Tensor(input_sz, hidden_sz * 4))
-        self.U = nn.Parameter(flow.Tensor(hidden_sz, hidden_sz * 4))
-        self.bias = nn.Parameter(flow.Tensor(hidden_sz * 4))
-        self.init_weights()
-
-    def init_weights(self):
-        stdv = 1.0 / math.sqrt(self.hidden_size)
-        for weight in self.parameters():
-            weight.data.uniform_(-stdv, stdv)
-
-    def forward(self, x, init_states=None):
-        """Assumes x is of shape (batch, sequence, feature)"""
-        seq_sz, bs, _ = x.size()
-        hidden_seq = []
-        if init_states is None:
-            h_t, c_t = (
-                flow.zeros((bs, self.hidden_size)).to("cuda"),
-                flow.zeros((bs, self.hidden_size)).to("cuda"),
-            )
-        else:
-            h_t, c_t = init_states
-
-        HS = self.hidden_size
-        for t in range(seq_sz):
-            x_t = x[t, :, :].reshape(x.shape[1], x.shape[2])
-            # batch the computations into a single matrix multiplication
-            # NOTE(Xu Zhiqiu): flow does not support view now, use reshape instead
-            gates = flow.matmul(x_t, self.W) + flow.matmul(h_t, self.U) + self.bias
-            i_t, f_t, g_t, o_t = (
-                flow.sigmoid(gates[:, :HS]),
-                flow.sigmoid(gates[:, HS : HS * 2]),
-                flow.tanh(gates[:, HS * 2 : HS * 3]),
-                flow.sigmoid(gates[:, HS * 3 :]),
-            )
-            c_t = f_t * c_t + i_t * g_t
-            h_t = o_t * flow.tanh(c_t)
-            hidden_seq.append(h_t.unsqueeze(0))
-        hidden_seq = flow.cat(hidden_seq, dim=0)
-        return hidden_seq, (h_t, c_t)
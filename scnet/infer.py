@@ -3,10 +3,13 @@ import oneflow as flow
 import argparse
 import numpy as np
 import time
+import sys
 
 from models.resnet50 import resnet50
 from utils.clsidx_to_labels import clsidx_2_labels
-from utils.numpy_data_utils import load_image
+
+sys.path.append("../")
+from image_data import load_image
 
 
 def _parse_args():
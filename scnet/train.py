@@ -4,11 +4,13 @@ import argparse
 import numpy as np
 import os
 import time
+import sys
 
 from models.resnet50 import resnet50
 from models.scloss import scloss
 
-from utils.ofrecord_data_utils import OFRecordDataLoader
+sys.path.append("../")
+from image_data import OFRecordDataLoader
 
 
 def _parse_args():
@@ -45,15 +47,11 @@ def main(args):
     train_data_loader = OFRecordDataLoader(
         ofrecord_root=args.ofrecord_path,
         mode="train",
-        dataset_size=7795,  # NOTE(Liang Depeng): needs to explictly set the dataset size
         batch_size=args.train_batch_size,
     )
 
     val_data_loader = OFRecordDataLoader(
-        ofrecord_root=args.ofrecord_path,
-        mode="val",
-        dataset_size=7800,
-        batch_size=args.val_batch_size,
+        ofrecord_root=args.ofrecord_path, mode="val", batch_size=args.val_batch_size,
     )
 
     # oneflow init
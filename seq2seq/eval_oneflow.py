@@ -1,6 +1,8 @@
 from models.seq_seq_oneflow import AttnDecoderRNN_oneflow, EncoderRNN_oneflow
 from utils.utils_oneflow import *
 import random
+import time
+import numpy as np
 import oneflow as flow
 from utils.dataset import prepareData
 import argparse
@@ -27,6 +29,21 @@ def _parse_args():
         "--device", type=str, default="cuda", help="device",
     )
 
+    parser.add_argument(
+        "--batch_size", type=int, default=64, help="sentences per batched decoding"
+    )
+
+    parser.add_argument(
+        "--beam_size", type=int, default=5, help="beams of the batched beam search"
+    )
+
+    parser.add_argument(
+        "--n_speed",
+        type=int,
+        default=1000,
+        help="sentences decoded to measure sentences per second, 0 to skip",
+    )
+
     return parser.parse_args()
 
 
@@ -75,6 +92,142 @@ def evaluate(
         return decoded_words, decoder_attentions[: di + 1]
 
 
+def _repeatRows(tensor, times):
+    """(batch, ...) -> (batch * times, ...), copies of a row are contiguous"""
+    shape = tuple(tensor.shape)
+    return flow.cat([tensor.unsqueeze(1)] * times, dim=1).reshape(
+        (shape[0] * times,) + shape[1:]
+    )
+
+
+def evaluateBatch(
+    encoder, decoder, sentences, input_lang, output_lang, max_length=MAX_LENGTH
+):
+    """Greedy decoding of a batch of sentences, the words are copied to the
+    host once at the end instead of after every step."""
+    with flow.no_grad():
+        input_tensor, input_lengths = tensorsFromSentences(input_lang, sentences)
+        encoder_outputs, decoder_hidden = encoder.forward_batch(
+            input_tensor, input_lengths, max_length
+        )
+        decoder_input = flow.tensor(
+            [SOS_token] * len(sentences), dtype=flow.long, device=device
+        )
+        decoded = []
+        for di in range(max_length):
+            decoder_output, decoder_hidden, decoder_attention = decoder.forward_batch(
+                decoder_input, decoder_hidden, encoder_outputs
+            )
+            decoder_input = flow.argmax(decoder_output, dim=1)
+            decoded.append(decoder_input.unsqueeze(1))
+        decoded = flow.cat(decoded, dim=1).numpy()
+    return [wordsFromIndexes(output_lang, indexes) for indexes in decoded]
+
+
+def beamSearchBatch(
+    encoder,
+    decoder,
+    sentences,
+    input_lang,
+    output_lang,
+    beam_size=5,
+    max_length=MAX_LENGTH,
+):
+    """Beam search over a batch of sentences.
+
+    The beams of all the sentences are decoded together as
+    batch * beam_size rows; only the (batch, beam_size) best candidates of
+    every step are copied to the host to pick the surviving beams.
+    """
+    batch_size = len(sentences)
+    n_words = output_lang.n_words
+    with flow.no_grad():
+        input_tensor, input_lengths = tensorsFromSentences(input_lang, sentences)
+        encoder_outputs, encoder_hidden = encoder.forward_batch(
+            input_tensor, input_lengths, max_length
+        )
+        encoder_outputs = _repeatRows(encoder_outputs, beam_size)
+        decoder_hidden = _repeatRows(encoder_hidden, beam_size)
+
+        # the beams of a sentence start identical, keep only the first one live
+        scores = np.tile([0.0] + [-1e9] * (beam_size - 1), batch_size)
+        finished = np.zeros(batch_size * beam_size, dtype=bool)
+        history = np.zeros((batch_size * beam_size, 0), dtype=np.int64)
+        words = np.full(batch_size * beam_size, SOS_token, dtype=np.int64)
+        # a finished beam can only repeat EOS, at no cost
+        eos_only = np.full((1, n_words), -1e9, dtype=np.float32)
+        eos_only[0, EOS_token] = 0
+        eos_only = flow.tensor(eos_only, device=device)
+        first_rows = np.repeat(np.arange(batch_size) * beam_size, beam_size)
+
+        for di in range(max_length):
+            decoder_output, decoder_hidden, decoder_attention = decoder.forward_batch(
+                flow.tensor(words, dtype=flow.long, device=device),
+                decoder_hidden,
+                encoder_outputs,
+            )
+            done = flow.tensor(finished[:, None].astype(np.float32), device=device)
+            candidates = (
+                decoder_output * (1 - done)
+                + done * eos_only
+                + flow.tensor(scores[:, None].astype(np.float32), device=device)
+            )
+            top_scores, top_index = candidates.reshape(
+                batch_size, beam_size * n_words
+            ).topk(beam_size)
+            scores = top_scores.numpy().reshape(-1)
+            top_index = top_index.numpy().reshape(-1)
+            beams = first_rows + top_index // n_words
+            words = top_index % n_words
+            history = np.concatenate((history[beams], words[:, None]), axis=1)
+            finished = finished[beams] | (words == EOS_token)
+            if finished.all():
+                break
+            # hidden states of the surviving beams, gathered by row index
+            index = flow.tensor(beams, dtype=flow.long, device=device)
+            decoder_hidden = flow.gather(
+                decoder_hidden,
+                index=index.unsqueeze(1).repeat(1, decoder_hidden.shape[1]),
+                dim=0,
+            )
+
+    best = (
+        scores.reshape(batch_size, beam_size).argmax(1)
+        + np.arange(batch_size) * beam_size
+    )
+    return [wordsFromIndexes(output_lang, history[row]) for row in best]
+
+
+def evaluateSpeed(
+    encoder, decoder, pairs, input_lang, output_lang, batch_size, beam_size, n
+):
+    """Sentences per second of evaluate() and of the batched decodings."""
+    sample = random.sample(pairs, min(n, len(pairs)))
+    sentences = [pair[0] for pair in sample]
+    batches = [[pair[0] for pair in batch] for batch in bucketPairs(sample, batch_size)]
+
+    start = time.time()
+    for sentence in sentences:
+        evaluate(encoder, decoder, sentence, input_lang, output_lang)
+    print("evaluate: %.1f sentences/s" % (len(sentences) / (time.time() - start)))
+
+    start = time.time()
+    for batch in batches:
+        evaluateBatch(encoder, decoder, batch, input_lang, output_lang)
+    print(
+        "evaluateBatch (batch %d): %.1f sentences/s"
+        % (batch_size, len(sentences) / (time.time() - start))
+    )
+
+    start = time.time()
+    for batch in batches:
+        beamSearchBatch(encoder, decoder, batch, input_lang, output_lang, beam_size)
+    print(
+        "beamSearchBatch (batch %d, beam %d): %.1f sentences/s"
+        % (batch_size, beam_size, len(sentences) / (time.time() - start))
+    )
+
+
 def evaluateRandomly(encoder, decoder, pairs, input_lang, output_lang, n=10):
     for i in range(n):
         pair = random.choice(pairs)
@@ -88,6 +241,23 @@ def evaluateRandomly(encoder, decoder, pairs, input_lang, output_lang, n=10):
         print("")
 
 
+def evaluateRandomlyBatch(
+    encoder, decoder, pairs, input_lang, output_lang, beam_size=5, n=10
+):
+    batch = random.sample(pairs, n)
+    sentences = [pair[0] for pair in batch]
+    greedy = evaluateBatch(encoder, decoder, sentences, input_lang, output_lang)
+    beam = beamSearchBatch(
+        encoder, decoder, sentences, input_lang, output_lang, beam_size
+    )
+    for pair, greedy_words, beam_words in zip(batch, greedy, beam):
+        print(">", pair[0])
+        print("=", pair[1])
+        print("<", " ".join(greedy_words))
+        print("< beam", " ".join(beam_words))
+        print("")
+
+
 def evaluateAndShowAttention(
     input_sentence, encoder, attn_decoder, input_lang, output_lang
 ):
@@ -109,7 +279,23 @@ def main(args):
     decoder = AttnDecoderRNN_oneflow(256, output_lang.n_words, dropout_p=0.1).to(device)
     encoder.load_state_dict(e)
     decoder.load_state_dict(d)
+    encoder.eval()
+    decoder.eval()
     evaluateRandomly(encoder, decoder, pairs, input_lang, output_lang)
+    evaluateRandomlyBatch(
+        encoder, decoder, pairs, input_lang, output_lang, args.beam_size
+    )
+    if args.n_speed > 0:
+        evaluateSpeed(
+            encoder,
+            decoder,
+            pairs,
+            input_lang,
+            output_lang,
+            args.batch_size,
+            args.beam_size,
+            args.n_speed,
+        )
 
 
 if __name__ == "__main__":
@@ -19,6 +19,33 @@ class EncoderRNN_oneflow(nn.Module):
         output, hidden = self.gru(output, hidden)
         return output, hidden
 
+    def forward_batch(self, input, lengths, max_length=MAX_LENGTH):
+        """Encodes a padded batch at once.
+
+        Args:
+            input: (batch, length) word indexes
+            lengths: number of words of every sentence, on the host
+
+        Returns:
+            outputs (batch, max_length, hidden) zero padded after every
+            sentence like the per-word encoding loop, and the hidden state
+            after the last word of every sentence (batch, hidden)
+        """
+        batch_size, length = input.shape
+        embedded = self.embedding(input)
+        output, hidden = self.gru(embedded, None, lengths)
+        if length < max_length:
+            output = flow.cat(
+                (
+                    output,
+                    flow.zeros((batch_size, max_length - length, self.hidden_size)).to(
+                        input.device
+                    ),
+                ),
+                dim=1,
+            )
+        return output, hidden
+
     def init_Hidden(self):
         return flow.zeros((1, self.hidden_size))
 
@@ -53,5 +80,29 @@ class AttnDecoderRNN_oneflow(nn.Module):
         output = self.logsoftmax(self.out(output[0]))
         return output, hidden, attn_weights
 
+    def forward_batch(self, input, hidden, encoder_outputs):
+        """One decoding step of a batch.
+
+        Args:
+            input: (batch,) previous words
+            hidden: (batch, hidden)
+            encoder_outputs: (batch, max_length, hidden) from
+                ``EncoderRNN_oneflow.forward_batch``
+
+        Returns:
+            log probabilities (batch, output_size), hidden and attention
+            weights (batch, max_length)
+        """
+        embedded = self.embedding(input)
+        embedded = self.dropout(embedded)
+        attn_weights = flow.softmax(self.attn(flow.cat((embedded, hidden), -1)))
+        attn_applied = flow.matmul(attn_weights.unsqueeze(1), encoder_outputs)
+        output = flow.cat((embedded, attn_applied.squeeze(1)), 1)
+        output = self.attn_combine(output).unsqueeze(1)
+        output = flow.relu(output)
+        output, hidden = self.gru(output, hidden)
+        output = self.logsoftmax(self.out(output.squeeze(1)))
+        return output, hidden, attn_weights
+
     def init_Hidden(self):
         return flow.zeros([1, self.hidden_size])
@@ -41,6 +41,13 @@ def _parse_args():
         "--drop", type=float, default=0.1, help="the dropout of decoder_embedding"
     )
 
+    parser.add_argument(
+        "--batch_size",
+        type=int,
+        default=1,
+        help="sentence pairs per step, above 1 trains on bucketed padded batches",
+    )
+
     return parser.parse_args()
 
 
@@ -104,6 +111,127 @@ def train(
     return loss.numpy() / target_length
 
 
+def trainBatch(
+    input_tensor,
+    input_lengths,
+    target_tensor,
+    target_mask,
+    encoder,
+    decoder,
+    encoder_optimizer,
+    decoder_optimizer,
+    criterion,
+    max_length=MAX_LENGTH,
+):
+    """train() on a padded batch, criterion keeps one loss per pair
+    (reduction="none") so the padded target words can be masked out."""
+    encoder_optimizer.zero_grad()
+    decoder_optimizer.zero_grad()
+
+    batch_size, target_length = target_tensor.shape
+    encoder_outputs, encoder_hidden = encoder.forward_batch(
+        input_tensor, input_lengths, max_length
+    )
+
+    decoder_input = flow.tensor(
+        [SOS_token] * batch_size, dtype=flow.long, device=device
+    )
+    decoder_hidden = encoder_hidden
+
+    use_teacher_forcing = True if random.random() < teacher_forcing_ratio else False
+
+    loss = 0
+    for di in range(target_length):
+        decoder_output, decoder_hidden, decoder_attention = decoder.forward_batch(
+            decoder_input, decoder_hidden, encoder_outputs
+        )
+        loss += (
+            criterion(decoder_output, target_tensor[:, di]) * target_mask[:, di]
+        ).sum()
+        if use_teacher_forcing:
+            decoder_input = target_tensor[:, di]
+        else:
+            # no early stop on a predicted EOS, checking it would copy to the
+            # host every step; the loss covers every target word instead
+            decoder_input = flow.argmax(decoder_output, dim=1).detach()
+
+    # same scale as train(), the loss of a pair sums over its words
+    (loss / batch_size).backward()
+    encoder_optimizer.step()
+    decoder_optimizer.step()
+
+    return loss.numpy() / target_mask.sum().numpy()
+
+
+def trainBatches(
+    encoder,
+    decoder,
+    n_iters,
+    pairs,
+    input_lang,
+    output_lang,
+    batch_size,
+    print_every=1000,
+    plot_every=100,
+    learning_rate=0.01,
+):
+    """trainIters over bucketed batches, ``n_iters`` counts sentence pairs."""
+    start = time.time()
+    plot_losses = []
+    print_loss_total = 0  # Reset every print_every
+    plot_loss_total = 0  # Reset every plot_every
+
+    encoder_optimizer = optim.SGD(encoder.parameters(), lr=learning_rate)
+    decoder_optimizer = optim.SGD(decoder.parameters(), lr=learning_rate)
+    criterion = nn.NLLLoss(reduction="none")
+
+    n_batches = (n_iters + batch_size - 1) // batch_size
+    batches = []
+    seen = 0
+    print_seen = 0
+    print_start = time.time()
+    for iter in range(1, n_batches + 1):
+        if not batches:
+            batches = bucketPairs(pairs, batch_size)
+        batch = batches.pop()
+        seen += len(batch)
+        print_seen += len(batch)
+
+        loss = trainBatch(
+            *tensorsFromPairs(batch, input_lang, output_lang),
+            encoder,
+            decoder,
+            encoder_optimizer,
+            decoder_optimizer,
+            criterion,
+        )
+        print_loss_total += loss
+        plot_loss_total += loss
+
+        if iter % print_every == 0:
+            print_loss_avg = print_loss_total / print_every
+            print_loss_total = 0
+            print(
+                "%s (%d %d%%) %.4f, %.1f sentences/s"
+                % (
+                    timeSince(start, iter / n_batches),
+                    seen,
+                    iter / n_batches * 100,
+                    print_loss_avg,
+                    print_seen / (time.time() - print_start),
+                )
+            )
+            print_seen = 0
+            print_start = time.time()
+
+        if iter % plot_every == 0:
+            plot_loss_avg = plot_loss_total / plot_every
+            plot_losses.append(plot_loss_avg)
+            plot_loss_total = 0
+
+    showPlot(plot_losses)
+
+
 def trainIters(
     encoder,
     decoder,
@@ -179,17 +307,31 @@ def main(args):
     attn_decoder = AttnDecoderRNN_oneflow(
         hidden_size, output_lang.n_words, dropout_p=args.drop
     ).to(device)
-    trainIters(
-        encoder,
-        attn_decoder,
-        args.n_iters,
-        pairs,
-        input_lang,
-        output_lang,
-        print_every=5000,
-        plot_every=100,
-        learning_rate=args.lr,
-    )
+    if args.batch_size > 1:
+        trainBatches(
+            encoder,
+            attn_decoder,
+            args.n_iters,
+            pairs,
+            input_lang,
+            output_lang,
+            args.batch_size,
+            print_every=max(5000 // args.batch_size, 1),
+            plot_every=max(100 // args.batch_size, 1),
+            learning_rate=args.lr,
+        )
+    else:
+        trainIters(
+            encoder,
+            attn_decoder,
+            args.n_iters,
+            pairs,
+            input_lang,
+            output_lang,
+            print_every=5000,
+            plot_every=100,
+            learning_rate=args.lr,
+        )
     # saving model...'
     flow.save(encoder.state_dict(), args.save_encoder_checkpoint_path)
     flow.save(attn_decoder.state_dict(), args.save_decoder_checkpoint_path)
@@ -1,7 +1,9 @@
 import matplotlib.pyplot as plt
 import matplotlib.ticker as ticker
 import math
+import random
 import time
+import numpy as np
 import oneflow as flow
 
 # refer to: https://pytorch.org/tutorials/intermediate/seq2seq_translation_tutorial.html
@@ -85,3 +87,62 @@ def tensorsFromPair(pair, input_lang, output_lang):
     input_tensor = tensorFromSentence(input_lang, pair[0])
     target_tensor = tensorFromSentence(output_lang, pair[1])
     return (input_tensor, target_tensor)
+
+
+def tensorsFromSentences(lang, sentences):
+    """Batched tensorFromSentence: (batch, length) indexes of the sentences,
+    each ended by EOS and padded with EOS, and the number of words of every
+    sentence, EOS included, on the host."""
+    indexes = [
+        indexesFromSentence(lang, sentence) + [EOS_token] for sentence in sentences
+    ]
+    lengths = np.array([len(index) for index in indexes], dtype=np.int64)
+    padded = np.full((len(indexes), lengths.max()), EOS_token, dtype=np.int64)
+    for row, index in enumerate(indexes):
+        padded[row, : len(index)] = index
+    return flow.tensor(padded, dtype=flow.long, device=device), lengths
+
+
+def tensorsFromPairs(pairs, input_lang, output_lang):
+    """Batched tensorsFromPair, returns the padded inputs, their lengths, the
+    padded targets and the (batch, length) float mask of their words."""
+    input_tensor, input_lengths = tensorsFromSentences(
+        input_lang, [p[0] for p in pairs]
+    )
+    target_tensor, target_lengths = tensorsFromSentences(
+        output_lang, [p[1] for p in pairs]
+    )
+    target_mask = np.arange(target_tensor.shape[1]) < target_lengths[:, None]
+    target_mask = flow.tensor(
+        target_mask.astype(np.float32), dtype=flow.float32, device=device
+    )
+    return input_tensor, input_lengths, target_tensor, target_mask
+
+
+def bucketPairs(pairs, batch_size, shuffle=True):
+    """Splits the pairs in batches of inputs with the same number of words, so
+    the batched encoder never steps over padding."""
+    buckets = {}
+    for pair in pairs:
+        buckets.setdefault(len(pair[0].split(" ")), []).append(pair)
+    batches = []
+    for bucket in buckets.values():
+        if shuffle:
+            random.shuffle(bucket)
+        batches += [
+            bucket[i : i + batch_size] for i in range(0, len(bucket), batch_size)
+        ]
+    if shuffle:
+        random.shuffle(batches)
+    return batches
+
+
+def wordsFromIndexes(lang, indexes):
+    """Decoded words up to the first EOS, included as "<EOS>"."""
+    words = []
+    for index in indexes:
+        if index == EOS_token:
+            words.append("<EOS>")
+            break
+        words.append(lang.index2word[int(index)])
+    return words
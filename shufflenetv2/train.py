@@ -4,9 +4,12 @@ import argparse
 import numpy as np
 import os
 import time
+import sys
 
 from models.shufflenetv2 import shufflenetv2_x0dot5, shufflenetv2_x1
-from utils.ofrecord_data_utils import OFRecordDataLoader
+
+sys.path.append("../")
+from image_data import OFRecordDataLoader
 
 model_dict = {
     "shufflenetv2_x0.5": shufflenetv2_x0dot5,
@@ -53,15 +56,11 @@ def main(args):
     train_data_loader = OFRecordDataLoader(
         ofrecord_root=args.ofrecord_path,
         mode="train",
-        dataset_size=9469,  # NOTE(Liang Depeng): needs to explictly set the dataset size
         batch_size=args.train_batch_size,
     )
 
     val_data_loader = OFRecordDataLoader(
-        ofrecord_root=args.ofrecord_path,
-        mode="val",
-        dataset_size=3925,
-        batch_size=args.val_batch_size,
+        ofrecord_root=args.ofrecord_path, mode="val", batch_size=args.val_batch_size,
     )
 
     # oneflow init
@@ -1,9 +1,13 @@
 import json
+import sys
 
 import numpy as np
 import soundfile as sf
 import oneflow as flow
 
+sys.path.append("../")
+from waveform_store import WaveformStore
+
 
 def create_batches_rnd(lab_dict, batch_size=32, wlen=3200, fact_amp=0.2, train=True):
 
@@ -40,6 +44,28 @@ def create_batches_rnd(lab_dict, batch_size=32, wlen=3200, fact_amp=0.2, train=T
     return inp, lab
 
 
+def open_waveform_store(lab_dict, store_dir, train=True):
+    """Packs the utterances of the train or test list with their labels
+    into a memory mapped store on first use."""
+    label_list = lab_dict["train"] if train else lab_dict["test"]
+    return WaveformStore.open_or_pack(
+        store_dir,
+        [path for path, _ in label_list],
+        [int(label) for _, label in label_list],
+    )
+
+
+def create_batches_store(store, batch_size=32, wlen=3200, fact_amp=0.2, prefetch=0):
+    """Yields (inp, lab) batches like create_batches_rnd, gathered from a
+    WaveformStore, ``prefetch`` batches ahead in a background thread if not 0."""
+    for sig_batch, lab_batch in store.iter_batches(
+        batch_size, wlen, fact_amp, prefetch
+    ):
+        inp = flow.Tensor(sig_batch, dtype=flow.float32).to("cuda")
+        lab = flow.Tensor(lab_batch, dtype=flow.float32).to("cuda")
+        yield inp, lab
+
+
 if __name__ == "__main__":
     with open("data_preprocessed/label_dict.json", "r") as f:
         lab_dict = json.load(f)
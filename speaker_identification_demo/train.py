@@ -8,7 +8,7 @@ import oneflow.nn as nn
 import oneflow.optim as optim
 
 from model.model import simple_CNN
-from model.dataloader import create_batches_rnd
+from model.dataloader import create_batches_store, open_waveform_store
 
 
 def get_args():
@@ -27,6 +27,15 @@ def get_args():
     parser.add_argument("--wlen", type=int, default=3200)
     parser.add_argument("--fact_amp", type=float, default=0.2)
     parser.add_argument("--num_speakers", type=int, default=2)
+    parser.add_argument(
+        "--store_path",
+        type=str,
+        default="data_preprocessed/waveform_store_train",
+        help="memory mapped training waveforms, packed on first use",
+    )
+    parser.add_argument(
+        "--prefetch", type=int, default=4, help="batches prepared ahead, 0 disables"
+    )
 
     parser.add_argument("--output_path", type=str, default="save_models")
 
@@ -38,6 +47,15 @@ def train(opt):
     with open(opt.label_dict, "r") as f:
         lab_dict = json.load(f)
 
+    store = open_waveform_store(lab_dict, opt.store_path, train=True)
+    batches = create_batches_store(
+        store,
+        batch_size=opt.batch_size,
+        wlen=opt.wlen,
+        fact_amp=opt.fact_amp,
+        prefetch=opt.prefetch,
+    )
+
     cnn = simple_CNN(opt.num_speakers)
     cnn.to("cuda")
 
@@ -58,13 +76,7 @@ def train(opt):
 
         for i in range(N_batches):
 
-            inp, lab = create_batches_rnd(
-                lab_dict,
-                batch_size=opt.batch_size,
-                wlen=opt.wlen,
-                fact_amp=opt.fact_amp,
-                train=True,
-            )
+            inp, lab = next(batches)
             inp = inp.unsqueeze(1)
             lab -= 1
 
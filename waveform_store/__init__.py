@@ -0,0 +1 @@
+from .store import pack_waveforms, WaveformStore, BatchPrefetcher
@@ -0,0 +1,114 @@
+"""
+Batches/s of random chunk sampling: one sf.read per chunk as in
+create_batches_rnd, against the memory-mapped store with and without a
+prefetch thread. Host side only, no device copies.
+
+    python3 -m waveform_store.compare_batch_speed --wav_lst list.scp --data_folder data/
+    python3 -m waveform_store.compare_batch_speed --synthetic 500
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import soundfile as sf
+
+from waveform_store import WaveformStore
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser("flags for waveform batch sampling speed")
+    parser.add_argument("--wav_lst", type=str, default="", help="list of wav files")
+    parser.add_argument("--data_folder", type=str, default="")
+    parser.add_argument(
+        "--synthetic", type=int, default=0, help="generate this many 1-4s utterances"
+    )
+    parser.add_argument("--store_dir", type=str, default="")
+    parser.add_argument("--batch_size", type=int, default=128)
+    parser.add_argument("--wlen", type=int, default=3200)
+    parser.add_argument("--n_batches", type=int, default=50)
+    parser.add_argument("--dtype", type=str, default="float32")
+    return parser.parse_args()
+
+
+def _synthetic_wavs(n, folder):
+    rng = np.random.RandomState(0)
+    paths = []
+    for i in range(n):
+        signal = (rng.randn(rng.randint(16000, 64000)) * 3000).astype(np.int16)
+        path = os.path.join(folder, "utt_%05d.wav" % i)
+        sf.write(path, signal, 16000, subtype="PCM_16")
+        paths.append(path)
+    return paths
+
+
+def sf_read_batch(paths, batch_size, wlen, fact_amp=0.2):
+    # the sampling of create_batches_rnd, without the device copy
+    sig_batch = np.zeros([batch_size, wlen])
+    snt_id_arr = np.random.randint(len(paths), size=batch_size)
+    rand_amp_arr = np.random.uniform(1.0 - fact_amp, 1 + fact_amp, batch_size)
+    for i in range(batch_size):
+        [signal, fs] = sf.read(paths[snt_id_arr[i]])
+        snt_beg = np.random.randint(signal.shape[0] - wlen - 1)
+        sig_batch[i, :] = signal[snt_beg : snt_beg + wlen] * rand_amp_arr[i]
+    return sig_batch
+
+
+def _batches_per_second(next_batch, n_batches):
+    next_batch()
+    start = time.time()
+    for _ in range(n_batches):
+        next_batch()
+    return n_batches / (time.time() - start)
+
+
+def main(args):
+    tmp_dir = tempfile.TemporaryDirectory()
+    if args.synthetic > 0:
+        paths = _synthetic_wavs(args.synthetic, tmp_dir.name)
+    else:
+        with open(args.wav_lst) as f:
+            paths = [args.data_folder + line.rstrip() for line in f if line.strip()]
+    store_dir = args.store_dir or os.path.join(tmp_dir.name, "store")
+
+    start = time.time()
+    store = WaveformStore.open_or_pack(
+        store_dir, paths, labels=[0] * len(paths), dtype=args.dtype
+    )
+    print("store ready in {:.1f}s".format(time.time() - start))
+
+    results = [
+        (
+            "sf.read per chunk",
+            _batches_per_second(
+                lambda: sf_read_batch(paths, args.batch_size, args.wlen),
+                max(args.n_batches // 10, 1),
+            ),
+        ),
+        (
+            "WaveformStore",
+            _batches_per_second(
+                lambda: store.sample_chunks(args.batch_size, args.wlen, 0.2),
+                args.n_batches,
+            ),
+        ),
+    ]
+    batches = store.iter_batches(args.batch_size, args.wlen, 0.2, prefetch=4)
+    results.append(
+        (
+            "WaveformStore, prefetch=4",
+            _batches_per_second(lambda: next(batches), args.n_batches),
+        )
+    )
+    batches.close()
+
+    print("| sampling | batches/s |")
+    print("|---|---|")
+    for name, speed in results:
+        print("| {} | {:.1f} |".format(name, speed))
+    tmp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main(_parse_args())
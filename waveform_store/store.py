@@ -0,0 +1,214 @@
+import json
+import os
+import queue
+import threading
+
+import numpy as np
+import soundfile as sf
+
+__all__ = ["pack_waveforms", "WaveformStore", "BatchPrefetcher"]
+
+INDEX_FILE = "index.json"
+DATA_FILE = "waveforms.npy"
+
+# soundfile reads int16 PCM as int16 / 32768 when asked for floats
+_INT16_SCALE = 1.0 / 32768
+
+
+def _read_mono(path, dtype):
+    signal, fs = sf.read(path, dtype=dtype)
+    if signal.ndim == 2:
+        print("WARNING: stereo to mono: " + path)
+        signal = signal[:, 0]
+    return signal, fs
+
+
+def pack_waveforms(paths, store_dir, labels=None, dtype="float32"):
+    """Concatenates the utterances of ``paths`` into one ``.npy`` array.
+
+    Lengths are read from the file headers first, so the array is written
+    in place through a memory map without holding the dataset in memory.
+    The index records the paths, labels, sample rate and the offset of
+    every utterance.
+
+    Args:
+        paths (list): audio files, stereo files keep their first channel
+        store_dir (str): output directory, created if missing
+        labels (list, optional): integer label per utterance. Default is None.
+        dtype (str, optional): "float32", or "int16" for 16-bit PCM sources
+            at half the size. Default is "float32".
+    """
+    assert dtype in ("float32", "int16"), dtype
+    os.makedirs(store_dir, exist_ok=True)
+    lengths = np.array([sf.info(path).frames for path in paths], dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+
+    data = np.lib.format.open_memmap(
+        os.path.join(store_dir, DATA_FILE),
+        mode="w+",
+        dtype=np.dtype(dtype),
+        shape=(int(offsets[-1]),),
+    )
+    samplerate = None
+    for i, path in enumerate(paths):
+        signal, samplerate = _read_mono(path, dtype)
+        data[offsets[i] : offsets[i + 1]] = signal
+    data.flush()
+    del data
+
+    index = {
+        "paths": list(paths),
+        "labels": None if labels is None else [int(label) for label in labels],
+        "offsets": offsets.tolist(),
+        "samplerate": samplerate,
+        "dtype": dtype,
+    }
+    # written last, a store without index is incomplete
+    with open(os.path.join(store_dir, INDEX_FILE), "w") as f:
+        json.dump(index, f)
+
+
+class WaveformStore:
+    """Memory-mapped utterances packed by ``pack_waveforms``.
+
+    Args:
+        store_dir (str): directory written by ``pack_waveforms``
+    """
+
+    def __init__(self, store_dir):
+        with open(os.path.join(store_dir, INDEX_FILE)) as f:
+            index = json.load(f)
+        self.paths = index["paths"]
+        self.labels = (
+            None if index["labels"] is None else np.array(index["labels"], np.int64)
+        )
+        self.offsets = np.array(index["offsets"], dtype=np.int64)
+        self.lengths = np.diff(self.offsets)
+        self.samplerate = index["samplerate"]
+        self.scale = _INT16_SCALE if index["dtype"] == "int16" else 1.0
+        self.data = np.load(os.path.join(store_dir, DATA_FILE), mmap_mode="r")
+
+    @classmethod
+    def open_or_pack(cls, store_dir, paths, labels=None, dtype="float32"):
+        """Opens the store of ``paths``, packing it first if it is missing or
+        was packed from other files, labels or dtype."""
+        index_file = os.path.join(store_dir, INDEX_FILE)
+        packed = False
+        if os.path.exists(index_file):
+            with open(index_file) as f:
+                index = json.load(f)
+            packed = (
+                index["paths"] == list(paths)
+                and index["labels"]
+                == (None if labels is None else [int(label) for label in labels])
+                and index["dtype"] == dtype
+            )
+        if not packed:
+            print("Packing {} utterances into {}".format(len(paths), store_dir))
+            pack_waveforms(paths, store_dir, labels, dtype)
+        return cls(store_dir)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def get(self, i):
+        """Samples of utterance ``i`` as float32."""
+        signal = self.data[self.offsets[i] : self.offsets[i + 1]]
+        return signal.astype(np.float32) * np.float32(self.scale)
+
+    def sample_chunks(self, batch_size, wlen, fact_amp, rng=np.random):
+        """Random ``wlen`` samples chunks of random utterances, each scaled by
+        a random amplitude in [1 - fact_amp, 1 + fact_amp).
+
+        Same sampling as ``create_batches_rnd``, done as one gather from the
+        memory map instead of reading a whole file per chunk.
+
+        Returns:
+            (np.array, np.array): chunks (batch_size, wlen) float32 and the
+                utterance ids (batch_size,)
+        """
+        snt_id_arr = rng.randint(len(self), size=batch_size)
+        rand_amp_arr = rng.uniform(1.0 - fact_amp, 1 + fact_amp, batch_size)
+        snt_beg = rng.randint(self.lengths[snt_id_arr] - wlen - 1)
+        index = (self.offsets[snt_id_arr] + snt_beg)[:, None] + np.arange(wlen)
+        sig_batch = self.data[index].astype(np.float32, copy=False)
+        sig_batch *= (rand_amp_arr * self.scale).astype(np.float32)[:, None]
+        return sig_batch, snt_id_arr
+
+    def iter_batches(self, batch_size, wlen, fact_amp, prefetch=0):
+        """Endless ``sample_chunks`` batches with their labels, prepared
+        ``prefetch`` batches ahead in a background thread if not 0. The store
+        must have been packed with labels, see ``sample_chunks`` otherwise.
+
+        Yields:
+            (np.array, np.array): chunks (batch_size, wlen) float32 and labels
+                (batch_size,) int64
+        """
+        if self.labels is None:
+            raise ValueError(
+                "store was packed without labels, use sample_chunks for unlabeled "
+                "batches"
+            )
+        return self._iter_batches(batch_size, wlen, fact_amp, prefetch)
+
+    def _iter_batches(self, batch_size, wlen, fact_amp, prefetch):
+        def make_batch():
+            sig_batch, snt_id_arr = self.sample_chunks(batch_size, wlen, fact_amp)
+            return sig_batch, self.labels[snt_id_arr]
+
+        batches = BatchPrefetcher(make_batch, prefetch) if prefetch > 0 else None
+        try:
+            while True:
+                yield make_batch() if batches is None else next(batches)
+        finally:
+            if batches is not None:
+                batches.close()
+
+
+class BatchPrefetcher:
+    """Calls ``make_batch`` in a background thread and keeps up to
+    ``queue_size`` batches ready, so host side batch preparation overlaps the
+    training step. Only numpy work should happen in ``make_batch``, tensors
+    are created by the consumer.
+
+    Args:
+        make_batch (callable): returns one batch per call
+        queue_size (int, optional): batches prepared ahead. Default is 4.
+    """
+
+    def __init__(self, make_batch, queue_size=4):
+        self.make_batch = make_batch
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _put(self, item):
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _run(self):
+        while not self.stopped.is_set():
+            try:
+                batch = self.make_batch()
+            except Exception as e:
+                self._put(e)
+                return
+            self._put(batch)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        batch = self.queue.get()
+        if isinstance(batch, Exception):
+            raise batch
+        return batch
+
+    def close(self):
+        self.stopped.set()
+        self.thread.join()